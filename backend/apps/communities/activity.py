@@ -0,0 +1,87 @@
+"""
+communities/activity.py
+Community activity timeline: posts, events and new members merged newest first.
+
+Every item has the sort key (timestamp, kind, id), compared in descending order.
+A page seeks each source strictly past the cursor key with its own index-ordered,
+LIMITed query and merges the sorted streams with heapq.merge, so a page reads at
+most page_size + 1 rows per source however far back the cursor is.
+"""
+
+import base64
+import heapq
+import json
+from itertools import islice
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from .models import CommunityMember
+
+POST, EVENT, MEMBER = 'post', 'event', 'member'
+
+
+def _sources(community, user):
+    """(kind, queryset, timestamp field) for each stream of the community's activity"""
+    from apps.events.models import Event
+    from apps.posts.models import Post
+    from apps.posts.views import visible_posts
+    return [
+        (POST, visible_posts(Post.objects.filter(community=community), user).select_related('author', 'community'), 'created_at'),
+        (EVENT, Event.objects.filter(community=community).select_related('creator', 'community'), 'created_at'),
+        (MEMBER, CommunityMember.objects.filter(community=community, is_active=True).select_related('user'), 'joined_at'),
+    ]
+
+
+def _seek(kind, timestamp_field, position):
+    """Rows of `kind` whose (timestamp, kind, id) key sorts strictly below `position`"""
+    timestamp, position_kind, position_id = position
+    if kind < position_kind:
+        return Q(**{f'{timestamp_field}__lte': timestamp})
+    if kind > position_kind:
+        return Q(**{f'{timestamp_field}__lt': timestamp})
+    return Q(**{f'{timestamp_field}__lt': timestamp}) | Q(**{timestamp_field: timestamp, 'id__lt': position_id})
+
+
+def _stream(kind, queryset, timestamp_field, position, limit):
+    if position is not None:
+        queryset = queryset.filter(_seek(kind, timestamp_field, position))
+    rows = queryset.order_by(f'-{timestamp_field}', '-id')[:limit]
+    for row in rows:
+        yield (getattr(row, timestamp_field), kind, row.id), kind, row
+
+
+def activity_page(community, user, position=None, page_size=20):
+    """
+    One page of the community's activity, newest first.
+    Args:
+        community (Community): The community.
+        user (User): The viewer; posts they may not read are left out.
+        position (tuple, optional): Sort key of the last item of the previous page.
+        page_size (int): Number of items to return.
+    Returns:
+        tuple: ([(kind, object), ...], sort key to continue from or None)
+    """
+    streams = [
+        _stream(kind, queryset, timestamp_field, position, page_size + 1)
+        for kind, queryset, timestamp_field in _sources(community, user)
+    ]
+    merged = list(islice(heapq.merge(*streams, key=lambda item: item[0], reverse=True), page_size + 1))
+    next_position = merged[page_size - 1][0] if len(merged) > page_size else None
+    return [(kind, row) for _, kind, row in merged[:page_size]], next_position
+
+
+def encode_position(position):
+    timestamp, kind, row_id = position
+    return base64.urlsafe_b64encode(json.dumps([timestamp.isoformat(), kind, row_id]).encode('ascii')).decode('ascii')
+
+
+def decode_position(token):
+    """Parse a cursor token; raises ValueError if it is malformed"""
+    try:
+        timestamp, kind, row_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('ascii'))
+    except (TypeError, UnicodeError, json.JSONDecodeError) as error:
+        raise ValueError('Invalid cursor') from error
+    timestamp = parse_datetime(timestamp) if isinstance(timestamp, str) else None
+    if timestamp is None or kind not in (POST, EVENT, MEMBER) or not isinstance(row_id, int):
+        raise ValueError('Invalid cursor')
+    return timestamp, kind, row_id
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
-from .models import Community, CommunityMember, InterestTag
+from .models import Community, CommunityMember, InterestTag, CommunityDailyStats
+from .counters import recount_members
+from .services import membership_changed
 
 
 class CommunityAdmin(admin.ModelAdmin):
@@ -9,11 +11,11 @@ class CommunityAdmin(admin.ModelAdmin):
     list_filter = ('is_public', 'created_at', 'updated_at')
     search_fields = ('name', 'description', 'creator__email', 'creator__username')
     ordering = ('-created_at',)
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'member_count')
     
     fieldsets = (
         (_('Basic Information'), {
-            'fields': ('name', 'description', 'creator')
+            'fields': ('name', 'description', 'creator', 'member_count')
         }),
         (_('Community Settings'), {
             'fields': ('cover_image', 'is_public', 'tags')
@@ -24,11 +26,6 @@ class CommunityAdmin(admin.ModelAdmin):
         }),
     )
     
-    def member_count(self, obj):
-        """Display number of members"""
-        return obj.members.filter(is_active=True).count()
-    member_count.short_description = 'Number of members'
-    
     def get_queryset(self, request):
         """Optimizing query performance"""
         return super().get_queryset(request).select_related('creator')
@@ -56,6 +53,30 @@ class CommunityMemberAdmin(admin.ModelAdmin):
         """Optimizing query performance"""
         return super().get_queryset(request).select_related('user', 'community')
 
+    def save_model(self, request, obj, form, change):
+        """Recount the affected communities once, since membership rows have no signals"""
+        community_ids, user_ids = {obj.community_id}, {obj.user_id}
+        if change:
+            community_ids.add(form.initial.get('community', obj.community_id))
+            user_ids.add(form.initial.get('user', obj.user_id))
+        super().save_model(request, obj, form, change)
+        recount_members(Community.objects.filter(pk__in=community_ids))
+        for community_id in community_ids:
+            membership_changed(community_id, list(user_ids))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        recount_members(Community.objects.filter(pk=obj.community_id))
+        membership_changed(obj.community_id, [obj.user_id])
+
+    def delete_queryset(self, request, queryset):
+        """Bulk removal: one recount per affected community"""
+        rows = list(queryset.values_list('community_id', 'user_id'))
+        super().delete_queryset(request, queryset)
+        recount_members(Community.objects.filter(pk__in={community_id for community_id, _ in rows}))
+        for community_id in {community_id for community_id, _ in rows}:
+            membership_changed(community_id, [user_id for cid, user_id in rows if cid == community_id])
+
 
 class InterestTagAdmin(admin.ModelAdmin):
     """Interest Tag management interface"""
@@ -76,7 +97,17 @@ class InterestTagAdmin(admin.ModelAdmin):
     )
 
 
+class CommunityDailyStatsAdmin(admin.ModelAdmin):
+    """Daily engagement rollup (written by `manage.py rollup_community_stats`)"""
+    list_display = ('community', 'date', 'new_members', 'posts', 'comments', 'likes', 'event_signups')
+    list_filter = ('date',)
+    search_fields = ('community__name',)
+    ordering = ('-date',)
+    list_select_related = ('community',)
+
+
 # Registering Models
 admin.site.register(Community, CommunityAdmin)
 admin.site.register(CommunityMember, CommunityMemberAdmin)
 admin.site.register(InterestTag, InterestTagAdmin)
+admin.site.register(CommunityDailyStats, CommunityDailyStatsAdmin)
@@ -0,0 +1,25 @@
+"""
+communities/counters.py
+Set-based recomputation of the denormalized Community.member_count.
+"""
+
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import CommunityMember
+
+
+def active_member_count_subquery():
+    """Correlated COUNT(*) of active members of the outer community"""
+    counts = (
+        CommunityMember.objects.filter(community=OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('community')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def recount_members(queryset):
+    """Recompute member_count for every community in `queryset` in one UPDATE"""
+    return queryset.update(member_count=active_member_count_subquery())
@@ -0,0 +1,71 @@
+"""
+communities/directory_cache.py
+Response cache for anonymous GETs of the public community directory.
+
+Entries are keyed by a global version token, the host, path and sorted query string:
+    community_directory:version
+    community_directory:<version>:<format>:<sha1 of host, path and query>
+Any change to a community, membership or interest tag replaces the version, which
+orphans every entry at once; orphans expire after COMMUNITY_DIRECTORY_CACHE_TIMEOUT.
+Authenticated requests carry user-specific fields and are never cached.
+"""
+
+import hashlib
+import logging
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from redis import RedisError
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'community_directory:version'
+
+
+def _response_key(request, version):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    # The host is part of the key because paginated responses carry absolute links
+    digest = hashlib.sha1(f'{request.get_host()}{request.path}?{query}'.encode('utf-8')).hexdigest()
+    return f'community_directory:{version}:{request.accepted_renderer.format}:{digest}'
+
+
+def _replace_version():
+    try:
+        cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    except RedisError:
+        logger.exception('Could not invalidate the community directory cache')
+
+
+def invalidate():
+    """Drop every cached directory response, now and again once the transaction commits"""
+    _replace_version()
+    transaction.on_commit(_replace_version)
+
+
+class AnonymousDirectoryCacheMixin:
+    """Serve anonymous GETs of a DRF view from the cache; everyone else bypasses it"""
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+        try:
+            version = cache.get_or_set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+            key = _response_key(request, version)
+            data = cache.get(key)
+        except RedisError:
+            logger.exception('Could not read the community directory cache')
+            return super().get(request, *args, **kwargs)
+        if data is not None:
+            return Response(data)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            try:
+                cache.set(key, response.data, timeout=settings.COMMUNITY_DIRECTORY_CACHE_TIMEOUT)
+            except RedisError:
+                logger.exception('Could not write the community directory cache')
+        return response
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.communities.counters import recount_members
+from apps.communities.models import Community
+
+
+class Command(BaseCommand):
+    """Recompute Community.member_count from the active CommunityMember rows"""
+    help = 'Recompute denormalized member counters on communities in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of communities updated per statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        updated = 0
+        while True:
+            # Walk the primary key so each batch is an index range, not an OFFSET scan
+            ids = list(
+                Community.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                updated += recount_members(Community.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]))
+            last_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f'Reconciled member counts for {updated} communities'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from apps.communities.rollups import rollup_engagement
+
+
+class Command(BaseCommand):
+    """Aggregate community activity since the last run into CommunityDailyStats"""
+    help = 'Incrementally roll up daily community engagement (run every few minutes to hourly)'
+
+    def handle(self, *args, **options):
+        written = rollup_engagement()
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {written} community-days'))
@@ -0,0 +1,100 @@
+"""
+communities/membership_cache.py
+Per-user map of community id -> role for active memberships, kept in the Django cache.
+
+Each user has a version token; the map is stored under a key that includes it:
+    community_roles:version:<user_id>
+    community_roles:<user_id>:<version>
+Invalidation replaces the version instead of deleting the map, so a request that read
+the table before a membership changed can only write its result under the old,
+no longer consulted key. Cache errors fall back to querying CommunityMember.
+"""
+
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from redis import RedisError
+from .models import CommunityMember
+
+logger = logging.getLogger(__name__)
+
+MANAGER_ROLES = ('admin', 'community_leader')
+
+
+def _version_key(user_id):
+    return f'community_roles:version:{user_id}'
+
+
+def _roles_key(user_id, version):
+    return f'community_roles:{user_id}:{version}'
+
+
+def _load_roles(user_id):
+    return dict(
+        CommunityMember.objects.filter(user_id=user_id, is_active=True).values_list('community_id', 'role')
+    )
+
+
+def get_community_roles(user):
+    """
+    Return {community_id: role} for the user's active memberships.
+    Args:
+        user (User): The user; anonymous users have no memberships.
+    """
+    if not user or not user.is_authenticated:
+        return {}
+    try:
+        version = cache.get_or_set(_version_key(user.pk), uuid.uuid4().hex, timeout=None)
+        key = _roles_key(user.pk, version)
+        roles = cache.get(key)
+        if roles is None:
+            roles = _load_roles(user.pk)
+            cache.set(key, roles, timeout=settings.MEMBERSHIP_CACHE_TIMEOUT)
+        return roles
+    except RedisError:
+        logger.exception('Could not read cached community roles for user %s', user.pk)
+        return _load_roles(user.pk)
+
+
+def get_role(user, community_id):
+    """The user's role in the community, or None if they are not an active member"""
+    if community_id is None:
+        return None
+    return get_community_roles(user).get(int(community_id))
+
+
+def is_member(user, community_id):
+    return get_role(user, community_id) is not None
+
+
+def member_community_ids(user):
+    return list(get_community_roles(user))
+
+
+def _bump_versions(user_ids):
+    # Any unused value will do; set_many invalidates a whole batch in one round trip
+    try:
+        cache.set_many({_version_key(user_id): uuid.uuid4().hex for user_id in user_ids}, timeout=None)
+    except RedisError:
+        logger.exception('Could not invalidate cached community roles for %d users', len(user_ids))
+
+
+def invalidate(user_id):
+    """
+    Drop the cached roles of a user.
+    The version is replaced now, so the current transaction reads fresh data, and again
+    after commit, so a concurrent request cannot keep a map read before the commit.
+    """
+    invalidate_many([user_id])
+
+
+def invalidate_many(user_ids):
+    """Drop the cached roles of several users at once (see `invalidate`)"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    _bump_versions(user_ids)
+    transaction.on_commit(lambda: _bump_versions(user_ids))
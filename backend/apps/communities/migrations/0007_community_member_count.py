@@ -0,0 +1,30 @@
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_member_count(apps, schema_editor):
+    """Populate member_count from the existing active memberships"""
+    Community = apps.get_model('communities', 'Community')
+    CommunityMember = apps.get_model('communities', 'CommunityMember')
+    counts = (
+        CommunityMember.objects.filter(community=OuterRef('pk'), is_active=True)
+        .order_by().values('community').annotate(total=Count('pk')).values('total')
+    )
+    Community.objects.update(member_count=Coalesce(Subquery(counts, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0006_interesttag_alter_community_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='community',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Member count'),
+        ),
+        migrations.RunPython(backfill_member_count, migrations.RunPython.noop),
+    ]
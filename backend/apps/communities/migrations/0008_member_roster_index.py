@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0007_community_member_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='communitymember',
+            index=models.Index(fields=['community', 'is_active', '-joined_at', '-id'], name='member_roster_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0008_member_roster_index'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='community',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='community_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='interesttag',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='interesttag_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
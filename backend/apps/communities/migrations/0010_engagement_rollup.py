@@ -0,0 +1,54 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0009_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommunityDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('new_members', models.PositiveIntegerField(default=0, verbose_name='New members')),
+                ('posts', models.PositiveIntegerField(default=0, verbose_name='Posts')),
+                ('comments', models.PositiveIntegerField(default=0, verbose_name='Comments')),
+                ('likes', models.PositiveIntegerField(default=0, verbose_name='Likes')),
+                ('event_signups', models.PositiveIntegerField(default=0, verbose_name='Event sign-ups')),
+            ],
+            options={
+                'verbose_name': 'Community Daily Stats',
+                'verbose_name_plural': 'Community Daily Stats',
+                'ordering': ['community', 'date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Rollup')),
+                ('value', models.DateTimeField(verbose_name='Aggregated up to')),
+            ],
+            options={
+                'verbose_name': 'Rollup Watermark',
+                'verbose_name_plural': 'Rollup Watermarks',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='communitymember',
+            index=models.Index(fields=['joined_at'], name='member_joined_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='communitydailystats',
+            name='community',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='communities.community'),
+        ),
+        migrations.AddConstraint(
+            model_name='communitydailystats',
+            constraint=models.UniqueConstraint(fields=('community', 'date'), name='community_daily_stats_unique'),
+        ),
+    ]
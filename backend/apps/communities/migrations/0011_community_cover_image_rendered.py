@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0010_engagement_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='community',
+            name='cover_image_rendered',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Cover with renditions'),
+        ),
+    ]
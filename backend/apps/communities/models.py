@@ -1,12 +1,14 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from uni_hub_core.counters import CounterFieldsMixin
 
 User = get_user_model()
 
 
-class Community(models.Model):
+class Community(CounterFieldsMixin, models.Model):
     """Community Model"""
     name = models.CharField(max_length=100, verbose_name='Community Name')
     description = models.TextField(verbose_name='Description')
@@ -15,19 +17,25 @@ class Community(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     cover_image = models.ImageField(upload_to='community_covers/', blank=True, null=True, verbose_name='Cover Image')
+    # Name of the cover whose renditions are stored, set by the rendition job
+    cover_image_rendered = models.CharField(max_length=100, blank=True, editable=False, verbose_name='Cover with renditions')
+    background_fields = ('cover_image_rendered',)
     tags = models.ManyToManyField('InterestTag', blank=True, related_name='communities', verbose_name='Interest Tags')
+    # Number of active members, maintained by the CommunityMember signals
+    member_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Member count')
+    counter_fields = ('member_count',)
     
     class Meta:
         verbose_name = 'Community'
         verbose_name_plural = 'Communities'
         ordering = ['-created_at']
+        indexes = [
+            # Trigram index: serves autocomplete and the name ILIKE of the list search
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='community_name_trgm_idx'),
+        ]
     
     def __str__(self):
         return self.name
-    
-    @property
-    def member_count(self):
-        return self.members.filter(is_active=True).count()
 
 
 class CommunityMember(models.Model):
@@ -47,6 +55,12 @@ class CommunityMember(models.Model):
         unique_together = ('user', 'community')
         verbose_name = 'Community Member'
         verbose_name_plural = 'Community Members'
+        indexes = [
+            # Serves the keyset-paginated roster of one community
+            models.Index(fields=['community', 'is_active', '-joined_at', '-id'], name='member_roster_idx'),
+            # Serves the incremental engagement rollup
+            models.Index(fields=['joined_at'], name='member_joined_at_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.community.name} ({self.role})"
@@ -63,6 +77,45 @@ class InterestTag(models.Model):
         verbose_name = 'Interest Tag'
         verbose_name_plural = 'Interest Tags'
         ordering = ['name']
+        indexes = [
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='interesttag_name_trgm_idx'),
+        ]
     
     def __str__(self):
-        return self.name 
\ No newline at end of file
+        return self.name
+
+
+class CommunityDailyStats(models.Model):
+    """Engagement counts of one community on one day, maintained by the engagement rollup"""
+    community = models.ForeignKey(Community, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField(verbose_name='Date')
+    new_members = models.PositiveIntegerField(default=0, verbose_name='New members')
+    posts = models.PositiveIntegerField(default=0, verbose_name='Posts')
+    comments = models.PositiveIntegerField(default=0, verbose_name='Comments')
+    likes = models.PositiveIntegerField(default=0, verbose_name='Likes')
+    event_signups = models.PositiveIntegerField(default=0, verbose_name='Event sign-ups')
+
+    class Meta:
+        verbose_name = 'Community Daily Stats'
+        verbose_name_plural = 'Community Daily Stats'
+        ordering = ['community', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['community', 'date'], name='community_daily_stats_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.community.name} - {self.date}"
+
+
+class RollupWatermark(models.Model):
+    """Point in time up to which a rollup job has aggregated its source rows"""
+    name = models.CharField(max_length=50, unique=True, verbose_name='Rollup')
+    value = models.DateTimeField(verbose_name='Aggregated up to')
+
+    class Meta:
+        verbose_name = 'Rollup Watermark'
+        verbose_name_plural = 'Rollup Watermarks'
+
+    def __str__(self):
+        return f"{self.name} @ {self.value}"
+
@@ -1,4 +1,5 @@
 from rest_framework.permissions import BasePermission
+from .membership_cache import get_role, MANAGER_ROLES
 
 class IsCommunityAdmin(BasePermission):
     """
@@ -10,7 +11,19 @@ class IsCommunityAdmin(BasePermission):
         # Global admin or community_leader has permission
         if hasattr(request.user, 'role') and request.user.role in ['admin', 'community_leader']:
             return True
-        admin_membership = obj.members.filter(user=request.user, role='admin', is_active=True).exists()
-        if admin_membership:
+        if get_role(request.user, obj.pk) == 'admin':
             return True
-        return False 
\ No newline at end of file
+        return False
+
+
+class IsCommunityManager(BasePermission):
+    """
+    Superusers, global admins / community leaders, and the community's own leaders and admins
+    """
+    def has_object_permission(self, request, view, obj):
+        if request.user.is_superuser:
+            return True
+        if hasattr(request.user, 'role') and request.user.role in MANAGER_ROLES:
+            return True
+        return get_role(request.user, obj.pk) in MANAGER_ROLES
+
@@ -0,0 +1,65 @@
+"""
+communities/recommendations.py
+Tag-based community recommendations scored in the database.
+
+The community <-> interest tag through table is the sparse tag-by-community matrix.
+A user's profile is the tag column sum over the communities they belong to, so the
+affinity of a candidate is the dot product of that profile with the candidate's tag
+column. Both steps are grouped aggregates over the through table, which is kept
+current by ordinary tag edits; member_count (maintained incrementally on joins and
+leaves) supplies the activity weight:
+
+    score = affinity * ln(2 + member_count)
+"""
+
+from django.db.models import Case, Count, F, FloatField, IntegerField, Sum, Value, When
+from django.db.models.functions import Ln
+from .models import Community
+from .membership_cache import member_community_ids
+
+CommunityTag = Community.tags.through
+
+
+def user_tag_profile(community_ids):
+    """Return {tag_id: number of the given communities carrying the tag}"""
+    rows = (
+        CommunityTag.objects.filter(community_id__in=community_ids)
+        .values('interesttag_id')
+        .annotate(weight=Count('pk'))
+        .values_list('interesttag_id', 'weight')
+    )
+    return dict(rows)
+
+
+def recommend_community_ids(user, limit=10):
+    """
+    Rank public communities the user has not joined, best first.
+    Users without tagged communities get the largest communities instead.
+    Args:
+        user (User): The viewer.
+        limit (int): Number of ids to return.
+    Returns:
+        list: Community primary keys.
+    """
+    joined = member_community_ids(user)
+    profile = user_tag_profile(joined)
+    if not profile:
+        return list(
+            Community.objects.filter(is_public=True).exclude(pk__in=joined)
+            .order_by('-member_count', '-created_at').values_list('pk', flat=True)[:limit]
+        )
+
+    weight = Case(
+        *[When(interesttag_id=tag_id, then=Value(count)) for tag_id, count in profile.items()],
+        output_field=IntegerField(),
+    )
+    ranked = (
+        CommunityTag.objects.filter(interesttag_id__in=profile.keys(), community__is_public=True)
+        .exclude(community_id__in=joined)
+        .values('community_id')
+        .annotate(affinity=Sum(weight))
+        .annotate(score=F('affinity') * Ln(F('community__member_count') + 2.0, output_field=FloatField()))
+        .order_by('-score', '-community_id')
+        .values_list('community_id', flat=True)[:limit]
+    )
+    return list(ranked)
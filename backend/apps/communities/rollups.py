@@ -0,0 +1,114 @@
+"""
+communities/rollups.py
+Incremental daily engagement rollup into CommunityDailyStats.
+
+Each run re-aggregates only the days touched since the previous run's watermark:
+from the start of the day ROLLUP_LAG before the watermark up to now. Whole days are
+recomputed (not incremented), so runs are idempotent, deletions within those days
+are reflected, and rows committed shortly after a run are picked up by the next.
+Every source is read with a range scan on its timestamp index.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import CommunityDailyStats, CommunityMember, RollupWatermark
+
+WATERMARK_NAME = 'community_daily_stats'
+# Allowance for transactions that commit after a run but carry an earlier timestamp
+ROLLUP_LAG = timedelta(minutes=15)
+METRICS = ('new_members', 'posts', 'comments', 'likes', 'event_signups')
+
+
+def _sources():
+    """(metric, queryset, community path, timestamp field) for every counted activity"""
+    from apps.events.models import EventParticipant
+    from apps.posts.models import Comment, Like, Post
+    return [
+        ('new_members', CommunityMember.objects.all(), 'community_id', 'joined_at'),
+        ('posts', Post.objects.filter(community__isnull=False), 'community_id', 'created_at'),
+        ('comments', Comment.objects.filter(post__community__isnull=False), 'post__community_id', 'created_at'),
+        ('likes', Like.objects.filter(post__community__isnull=False), 'post__community_id', 'created_at'),
+        ('event_signups', EventParticipant.objects.all(), 'event__community_id', 'registered_at'),
+    ]
+
+
+def _start_of_day(moment):
+    return timezone.make_aware(datetime.combine(timezone.localdate(moment), time.min))
+
+
+def aggregate_range(start, end):
+    """
+    Count activity per community and local day for timestamps in [start, end).
+    Args:
+        start (datetime or None): Inclusive lower bound; None aggregates all history.
+        end (datetime): Exclusive upper bound.
+    Returns:
+        dict: (community_id, date) -> {metric: count}
+    """
+    totals = {}
+    for metric, queryset, community_path, timestamp in _sources():
+        window = {f'{timestamp}__lt': end}
+        if start is not None:
+            window[f'{timestamp}__gte'] = start
+        rows = (
+            queryset.filter(**window)
+            .annotate(day=TruncDate(timestamp))
+            .values_list(community_path, 'day')
+            .annotate(total=Count('pk'))
+            .order_by()
+        )
+        for community_id, day, total in rows:
+            totals.setdefault((community_id, day), dict.fromkeys(METRICS, 0))[metric] = total
+    return totals
+
+
+def rollup_engagement(now=None):
+    """
+    Bring CommunityDailyStats up to date and advance the watermark.
+    Concurrent runs are serialized on the watermark row.
+    Args:
+        now (datetime, optional): Upper bound of this run (defaults to now).
+    Returns:
+        int: Number of (community, day) rows written.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        watermark = RollupWatermark.objects.select_for_update().filter(name=WATERMARK_NAME).first()
+        start = _start_of_day(watermark.value - ROLLUP_LAG) if watermark is not None else None
+        totals = aggregate_range(start, now)
+
+        stale = CommunityDailyStats.objects.all()
+        if start is not None:
+            stale = stale.filter(date__gte=timezone.localdate(start))
+        stale.delete()
+        CommunityDailyStats.objects.bulk_create(
+            [
+                CommunityDailyStats(community_id=community_id, date=day, **counts)
+                for (community_id, day), counts in totals.items()
+            ],
+            batch_size=1000,
+        )
+        RollupWatermark.objects.update_or_create(name=WATERMARK_NAME, defaults={'value': now})
+    return len(totals)
+
+
+def daily_stats(community, days, today=None):
+    """
+    The last `days` days of stats for a community, oldest first, with empty days as zeros.
+    Reads at most `days` rows from CommunityDailyStats.
+    """
+    today = today or timezone.localdate()
+    first_day = today - timedelta(days=days - 1)
+    stored = {
+        row['date']: row for row in
+        CommunityDailyStats.objects.filter(community=community, date__gte=first_day, date__lte=today)
+        .values('date', *METRICS)
+    }
+    return [
+        stored.get(day, dict(date=day, **dict.fromkeys(METRICS, 0)))
+        for day in (first_day + timedelta(days=offset) for offset in range(days))
+    ]
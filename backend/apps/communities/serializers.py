@@ -1,8 +1,13 @@
+import codecs
+import csv
+
 from rest_framework import serializers
 from .models import Community, CommunityMember, InterestTag
 from apps.posts.models import Post
 from apps.posts.serializers import PostSerializer
 from apps.users.serializers import UserSerializer
+from uni_hub_core.images import ImageRenditionsField
+from .membership_cache import get_role
 
 
 class InterestTagSerializer(serializers.ModelSerializer):
@@ -18,25 +23,68 @@ class CommunitySerializer(serializers.ModelSerializer):
     member_count = serializers.ReadOnlyField()
     # Make tags writable: use PrimaryKeyRelatedField for editing
     tags = serializers.PrimaryKeyRelatedField(queryset=InterestTag.objects.all(), many=True)
+    cover_image_renditions = ImageRenditionsField(source='cover_image')
     
     class Meta:
         model = Community
-        fields = ['id', 'name', 'description', 'creator', 'is_public', 'created_at', 'updated_at', 'cover_image', 'member_count', 'tags']
+        fields = ['id', 'name', 'description', 'creator', 'is_public', 'created_at', 'updated_at', 'cover_image', 'cover_image_renditions', 'member_count', 'tags']
         read_only_fields = ['created_at', 'updated_at', 'member_count']
 
 
 class CommunityMemberSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    community = CommunitySerializer(read_only=True)
+    """
+    Compact membership row: who the member is and their role, without the community.
+    Expects the queryset to select_related('user').
+    """
+    user_id = serializers.IntegerField(read_only=True)
     user_name = serializers.CharField(source='user.username', read_only=True)
-    user_email = serializers.CharField(source='user.email', read_only=True)
+    user_avatar = serializers.ImageField(source='user.avatar', read_only=True)
     
     class Meta:
         model = CommunityMember
-        fields = ['id', 'user', 'community', 'role', 'joined_at', 'is_active', 'user_name', 'user_email']
+        fields = ['id', 'user_id', 'user_name', 'user_avatar', 'role', 'joined_at', 'is_active']
         read_only_fields = ['joined_at']
 
 
+class MemberImportSerializer(serializers.Serializer):
+    """Bulk member import: a list of user ids / emails, or a CSV file with one per row"""
+    MAX_ROWS = 5000
+    HEADER_NAMES = ('id', 'user_id', 'email', 'user')
+
+    users = serializers.ListField(child=serializers.CharField(), required=False, allow_empty=False)
+    file = serializers.FileField(required=False)
+    role = serializers.ChoiceField(choices=['member', 'admin'], default='member')
+
+    def validate_file(self, value):
+        """Read the upload row by row, stopping as soon as it exceeds MAX_ROWS"""
+        identifiers = []
+        column = None
+        try:
+            for row in csv.reader(codecs.iterdecode(value, 'utf-8-sig')):
+                if column is None:
+                    header = [cell.strip().lower() for cell in row]
+                    column = next((index for index, cell in enumerate(header) if cell in self.HEADER_NAMES), None)
+                    if column is not None:
+                        continue
+                    column = 0
+                if len(row) > column and row[column].strip():
+                    identifiers.append(row[column].strip())
+                    if len(identifiers) > self.MAX_ROWS:
+                        raise serializers.ValidationError(f'At most {self.MAX_ROWS} users can be imported at once.')
+        except UnicodeDecodeError:
+            raise serializers.ValidationError('The file must be UTF-8 encoded CSV.')
+        return identifiers
+
+    def validate(self, attrs):
+        identifiers = attrs.get('users') or attrs.get('file')
+        if not identifiers:
+            raise serializers.ValidationError('Provide a list of users or a CSV file.')
+        if len(identifiers) > self.MAX_ROWS:
+            raise serializers.ValidationError(f'At most {self.MAX_ROWS} users can be imported at once.')
+        attrs['identifiers'] = identifiers
+        return attrs
+
+
 class CommunityDetailSerializer(serializers.ModelSerializer):
     creator = UserSerializer(read_only=True)
     members = serializers.SerializerMethodField()
@@ -45,22 +93,22 @@ class CommunityDetailSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(queryset=InterestTag.objects.all(), many=True)
     creator_name = serializers.CharField(source='creator.username', read_only=True)
     current_user_role = serializers.SerializerMethodField()
+    cover_image_renditions = ImageRenditionsField(source='cover_image')
     
     class Meta:
         model = Community
-        fields = ['id', 'name', 'description', 'creator', 'creator_name', 'is_public', 'created_at', 'updated_at', 'cover_image', 'members', 'member_count', 'tags', 'current_user_role']
+        fields = ['id', 'name', 'description', 'creator', 'creator_name', 'is_public', 'created_at', 'updated_at', 'cover_image', 'cover_image_renditions', 'members', 'member_count', 'tags', 'current_user_role']
         read_only_fields = ['created_at', 'updated_at', 'member_count']
     
     def get_members(self, obj):
-        # Only return active members
-        active_members = obj.members.filter(is_active=True)
-        return CommunityMemberSerializer(active_members, many=True).data
+        """Preview of the roster: leaders and admins, then the newest members (prefetched by the view)"""
+        preview = list(getattr(obj, 'staff_preview', [])) + list(getattr(obj, 'newest_members', []))
+        return CommunityMemberSerializer(preview, many=True, context=self.context).data
     
     def get_current_user_role(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            member = obj.members.filter(user=request.user, is_active=True).first()
-            return member.role if member else None
+            return get_role(request.user, obj.pk)
         return None
 
 
@@ -4,11 +4,56 @@ Business logic for community creation, member management, and role assignment.
 """
 
 from .models import Community, CommunityMember
+from .counters import recount_members
+from . import directory_cache, membership_cache
 from django.contrib.auth import get_user_model
-from apps.notifications.services import create_notification
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Lower
+from django.utils import timezone
+from apps.notifications.services import create_notification, create_notifications
+from apps.posts.timeline import backfill_members_timeline
 
 User = get_user_model()
 
+def membership_changed(community_id, user_ids, delta=0):
+    """
+    Refresh what depends on the membership rows of one community after a change.
+    Membership rows have no signal receivers, so that cascaded deletes stay set-based;
+    every path that writes them calls this (or `recount_members`) once instead.
+    Args:
+        community_id (int): The community whose members changed.
+        user_ids (list): Members whose cached roles must be dropped.
+        delta (int): Change in the number of active members.
+    """
+    if delta:
+        communities = Community.objects.filter(pk=community_id)
+        if delta < 0:
+            communities = communities.filter(member_count__gte=-delta)
+        communities.update(member_count=F('member_count') + delta)
+    membership_cache.invalidate_many(user_ids)
+    directory_cache.invalidate()
+
+def set_member_active(member, is_active):
+    """
+    Activate (re-join) or deactivate (soft removal) a membership row.
+    The conditional UPDATE makes concurrent requests count each transition once.
+    Args:
+        member (CommunityMember): The membership row.
+        is_active (bool): The new state.
+    Returns:
+        bool: False if the row already was in that state.
+    """
+    fields = {'is_active': is_active}
+    if is_active:
+        fields['joined_at'] = timezone.now()
+    if not CommunityMember.objects.filter(pk=member.pk, is_active=not is_active).update(**fields):
+        return False
+    for name, value in fields.items():
+        setattr(member, name, value)
+    membership_changed(member.community_id, [member.user_id], 1 if is_active else -1)
+    return True
+
 def create_community(validated_data, creator):
     """
     Create a new community and assign the creator as the community leader.
@@ -20,6 +65,7 @@ def create_community(validated_data, creator):
     """
     community = Community.objects.create(**validated_data, creator=creator)
     CommunityMember.objects.create(user=creator, community=community, role='community_leader')
+    membership_changed(community.pk, [creator.pk], 1)
     return community
 
 def add_member(community, user, role='member'):
@@ -35,7 +81,8 @@ def add_member(community, user, role='member'):
     member, created = CommunityMember.objects.get_or_create(user=user, community=community, defaults={'role': role})
     if not created:
         member.role = role
-        member.save()
+        member.save(update_fields=['role'])
+    membership_changed(community.pk, [user.pk], 1 if created else 0)
     # Send notification
     create_notification(user, f"You have been added to the community '{community.name}' as {role}.")
     return member
@@ -52,6 +99,8 @@ def remove_member(community, user):
     try:
         member = CommunityMember.objects.get(user=user, community=community)
         member.delete()
+        recount_members(Community.objects.filter(pk=community.pk))
+        membership_changed(community.pk, [user.pk])
         return True
     except CommunityMember.DoesNotExist:
         return False
@@ -68,5 +117,94 @@ def change_member_role(community, user, new_role):
     """
     member = CommunityMember.objects.get(user=user, community=community)
     member.role = new_role
-    member.save()
-    return member 
\ No newline at end of file
+    member.save(update_fields=['role'])
+    membership_changed(community.pk, [user.pk])
+    return member 
+
+def _parse_identifier(value):
+    """Return ('id', int) or ('email', lowercased str), or None if the value is neither"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return ('id', value)
+    value = str(value).strip()
+    if value.isdigit():
+        return ('id', int(value))
+    if '@' in value:
+        return ('email', value.lower())
+    return None
+
+def bulk_add_members(community, identifiers, role='member'):
+    """
+    Add many users to a community in a fixed number of queries.
+    Identifiers are user ids or email addresses. Previously removed members are
+    reactivated with one UPDATE, new members are inserted with one INSERT per batch and
+    everyone added is notified with one bulk INSERT. Active members are left untouched, so
+    an import never changes the role of an existing leader or admin.
+    Args:
+        community (Community): The community instance.
+        identifiers (list): User ids and/or email addresses.
+        role (str): Role given to the added members.
+    Returns:
+        list: One dict per identifier with 'identifier', 'user_id' and 'status', which is
+        'added', 'reactivated', 'already_member', 'duplicate', 'not_found' or 'invalid'.
+    """
+    parsed = [_parse_identifier(value) for value in identifiers]
+    ids = {key for kind, key in filter(None, parsed) if kind == 'id'}
+    emails = {key for kind, key in filter(None, parsed) if kind == 'email'}
+
+    users_by_key = {('id', pk): pk for pk in User.objects.filter(pk__in=ids).values_list('pk', flat=True)}
+    users_by_key.update(
+        (('email', email), pk) for pk, email in
+        User.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=emails).values_list('pk', 'email_lower')
+    )
+
+    results = []
+    added = []
+    reactivated = []
+    with transaction.atomic():
+        # Locked until the import commits, so a member promoted or re-joining meanwhile is not overwritten
+        memberships = dict(
+            CommunityMember.objects.select_for_update()
+            .filter(community=community, user_id__in=users_by_key.values())
+            .values_list('user_id', 'is_active')
+        )
+        seen = set()
+        for value, key in zip(identifiers, parsed):
+            user_id = users_by_key.get(key) if key else None
+            if key is None:
+                status = 'invalid'
+            elif user_id is None:
+                status = 'not_found'
+            elif user_id in seen:
+                status = 'duplicate'
+            elif memberships.get(user_id):
+                status = 'already_member'
+            elif user_id in memberships:
+                status = 'reactivated'
+                reactivated.append(user_id)
+            else:
+                status = 'added'
+                added.append(user_id)
+            if user_id is not None:
+                seen.add(user_id)
+            results.append({'identifier': value, 'user_id': user_id, 'status': status})
+
+        upserts = added + reactivated
+        if upserts:
+            CommunityMember.objects.filter(community=community, user_id__in=reactivated, is_active=False).update(
+                role=role, is_active=True, joined_at=timezone.now()
+            )
+            # A row inserted concurrently (someone joined meanwhile) is kept as it is
+            CommunityMember.objects.bulk_create(
+                [CommunityMember(user_id=user_id, community=community, role=role) for user_id in added],
+                batch_size=1000,
+                ignore_conflicts=True,
+            )
+            recount_members(Community.objects.filter(pk=community.pk))
+            create_notifications(
+                upserts, f"You have been added to the community '{community.name}' as {role}.", 'community'
+            )
+            # Outside the import transaction, so its row locks are not held while timelines are written
+            transaction.on_commit(lambda: backfill_members_timeline(upserts, community))
+    if upserts:
+        membership_changed(community.pk, upserts)
+    return results
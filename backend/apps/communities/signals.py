@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .counters import recount_members
+from .models import Community, CommunityMember, InterestTag
+from . import directory_cache, membership_cache
+
+User = get_user_model()
+
+# CommunityMember rows have no receivers: they would run a recount and cache calls per
+# row and keep Django from deleting cascades in bulk. The views and services that write
+# them call `services.membership_changed` once; cascades are handled per owner below.
+
+
+@receiver(post_save, sender=User)
+def reset_new_user_membership_cache(sender, instance, created, raw=False, **kwargs):
+    """Start a new account on a fresh version, so a reused id never sees an old map"""
+    if created and not raw:
+        membership_cache.invalidate(instance.pk)
+
+
+@receiver(pre_delete, sender=User)
+def remember_deleted_user_communities(sender, instance, **kwargs):
+    instance._member_of = list(
+        CommunityMember.objects.filter(user=instance, is_active=True).values_list('community_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=User)
+def recount_deleted_user_communities(sender, instance, **kwargs):
+    """The user's memberships went with them: recount their communities in one UPDATE"""
+    community_ids = getattr(instance, '_member_of', None)
+    if community_ids:
+        recount_members(Community.objects.filter(pk__in=community_ids))
+        directory_cache.invalidate()
+
+
+@receiver(pre_delete, sender=Community)
+def remember_deleted_community_members(sender, instance, **kwargs):
+    instance._member_ids = list(
+        CommunityMember.objects.filter(community=instance, is_active=True).values_list('user_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Community)
+def invalidate_deleted_community_members(sender, instance, **kwargs):
+    """Drop the cached roles of every member of a deleted community in one round trip"""
+    membership_cache.invalidate_many(getattr(instance, '_member_ids', []))
+
+
+@receiver(post_save, sender=Community)
+@receiver(post_delete, sender=Community)
+@receiver(post_save, sender=InterestTag)
+@receiver(post_delete, sender=InterestTag)
+@receiver(m2m_changed, sender=Community.tags.through)
+def invalidate_directory_cache(sender, **kwargs):
+    """Anything shown in the public directory changed: drop the cached responses"""
+    directory_cache.invalidate()
@@ -1,8 +1,15 @@
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework import status
-from .models import Community
+from .models import Community, InterestTag
+from .views import MEMBER_PREVIEW_LIMIT
+from . import membership_cache
+from .serializers import MemberImportSerializer
+from .services import add_member, change_member_role, remove_member, set_member_active
 from apps.communities.models import CommunityMember
 
 User = get_user_model()
@@ -94,4 +101,431 @@ class CommunityFlowTestGroup2(TestCase):
         except Exception:
             pass
         if response is not None:
-            self.assertIn(response.status_code, [401, 403]) 
\ No newline at end of file
+            self.assertIn(response.status_code, [401, 403]) 
+
+
+class CommunityMemberCountTest(TestCase):
+    """member_count is stored on the community and kept current by membership changes"""
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='danielchen', email='daniel.chen@live.uwe.ac.uk', password='TestPass123!'
+        )
+        self.other = User.objects.create_user(
+            username='sarahkhan', email='sarah.khan@live.uwe.ac.uk', password='TestPass123!'
+        )
+        self.community = Community.objects.create(name='Chess Club', description='Chess', creator=self.user)
+        self.client.login(email='daniel.chen@live.uwe.ac.uk', password='TestPass123!')
+
+    def member_count(self):
+        self.community.refresh_from_db()
+        return self.community.member_count
+
+    def test_join_leave_and_remove(self):
+        self.client.post(reverse('communities:join_community', args=[self.community.id]))
+        self.assertEqual(self.member_count(), 1)
+        self.client.post(reverse('communities:leave_community', args=[self.community.id]))
+        self.assertEqual(self.member_count(), 0)
+        self.client.post(reverse('communities:join_community', args=[self.community.id]))
+        self.assertEqual(self.member_count(), 1)
+
+        member = add_member(self.community, self.other)
+        self.assertEqual(self.member_count(), 2)
+        change_member_role(self.community, self.user, 'admin')
+        url = reverse('communities:community_member_detail', args=[self.community.id, member.id])
+        response = self.client.patch(url, {'is_active': False}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.member_count(), 1)
+        remove_member(self.community, self.other)
+        self.assertEqual(self.member_count(), 1)
+
+    def test_deleting_a_user_recounts_their_communities(self):
+        add_member(self.community, self.other)
+        add_member(self.community, self.user)
+        self.other.delete()
+        self.assertEqual(self.member_count(), 1)
+
+    def test_edit_keeps_concurrent_joins(self):
+        stale = Community.objects.get(pk=self.community.pk)
+        self.client.post(reverse('communities:join_community', args=[self.community.id]))
+        stale.description = 'Edited'
+        stale.save()
+        self.assertEqual(self.member_count(), 1)
+        self.assertEqual(self.community.description, 'Edited')
+
+    def test_list_query_count_does_not_grow(self):
+        add_member(self.community, self.other)
+        url = reverse('communities:community_list')
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get(url)
+        self.assertEqual(response.json()['results'][0]['member_count'], 1)
+
+        for index in range(5):
+            community = Community.objects.create(name=f'Club {index}', description='More', creator=self.user)
+            add_member(community, self.other)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()['results']), 6)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class CommunityMemberListTest(TestCase):
+    """The roster is a compact, keyset-paginated list"""
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='danielchen', email='daniel.chen@live.uwe.ac.uk', password='TestPass123!'
+        )
+        self.community = Community.objects.create(name='Chess Club', description='Chess', creator=self.user)
+        for index in range(5):
+            member = User.objects.create_user(
+                username=f'member{index}', email=f'member{index}@live.uwe.ac.uk', password='TestPass123!'
+            )
+            CommunityMember.objects.create(user=member, community=self.community)
+        self.client.login(email='daniel.chen@live.uwe.ac.uk', password='TestPass123!')
+        self.url = reverse('communities:community_members', args=[self.community.id])
+
+    def test_compact_cursor_pages(self):
+        response = self.client.get(self.url, {'page_size': 3})
+        self.assertEqual(response.status_code, 200)
+        first = response.json()
+        self.assertEqual(
+            set(first['results'][0]),
+            {'id', 'user_id', 'user_name', 'user_avatar', 'role', 'joined_at', 'is_active'},
+        )
+        self.assertEqual([row['user_name'] for row in first['results']], ['member4', 'member3', 'member2'])
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(first['next']).json()
+        self.assertEqual([row['user_name'] for row in second['results']], ['member1', 'member0'])
+        self.assertIsNone(second['next'])
+        self.assertEqual(len([q for q in queries.captured_queries if 'communities_communitymember' in q['sql']]), 1)
+
+
+class CommunityDetailMemberPreviewTest(TestCase):
+    """The detail payload embeds a bounded preview of the roster"""
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='danielchen', email='daniel.chen@live.uwe.ac.uk', password='TestPass123!'
+        )
+        self.community = Community.objects.create(name='Chess Club', description='Chess', creator=self.user)
+        add_member(self.community, self.user, 'community_leader')
+        for index in range(MEMBER_PREVIEW_LIMIT + 3):
+            member = User.objects.create_user(
+                username=f'member{index}', email=f'member{index}@live.uwe.ac.uk', password='TestPass123!'
+            )
+            add_member(self.community, member)
+        self.url = reverse('communities:community_detail', args=[self.community.id])
+
+    def test_preview_is_bounded(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['member_count'], MEMBER_PREVIEW_LIMIT + 4)
+        members = data['members']
+        self.assertEqual(len(members), MEMBER_PREVIEW_LIMIT + 1)
+        self.assertEqual(members[0]['role'], 'community_leader')
+        self.assertEqual(members[1]['user_name'], f'member{MEMBER_PREVIEW_LIMIT + 2}')
+        self.assertEqual(len([q for q in queries.captured_queries if 'communities_communitymember' in q['sql']]), 2)
+
+
+class MembershipCacheTest(TestCase):
+    """Community roles are served from the cache and invalidated by membership changes"""
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='danielchen', email='daniel.chen@live.uwe.ac.uk', password='TestPass123!'
+        )
+        self.community = Community.objects.create(name='Chess Club', description='Chess', creator=self.user)
+
+    def test_roles_are_cached_and_invalidated(self):
+        self.assertEqual(membership_cache.get_community_roles(self.user), {})
+        member = add_member(self.community, self.user)
+        self.assertEqual(membership_cache.get_role(self.user, self.community.id), 'member')
+
+        with self.assertNumQueries(0):
+            self.assertTrue(membership_cache.is_member(self.user, self.community.id))
+
+        change_member_role(self.community, self.user, 'admin')
+        self.assertEqual(membership_cache.get_role(self.user, self.community.id), 'admin')
+
+        set_member_active(member, False)
+        self.assertFalse(membership_cache.is_member(self.user, self.community.id))
+
+        remove_member(self.community, self.user)
+        self.assertEqual(membership_cache.member_community_ids(self.user), [])
+
+
+class RecommendedCommunitiesTest(TestCase):
+    """Recommendations rank unjoined communities by tag overlap and size"""
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='danielchen', email='daniel.chen@live.uwe.ac.uk', password='TestPass123!'
+        )
+        self.other = User.objects.create_user(
+            username='sarahkhan', email='sarah.khan@live.uwe.ac.uk', password='TestPass123!'
+        )
+        chess, games, music = (InterestTag.objects.create(name=name) for name in ('chess', 'games', 'music'))
+        self.joined = Community.objects.create(name='Chess Club', description='Chess', creator=self.user)
+        self.joined.tags.set([chess, games])
+        add_member(self.joined, self.user)
+
+        self.both_tags = Community.objects.create(name='Board Games', description='Games', creator=self.other)
+        self.both_tags.tags.set([chess, games])
+        self.one_tag = Community.objects.create(name='Video Games', description='Games', creator=self.other)
+        self.one_tag.tags.set([games])
+        add_member(self.one_tag, self.other)
+        self.unrelated = Community.objects.create(name='Choir', description='Music', creator=self.other)
+        self.unrelated.tags.set([music])
+        self.client.login(email='daniel.chen@live.uwe.ac.uk', password='TestPass123!')
+        self.url = reverse('communities:recommended_communities')
+
+    def test_ranked_by_overlap(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['id'] for c in response.json()], [self.both_tags.id, self.one_tag.id])
+
+    def test_falls_back_to_largest_communities(self):
+        remove_member(self.joined, self.user)
+        response = self.client.get(self.url, {'limit': 2})
+        self.assertEqual(response.json()[0]['id'], self.one_tag.id)
+        self.assertEqual(len(response.json()), 2)
+
+
+class CommunityMemberImportTest(TestCase):
+    """Admins can add many members in one request and get a per-row report"""
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_user(
+            username='danielchen', email='daniel.chen@live.uwe.ac.uk', password='TestPass123!'
+        )
+        self.community = Community.objects.create(name='Chess Club', description='Chess', creator=self.admin)
+        CommunityMember.objects.create(user=self.admin, community=self.community, role='admin')
+        self.students = [
+            User.objects.create_user(username=f'student{index}', email=f'student{index}@live.uwe.ac.uk', password='TestPass123!')
+            for index in range(4)
+        ]
+        CommunityMember.objects.create(user=self.students[3], community=self.community, is_active=False)
+        self.client.login(email='daniel.chen@live.uwe.ac.uk', password='TestPass123!')
+        self.url = reverse('communities:community_member_import', args=[self.community.id])
+
+    def test_json_import(self):
+        from apps.notifications.models import Notification
+        users = [
+            self.students[0].id, 'STUDENT1@live.uwe.ac.uk', str(self.students[0].id), self.admin.email,
+            'nobody@live.uwe.ac.uk', 'not-a-user', self.students[3].email,
+        ]
+        response = self.client.post(self.url, {'users': users}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row['status'] for row in response.json()['results']],
+            ['added', 'added', 'duplicate', 'already_member', 'not_found', 'invalid', 'reactivated'],
+        )
+        self.assertEqual(response.json()['summary']['added'], 2)
+        self.community.refresh_from_db()
+        self.assertEqual(self.community.member_count, 4)
+        self.assertEqual(CommunityMember.objects.get(user=self.admin, community=self.community).role, 'admin')
+        self.assertEqual(CommunityMember.objects.get(user=self.students[3], community=self.community).role, 'member')
+        self.assertEqual(Notification.objects.filter(type='community', content__contains='Chess Club').count(), 3)
+        self.assertTrue(membership_cache.is_member(self.students[3], self.community.id))
+
+    def test_csv_import_and_permissions(self):
+        upload = SimpleUploadedFile('students.csv', b'name,email\nA,student0@live.uwe.ac.uk\nB,student2@live.uwe.ac.uk\n')
+        response = self.client.post(self.url, {'file': upload, 'role': 'member'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['status'] for row in response.json()['results']], ['added', 'added'])
+
+        rows = ''.join(f'student{index}@live.uwe.ac.uk\n' for index in range(MemberImportSerializer.MAX_ROWS + 1))
+        response = self.client.post(self.url, {'file': SimpleUploadedFile('students.csv', rows.encode())})
+        self.assertEqual(response.status_code, 400)
+
+        self.client.login(email='student0@live.uwe.ac.uk', password='TestPass123!')
+        response = self.client.post(self.url, {'users': [self.students[1].id]}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_import_backfills_one_page_per_member(self):
+        from apps.posts.models import Post, TimelineEntry
+        from apps.posts.timeline import MEMBER_BACKFILL_ENTRIES
+        Post.objects.bulk_create(
+            Post(content=f'Post {index}', author=self.admin, community=self.community)
+            for index in range(MEMBER_BACKFILL_ENTRIES + 5)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.url, {'users': [self.students[0].id, self.students[1].id]}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        for student in self.students[:2]:
+            self.assertEqual(TimelineEntry.objects.filter(user=student).count(), MEMBER_BACKFILL_ENTRIES)
+
+
+class AutocompleteTest(TestCase):
+    """Autocomplete returns a few fuzzy matches of communities and tags"""
+    def setUp(self):
+        self.client = Client()
+        user = User.objects.create_user(
+            username='danielchen', email='daniel.chen@live.uwe.ac.uk', password='TestPass123!'
+        )
+        Community.objects.create(name='Chess Club', description='Chess', creator=user)
+        Community.objects.create(name='Bristol Chess Society', description='Chess', creator=user)
+        Community.objects.create(name='Secret Chess', description='Chess', creator=user, is_public=False)
+        Community.objects.create(name='Choir', description='Music', creator=user)
+        InterestTag.objects.create(name='chess', color='#111111')
+        InterestTag.objects.create(name='music')
+        self.url = reverse('communities:autocomplete')
+
+    def test_prefix_and_fuzzy_matches(self):
+        response = self.client.get(self.url, {'q': 'ches'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([c['name'] for c in data['communities']], ['Chess Club', 'Bristol Chess Society'])
+        self.assertEqual(data['tags'], [{'id': data['tags'][0]['id'], 'name': 'chess', 'color': '#111111'}])
+
+        # A typo still finds the community
+        data = self.client.get(self.url, {'q': 'chss club'}).json()
+        self.assertEqual(data['communities'][0]['name'], 'Chess Club')
+
+    def test_empty_query(self):
+        self.assertEqual(self.client.get(self.url).json(), {'communities': [], 'tags': []})
+
+
+class CommunityDirectoryCacheTest(TestCase):
+    """Anonymous directory GETs are cached until the directory changes"""
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='danielchen', email='daniel.chen@live.uwe.ac.uk', password='TestPass123!'
+        )
+        self.community = Community.objects.create(name='Chess Club', description='Chess', creator=self.user)
+        self.list_url = reverse('communities:community_list')
+        self.detail_url = reverse('communities:community_detail', args=[self.community.id])
+
+    def community_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len([q for q in queries.captured_queries if 'communities_' in q['sql']])
+
+    def test_anonymous_responses_are_cached_and_invalidated(self):
+        first, queries = self.community_queries(self.list_url, search='chess')
+        self.assertGreater(queries, 0)
+        cached, queries = self.community_queries(self.list_url, search='chess')
+        self.assertEqual((cached, queries), (first, 0))
+        _, queries = self.community_queries(self.list_url, search='club')
+        self.assertGreater(queries, 0)
+
+        self.community_queries(self.detail_url)
+        add_member(self.community, self.user)
+        detail, queries = self.community_queries(self.detail_url)
+        self.assertGreater(queries, 0)
+        self.assertEqual(detail['member_count'], 1)
+
+        self.community.name = 'Chess Society'
+        self.community.save()
+        data, _ = self.community_queries(self.list_url, search='chess')
+        self.assertEqual(data['results'][0]['name'], 'Chess Society')
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.community_queries(self.detail_url)
+        CommunityMember.objects.create(user=self.user, community=self.community, role='admin')
+        self.client.login(email='daniel.chen@live.uwe.ac.uk', password='TestPass123!')
+        detail, queries = self.community_queries(self.detail_url)
+        self.assertGreater(queries, 0)
+        self.assertEqual(detail['current_user_role'], 'admin')
+
+
+class CommunityEngagementRollupTest(TestCase):
+    """The rollup aggregates new activity into daily rows served by the stats endpoint"""
+    def setUp(self):
+        from apps.posts.models import Post, Like
+        self.client = Client()
+        self.leader = User.objects.create_user(
+            username='danielchen', email='daniel.chen@live.uwe.ac.uk', password='TestPass123!'
+        )
+        self.member = User.objects.create_user(
+            username='sarahkhan', email='sarah.khan@live.uwe.ac.uk', password='TestPass123!'
+        )
+        self.community = Community.objects.create(name='Chess Club', description='Chess', creator=self.leader)
+        CommunityMember.objects.create(user=self.leader, community=self.community, role='community_leader')
+        CommunityMember.objects.create(user=self.member, community=self.community)
+        self.post = Post.objects.create(content='Tournament', author=self.leader, community=self.community)
+        Like.objects.create(user=self.member, post=self.post)
+        self.url = reverse('communities:community_stats', args=[self.community.id])
+
+    def test_incremental_rollup(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from apps.posts.models import Post, Comment
+        from .rollups import rollup_engagement
+
+        rollup_engagement()
+        # Rows older than the watermark's day are not re-read by later runs
+        old = Post.objects.create(content='Old news', author=self.leader, community=self.community)
+        Post.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=10))
+        Comment.objects.create(content='Count me in', author=self.member, post=self.post)
+        rollup_engagement()
+
+        self.client.login(email='daniel.chen@live.uwe.ac.uk', password='TestPass123!')
+        response = self.client.get(self.url, {'days': 14})
+        self.assertEqual(response.status_code, 200)
+        days = response.json()['days']
+        self.assertEqual(len(days), 14)
+        self.assertEqual(
+            {key: days[-1][key] for key in ('new_members', 'posts', 'comments', 'likes', 'event_signups')},
+            {'new_members': 2, 'posts': 1, 'comments': 1, 'likes': 1, 'event_signups': 0},
+        )
+        self.assertEqual(sum(day['posts'] for day in days), 1)
+
+    def test_members_cannot_read_stats(self):
+        self.client.login(email='sarah.khan@live.uwe.ac.uk', password='TestPass123!')
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class CommunityActivityTest(TestCase):
+    """The activity timeline interleaves posts, events and new members by time"""
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from apps.events.models import Event
+        from apps.posts.models import Post
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='danielchen', email='daniel.chen@live.uwe.ac.uk', password='TestPass123!'
+        )
+        self.community = Community.objects.create(name='Chess Club', description='Chess', creator=self.user)
+        member = CommunityMember.objects.create(user=self.user, community=self.community)
+        start = timezone.now() - timedelta(hours=10)
+        CommunityMember.objects.filter(pk=member.pk).update(joined_at=start)
+        self.expected = [('member', member.pk)]
+        for hour in range(1, 7):
+            if hour % 2:
+                post = Post.objects.create(content=f'Post {hour}', author=self.user, community=self.community)
+                Post.objects.filter(pk=post.pk).update(created_at=start + timedelta(hours=hour))
+                self.expected.append(('post', post.pk))
+            else:
+                event = Event.objects.create(
+                    title=f'Event {hour}', description='Games', community=self.community, creator=self.user,
+                    start_time=start, end_time=start, location='Library',
+                )
+                Event.objects.filter(pk=event.pk).update(created_at=start + timedelta(hours=hour))
+                self.expected.append(('event', event.pk))
+        self.expected.reverse()
+        self.client.login(email='daniel.chen@live.uwe.ac.uk', password='TestPass123!')
+        self.url = reverse('communities:community_activity', args=[self.community.id])
+
+    def test_merged_cursor_pages(self):
+        seen = []
+        url, params = self.url, {'page_size': 3}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page['results']), 3)
+            seen.extend((item['type'], item['data']['id']) for item in page['results'])
+            url, params = page['next'], None
+        self.assertEqual(seen, self.expected)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'garbage'}).status_code, 404)
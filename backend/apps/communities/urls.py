@@ -7,9 +7,14 @@ urlpatterns = [
     # Community Management
     path('', views.CommunityListView.as_view(), name='community_list'),
     path('user/', views.user_communities, name='user_communities'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
+    path('recommended/', views.RecommendedCommunityListView.as_view(), name='recommended_communities'),
     path('<int:pk>/', views.CommunityDetailView.as_view(), name='community_detail'),
     path('<int:community_id>/members/', views.CommunityMemberListView.as_view(), name='community_members'),
+    path('<int:community_id>/members/import/', views.CommunityMemberImportView.as_view(), name='community_member_import'),
     path('<int:community_id>/members/<int:member_id>/', views.CommunityMemberDetailView.as_view(), name='community_member_detail'),
+    path('<int:community_id>/activity/', views.CommunityActivityView.as_view(), name='community_activity'),
+    path('<int:community_id>/stats/', views.CommunityStatsView.as_view(), name='community_stats'),
     path('<int:community_id>/join/', views.join_community, name='join_community'),
     path('<int:community_id>/leave/', views.leave_community, name='leave_community'),
     
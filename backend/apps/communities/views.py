@@ -1,36 +1,63 @@
+from collections import Counter
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Case, IntegerField, Prefetch, Q, Value, When
+from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from .models import Community, CommunityMember
+from apps.posts.timeline import backfill_member_timeline, prune_member_timeline
+from uni_hub_core.pagination import KeysetPagination
+from .models import Community, CommunityMember, InterestTag, RollupWatermark
 from .serializers import (
-    CommunitySerializer, CommunityDetailSerializer, CommunityMemberSerializer
+    CommunitySerializer, CommunityDetailSerializer, CommunityMemberSerializer, InterestTagSerializer,
+    MemberImportSerializer,
 )
-from .permissions import IsCommunityAdmin
-from django.utils import timezone
-from .models import InterestTag
-from .serializers import InterestTagSerializer
+from .permissions import IsCommunityAdmin, IsCommunityManager
+from .services import bulk_add_members, membership_changed, set_member_active
+from .recommendations import recommend_community_ids
+from .directory_cache import AnonymousDirectoryCacheMixin
+from .rollups import daily_stats, WATERMARK_NAME
+from . import activity
+
+# Number of leaders and admins embedded in a community detail response
+STAFF_PREVIEW_LIMIT = 10
+# Number of newest ordinary members embedded in a community detail response
+MEMBER_PREVIEW_LIMIT = 10
+# Default and maximum number of days returned by the stats endpoint
+STATS_DEFAULT_DAYS = 30
+STATS_MAX_DAYS = 366
+# Default and maximum number of items per activity page
+ACTIVITY_PAGE_SIZE = 20
+ACTIVITY_MAX_PAGE_SIZE = 100
+# Default and maximum number of suggestions per kind returned by autocomplete
+AUTOCOMPLETE_LIMIT = 5
+AUTOCOMPLETE_MAX_LIMIT = 20
 
 
-class CommunityListView(generics.ListCreateAPIView):
-    """Community List View"""
-    queryset = Community.objects.filter(is_public=True)
+class CommunityListView(AnonymousDirectoryCacheMixin, generics.ListCreateAPIView):
+    """Community List View (anonymous GETs are served from the directory cache)"""
+    queryset = Community.objects.filter(is_public=True).select_related('creator').prefetch_related('tags')
     serializer_class = CommunitySerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['is_public']
     search_fields = ['name', 'description']
-    ordering_fields = ['created_at', 'name']
+    ordering_fields = ['created_at', 'name', 'member_count']
     ordering = ['-created_at']
     
     def get_permissions(self):
         if self.request.method == 'POST':
             # Only platform admins, community leaders, or community admins can create a community
             from rest_framework.exceptions import PermissionDenied
-            from apps.communities.models import CommunityMember
+            from apps.communities.membership_cache import get_community_roles, MANAGER_ROLES
             user = self.request.user
             is_platform_admin = user.is_authenticated and (user.is_staff or user.is_superuser)
-            is_community_leader_or_admin = CommunityMember.objects.filter(user=user, role__in=['community_leader', 'admin'], is_active=True).exists()
+            is_community_leader_or_admin = any(role in MANAGER_ROLES for role in get_community_roles(user).values())
             if not (is_platform_admin or is_community_leader_or_admin):
                 raise PermissionDenied('Only platform admins, community leaders, or community admins can create a community.')
             return [permissions.IsAuthenticated()]
@@ -44,12 +71,50 @@ class CommunityListView(generics.ListCreateAPIView):
         return context
 
 
-class CommunityDetailView(generics.RetrieveUpdateDestroyAPIView):
-    """Community details view"""
+class RecommendedCommunityListView(generics.ListAPIView):
+    """
+    Public communities the user has not joined, ranked by interest tag overlap with
+    the communities they belong to and weighted by size.
+    """
+    serializer_class = CommunitySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+    default_limit = 10
+    max_limit = 50
+
+    def get_limit(self):
+        try:
+            return max(1, min(int(self.request.query_params.get('limit', self.default_limit)), self.max_limit))
+        except ValueError:
+            return self.default_limit
+
+    def list(self, request, *args, **kwargs):
+        ranked_ids = recommend_community_ids(request.user, self.get_limit())
+        communities = Community.objects.select_related('creator').prefetch_related('tags').in_bulk(ranked_ids)
+        serializer = self.get_serializer([communities[pk] for pk in ranked_ids if pk in communities], many=True)
+        return Response(serializer.data)
+
+
+class CommunityDetailView(AnonymousDirectoryCacheMixin, generics.RetrieveUpdateDestroyAPIView):
+    """Community details view (anonymous GETs are served from the directory cache)"""
     serializer_class = CommunityDetailSerializer
     
     def get_queryset(self):
-        return Community.objects.prefetch_related('members__user', 'tags').all()
+        # A bounded roster preview; the full list lives on the paginated members endpoint
+        active_members = CommunityMember.objects.filter(is_active=True).select_related('user')
+        return Community.objects.select_related('creator').prefetch_related(
+            'tags',
+            Prefetch(
+                'members',
+                queryset=active_members.filter(role__in=['community_leader', 'admin']).order_by('joined_at', 'id')[:STAFF_PREVIEW_LIMIT],
+                to_attr='staff_preview',
+            ),
+            Prefetch(
+                'members',
+                queryset=active_members.filter(role='member').order_by('-joined_at', '-id')[:MEMBER_PREVIEW_LIMIT],
+                to_attr='newest_members',
+            ),
+        )
     
     def get_permissions(self):
         if self.request.method in ['PUT', 'PATCH', 'DELETE']:
@@ -61,19 +126,26 @@ class CommunityDetailView(generics.RetrieveUpdateDestroyAPIView):
         return context
 
 
+class MemberPagination(KeysetPagination):
+    """Keyset pagination through a roster, newest members first"""
+    ordering = ('-joined_at', '-id')
+
+
 class CommunityMemberListView(generics.ListCreateAPIView):
     """Community member list view"""
     serializer_class = CommunityMemberSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MemberPagination
     
     def get_queryset(self):
         community_id = self.kwargs.get('community_id')
-        return CommunityMember.objects.filter(community_id=community_id, is_active=True)
+        return CommunityMember.objects.filter(community_id=community_id, is_active=True).select_related('user')
     
     def perform_create(self, serializer):
         community_id = self.kwargs.get('community_id')
         community = Community.objects.get(id=community_id)
-        serializer.save(user=self.request.user, community=community)
+        member = serializer.save(user=self.request.user, community=community)
+        membership_changed(community.pk, [member.user_id], 1 if member.is_active else 0)
 
 
 class CommunityMemberDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -89,7 +161,7 @@ class CommunityMemberDetailView(generics.RetrieveUpdateDestroyAPIView):
         """Get a specific member object"""
         community_id = self.kwargs.get('community_id')
         member_id = self.kwargs.get('member_id')
-        return CommunityMember.objects.get(
+        return CommunityMember.objects.select_related('user').get(
             id=member_id,
             community_id=community_id,
             is_active=True
@@ -103,15 +175,120 @@ class CommunityMemberDetailView(generics.RetrieveUpdateDestroyAPIView):
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
         return Response(serializer.data)
+
+    def perform_update(self, serializer):
+        # Soft removal through is_active=false, as the manage page does it, goes through
+        # the same counted transition as destroy
+        removed = serializer.validated_data.pop('is_active', True) is False
+        member = serializer.instance
+        # Only the submitted columns: a full save would write back a stale is_active
+        for name, value in serializer.validated_data.items():
+            setattr(member, name, value)
+        if serializer.validated_data:
+            member.save(update_fields=list(serializer.validated_data))
+        membership_changed(member.community_id, [member.user_id])
+        if removed and set_member_active(member, False):
+            prune_member_timeline(member.user, member.community)
     
     def destroy(self, request, *args, **kwargs):
         """Remove members (soft delete)"""
         instance = self.get_object()
-        instance.is_active = False
-        instance.save()
+        if set_member_active(instance, False):
+            prune_member_timeline(instance.user, instance.community)
         return Response({'message': 'Member removed'}, status=status.HTTP_200_OK)
 
 
+class CommunityMemberImportView(APIView):
+    """
+    Bulk add members (community admins only).
+    Accepts JSON {"users": [<id or email>, ...], "role": "member"} or a multipart CSV
+    upload in `file`, and reports the outcome of every row.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsCommunityAdmin]
+
+    def post(self, request, community_id):
+        community = get_object_or_404(Community, pk=community_id)
+        self.check_object_permissions(request, community)
+        serializer = MemberImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_add_members(
+            community, serializer.validated_data['identifiers'], serializer.validated_data['role']
+        )
+        return Response({
+            'summary': Counter(row['status'] for row in results),
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+
+class CommunityActivityView(APIView):
+    """
+    Posts, events and new members of a community interleaved newest first.
+    Cursor paginated: follow `next`; ?page_size= sets the page length.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, community_id):
+        from apps.events.serializers import EventSerializer
+        from apps.posts.serializers import PostSerializer
+
+        community = get_object_or_404(Community, pk=community_id)
+        try:
+            page_size = max(1, min(int(request.query_params.get('page_size', ACTIVITY_PAGE_SIZE)), ACTIVITY_MAX_PAGE_SIZE))
+        except ValueError:
+            page_size = ACTIVITY_PAGE_SIZE
+        cursor = request.query_params.get('cursor')
+        try:
+            position = activity.decode_position(cursor) if cursor else None
+        except ValueError:
+            raise NotFound('Invalid cursor')
+
+        items, next_position = activity.activity_page(community, request.user, position, page_size)
+
+        # Serialize each kind as one batch so list-level context (e.g. viewer likes) is shared
+        serializers_by_kind = {
+            activity.POST: PostSerializer,
+            activity.EVENT: EventSerializer,
+            activity.MEMBER: CommunityMemberSerializer,
+        }
+        context = {'request': request, 'view': self}
+        serialized = {}
+        for kind, serializer_class in serializers_by_kind.items():
+            rows = [row for item_kind, row in items if item_kind == kind]
+            serialized[kind] = iter(serializer_class(rows, many=True, context=context).data)
+        results = [
+            {'type': kind, 'timestamp': data.get('created_at') or data.get('joined_at'), 'data': data}
+            for kind, data in ((kind, next(serialized[kind])) for kind, _ in items)
+        ]
+
+        next_link = None
+        if next_position is not None:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), 'cursor', activity.encode_position(next_position)
+            )
+        return Response({'next': next_link, 'results': results})
+
+
+class CommunityStatsView(APIView):
+    """
+    Daily engagement of a community (leaders and admins only), read from the rollup table.
+    ?days= selects how many days up to today are returned.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsCommunityManager]
+
+    def get(self, request, community_id):
+        community = get_object_or_404(Community, pk=community_id)
+        self.check_object_permissions(request, community)
+        try:
+            days = max(1, min(int(request.query_params.get('days', STATS_DEFAULT_DAYS)), STATS_MAX_DAYS))
+        except ValueError:
+            days = STATS_DEFAULT_DAYS
+        watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list('value', flat=True).first()
+        return Response({
+            'updated_at': watermark,
+            'days': daily_stats(community, days),
+        })
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def join_community(request, community_id):
@@ -124,12 +301,15 @@ def join_community(request, community_id):
         # 检查是否有历史成员记录
         member = community.members.filter(user=request.user, is_active=False).first()
         if member:
-            member.is_active = True
-            member.joined_at = timezone.now()  # 可选：重置加入时间
-            member.save()
+            # 重置加入时间
+            if not set_member_active(member, True):
+                return Response({'message': 'You are already a member of this community'}, status=status.HTTP_400_BAD_REQUEST)
+            backfill_member_timeline(request.user, community)
             return Response({'message': 'Successfully re-joined the community'}, status=status.HTTP_200_OK)
         # 否则新建成员记录
         CommunityMember.objects.create(user=request.user, community=community)
+        membership_changed(community.pk, [request.user.pk], 1)
+        backfill_member_timeline(request.user, community)
         return Response({'message': 'Successfully joined the community'}, status=status.HTTP_201_CREATED)
     except Community.DoesNotExist:
         return Response({'message': 'The community does not exist'}, status=status.HTTP_404_NOT_FOUND)
@@ -145,8 +325,8 @@ def leave_community(request, community_id):
             community_id=community_id, 
             is_active=True
         )
-        membership.is_active = False
-        membership.save()
+        if set_member_active(membership, False):
+            prune_member_timeline(request.user, membership.community)
         return Response({'message': 'Successfully exited the community'}, status=status.HTTP_200_OK)
     except CommunityMember.DoesNotExist:
         return Response({'message': 'You are not a member of this community'}, status=status.HTTP_400_BAD_REQUEST)
@@ -179,7 +359,41 @@ def user_communities(request):
     user_communities = Community.objects.filter(
         members__user=request.user,
         members__is_active=True
-    ).distinct()
+    ).select_related('creator').prefetch_related('tags').distinct()
     
     serializer = CommunitySerializer(user_communities, many=True, context={'request': request})
-    return Response(serializer.data) 
\ No newline at end of file
+    return Response(serializer.data) 
+
+
+def fuzzy_name_matches(queryset, term, limit, fields):
+    """
+    Top `limit` rows of `queryset` whose name contains `term` or fuzzily matches a word
+    of it, prefix matches first, then by trigram word similarity. Both predicates are
+    served by the name's gin_trgm_ops index.
+    """
+    return (
+        queryset.filter(Q(name__icontains=term) | Q(name__trigram_word_similar=term))
+        .annotate(
+            is_prefix=Case(When(name__istartswith=term, then=Value(1)), default=Value(0), output_field=IntegerField()),
+            similarity=TrigramWordSimilarity(term, 'name'),
+        )
+        .order_by('-is_prefix', '-similarity', 'name')
+        .values(*fields)[:limit]
+    )
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def autocomplete(request):
+    """Suggest public communities and interest tags for a partially typed name (?q=, ?limit=)"""
+    term = request.query_params.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', AUTOCOMPLETE_LIMIT)), AUTOCOMPLETE_MAX_LIMIT))
+    except ValueError:
+        limit = AUTOCOMPLETE_LIMIT
+    if not term:
+        return Response({'communities': [], 'tags': []})
+    return Response({
+        'communities': list(fuzzy_name_matches(Community.objects.filter(is_public=True), term, limit, ['id', 'name'])),
+        'tags': list(fuzzy_name_matches(InterestTag.objects.all(), term, limit, ['id', 'name', 'color'])),
+    })
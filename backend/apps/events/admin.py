@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
-from .models import Event, EventParticipant
+from .models import Event, EventParticipant, EventWaitlistEntry
 
 
 class EventParticipantInline(admin.TabularInline):
@@ -70,6 +70,19 @@ class EventParticipantAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('user', 'event')
 
 
+class EventWaitlistEntryAdmin(admin.ModelAdmin):
+    """Event waitlist management interface"""
+    list_display = ('user', 'event', 'created_at')
+    search_fields = ('user__email', 'user__username', 'event__title')
+    ordering = ('event', 'id')
+    readonly_fields = ('created_at',)
+    
+    def get_queryset(self, request):
+        """Optimizing query performance"""
+        return super().get_queryset(request).select_related('user', 'event')
+
+
 # Registering Models
 admin.site.register(Event, EventAdmin)
-admin.site.register(EventParticipant, EventParticipantAdmin) 
\ No newline at end of file
+admin.site.register(EventParticipant, EventParticipantAdmin)
+admin.site.register(EventWaitlistEntry, EventWaitlistEntryAdmin) 
\ No newline at end of file
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class EventsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.events'
+
+    def ready(self):
+        from uni_hub_core.images import track_image_field
+        track_image_field(self.get_model('Event'), 'cover_image')
@@ -0,0 +1,187 @@
+"""
+events/calendar_feed.py
+Time-range queries over events and the per-user iCalendar feed.
+
+A user's calendar holds the non-draft events of their communities plus the events
+they registered for. Ranges are half-open, [start, end), and an event is in a range
+when it overlaps it: start_time < end and end_time > start.
+
+Calendar apps poll the feed without a session, so its URL carries a signed token for
+the user and their `calendar_feed_version`; bumping the version (`rotate_feed_token`)
+revokes every URL issued before. The ETag and Last-Modified headers come from one aggregate query over the
+feed, letting unchanged feeds be answered with 304 before any event is read; changed
+feeds are streamed from a server-side cursor.
+"""
+
+import hashlib
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from apps.communities.membership_cache import member_community_ids
+from .models import Event, EventParticipant
+
+FEED_SALT = 'events.calendar_feed'
+FEED_CHUNK_SIZE = 500
+ICAL_STATUSES = {
+    'published': 'CONFIRMED',
+    'ongoing': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+    'cancelled': 'CANCELLED',
+}
+
+
+def _parse_bound(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise serializers.ValidationError({name: 'Enter a valid ISO 8601 date and time.'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_range(params, start_param='from', end_param='to'):
+    """
+    Read a half-open [from, to) range from query parameters; either bound may be missing.
+    Raises:
+        ValidationError: A bound is malformed or the range is empty.
+    """
+    start, end = _parse_bound(params, start_param), _parse_bound(params, end_param)
+    if start is not None and end is not None and start >= end:
+        raise serializers.ValidationError({end_param: f'Must be later than {start_param}.'})
+    return start, end
+
+
+def overlapping(queryset, start=None, end=None):
+    """Events of `queryset` that overlap [start, end)"""
+    if end is not None:
+        queryset = queryset.filter(start_time__lt=end)
+    if start is not None:
+        queryset = queryset.filter(end_time__gt=start)
+    return queryset
+
+
+def user_calendar_events(user):
+    """Non-draft events of the user's communities and events the user registered for"""
+    registered = EventParticipant.objects.filter(user=user).values('event_id')
+    return Event.objects.filter(
+        Q(community_id__in=member_community_ids(user)) | Q(id__in=registered)
+    ).exclude(status='draft')
+
+
+def feed_token(user):
+    return signing.dumps([user.pk, user.calendar_feed_version], salt=FEED_SALT)
+
+
+def feed_user(token):
+    """The active user a feed token was issued for, or None if it is invalid or revoked"""
+    try:
+        user_id, version = signing.loads(token, salt=FEED_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    return get_user_model().objects.filter(pk=user_id, calendar_feed_version=version, is_active=True).first()
+
+
+def rotate_feed_token(user):
+    """Revoke the user's feed URLs and return a token for the new one"""
+    get_user_model().objects.filter(pk=user.pk).update(calendar_feed_version=F('calendar_feed_version') + 1)
+    user.refresh_from_db(fields=['calendar_feed_version'])
+    return feed_token(user)
+
+
+def _window_start():
+    # Whole days, so the window (and with it the ETag) only moves once a day
+    return timezone.make_aware(
+        datetime.combine(timezone.localdate() - timedelta(days=settings.ICAL_FEED_PAST_DAYS), time.min)
+    )
+
+
+def feed_events(user):
+    """The events in a user's feed: everything still running ICAL_FEED_PAST_DAYS ago or later"""
+    return overlapping(user_calendar_events(user), start=_window_start())
+
+
+def feed_state(user):
+    """
+    Validators of a user's feed, from two aggregate queries.
+    Returns:
+        tuple: (ETag, Last-Modified datetime or None)
+    """
+    state = feed_events(user).order_by().aggregate(
+        count=Count('id'), id_sum=Sum('id'), modified=Max('updated_at'), participants=Sum('current_participants'),
+    )
+    # Joining and leaving move neither updated_at nor, for events of the user's
+    # communities, the feed's events: read the user's own registrations as well
+    registrations = EventParticipant.objects.filter(user=user).aggregate(
+        count=Count('id'), event_sum=Sum('event_id'), latest=Max('registered_at'),
+    )
+    # Edits move updated_at; count and id sum catch events entering or leaving the feed
+    fingerprint = ':'.join(str(part) for part in (
+        user.pk, sorted(member_community_ids(user)), _window_start().date(),
+        state['count'], state['id_sum'], state['modified'] and state['modified'].isoformat(), state['participants'],
+        registrations['count'], registrations['event_sum'],
+    ))
+    modified = max(filter(None, (state['modified'], registrations['latest'])), default=None)
+    return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest(), modified
+
+
+def _escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _format_time(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _fold(line):
+    """Split a content line into 75-octet pieces, as RFC 5545 requires"""
+    encoded = line.encode('utf-8')
+    pieces = []
+    while len(encoded) > 75:
+        cut = 75 if not pieces else 74
+        # Never split a multi-byte character
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        pieces.append(encoded[:cut])
+        encoded = encoded[cut:]
+    pieces.append(encoded)
+    return b'\r\n '.join(pieces) + b'\r\n'
+
+
+def iter_ical(events, host):
+    """
+    Yield an iCalendar document for `events` chunk by chunk, reading the rows with a
+    server-side cursor so memory stays flat however many events the feed has.
+    """
+    yield _fold('BEGIN:VCALENDAR') + _fold('VERSION:2.0') + _fold('PRODID:-//Uni Hub//Events//EN') + \
+        _fold('CALSCALE:GREGORIAN') + _fold('X-WR-CALNAME:Uni Hub')
+    rows = events.select_related('community').only(
+        'id', 'title', 'description', 'location', 'start_time', 'end_time', 'status', 'updated_at', 'community__name'
+    ).order_by('start_time', 'id')
+    for event in rows.iterator(chunk_size=FEED_CHUNK_SIZE):
+        yield b''.join(_fold(line) for line in (
+            'BEGIN:VEVENT',
+            f'UID:event-{event.id}@{host}',
+            f'DTSTAMP:{_format_time(event.updated_at)}',
+            f'LAST-MODIFIED:{_format_time(event.updated_at)}',
+            f'DTSTART:{_format_time(event.start_time)}',
+            f'DTEND:{_format_time(event.end_time)}',
+            f'SUMMARY:{_escape(event.title)}',
+            f'DESCRIPTION:{_escape(event.description)}',
+            f'LOCATION:{_escape(event.location)}',
+            f'CATEGORIES:{_escape(event.community.name)}',
+            f'STATUS:{ICAL_STATUSES.get(event.status, "TENTATIVE")}',
+            'END:VEVENT',
+        ))
+    yield _fold('END:VCALENDAR')
@@ -0,0 +1,166 @@
+"""
+events/exports.py
+Streaming participant exports (CSV and XLSX).
+
+Participants are read with a server-side cursor and every format is produced by a
+generator, so the response is sent while rows are still being read and memory use
+does not grow with the size of the event.
+
+XLSX is written without a spreadsheet library: a workbook is a zip of a few XML parts,
+and zipfile can deflate the worksheet into a non-seekable buffer that is drained after
+every batch of rows. Cells are inline strings, so no shared-string table has to be
+held in memory.
+"""
+
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from .models import EventParticipant
+
+EXPORT_CHUNK_SIZE = 2000
+HEADER = ('User ID', 'Username', 'Email', 'First name', 'Last name', 'Registered at', 'Attended')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def participant_rows(event):
+    """Yield one tuple per participant of `event`, in registration order"""
+    participants = EventParticipant.objects.filter(event=event).select_related('user').only(
+        'registered_at', 'is_attended',
+        'user__id', 'user__username', 'user__email', 'user__first_name', 'user__last_name',
+    ).order_by('registered_at', 'id')
+    for participant in participants.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        user = participant.user
+        yield (
+            user.id, user.username, user.email, user.first_name, user.last_name,
+            participant.registered_at.isoformat(), participant.is_attended,
+        )
+
+
+class _Buffer:
+    """Write-only sink whose contents are taken out by the generator after each write"""
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class _Echo:
+    """File-like object whose write returns the value, for csv.writer"""
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    # Keep spreadsheet apps from evaluating user-supplied text as a formula
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+def iter_csv(rows):
+    """Yield a CSV document for `rows`, preceded by HEADER"""
+    writer = csv.writer(_Echo())
+    # A byte-order mark makes Excel read the file as UTF-8
+    yield '\ufeff' + writer.writerow(HEADER)
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Participants" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, int):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_XML_ILLEGAL.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def iter_xlsx(rows, rows_per_chunk=500):
+    """Yield a single-sheet XLSX workbook for `rows`, preceded by HEADER"""
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            workbook.writestr(name, content)
+        yield buffer.drain()
+
+        # force_zip64: the sheet size is unknown until the last row is written
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(HEADER)
+            ).encode('utf-8'))
+            batch = []
+            for row in rows:
+                batch.append(_xlsx_row(row))
+                if len(batch) >= rows_per_chunk:
+                    sheet.write(''.join(batch).encode('utf-8'))
+                    batch = []
+                    yield buffer.drain()
+            sheet.write((''.join(batch) + '</sheetData></worksheet>').encode('utf-8'))
+    yield buffer.drain()
+
+
+def iter_export(event, file_format):
+    """Stream the participants of `event` as 'csv' or 'xlsx'"""
+    rows = participant_rows(event)
+    if file_format == 'xlsx':
+        return iter_xlsx(rows)
+    return iter_csv(rows)
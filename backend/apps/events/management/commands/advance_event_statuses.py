@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from apps.events.transitions import advance_event_statuses
+
+
+class Command(BaseCommand):
+    """Start and complete events whose start or end time has passed"""
+    help = 'Move due events to ongoing / completed and notify participants (run every minute)'
+
+    def handle(self, *args, **options):
+        moved = advance_event_statuses()
+        self.stdout.write(self.style.SUCCESS(
+            f"Started {moved['ongoing']} and completed {moved['completed']} events"
+        ))
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_alter_event_options_alter_eventparticipant_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventparticipant',
+            index=models.Index(fields=['registered_at'], name='participant_registered_idx'),
+        ),
+    ]
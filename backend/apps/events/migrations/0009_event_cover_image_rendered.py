@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_event_status_time_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='cover_image_rendered',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Cover with renditions'),
+        ),
+    ]
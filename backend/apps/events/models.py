@@ -2,11 +2,12 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from apps.communities.models import Community
+from uni_hub_core.counters import CounterFieldsMixin
 
 User = get_user_model()
 
 
-class Event(models.Model):
+class Event(CounterFieldsMixin, models.Model):
     """Event Model"""
     STATUS_CHOICES = [
         ('draft', _('Draft')),
@@ -25,8 +26,13 @@ class Event(models.Model):
     location = models.CharField(_('Event Location'), max_length=200)
     max_participants = models.PositiveIntegerField(_('Maximum number of participants'), null=True, blank=True)
     current_participants = models.PositiveIntegerField(_('Current number of participants'), default=0)
+    # Only moved by conditional F() updates; full saves leave it alone
+    counter_fields = ('current_participants',)
     status = models.CharField(_('Status'), max_length=20, choices=STATUS_CHOICES, default='draft')
     cover_image = models.ImageField(_('Event Covers'), upload_to='event_covers/', blank=True, null=True)
+    # Name of the cover whose renditions are stored, set by the rendition job
+    cover_image_rendered = models.CharField(_('Cover with renditions'), max_length=100, blank=True, editable=False)
+    background_fields = ('cover_image_rendered',)
     created_at = models.DateTimeField(_('Creation time'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Update time'), auto_now=True)
     
@@ -34,6 +40,16 @@ class Event(models.Model):
         verbose_name = 'Event'
         verbose_name_plural = 'Events'
         ordering = ['-created_at']
+        indexes = [
+            # Serves the community activity timeline
+            models.Index(fields=['community', '-created_at', '-id'], name='event_community_created_idx'),
+            # Serve time-range (overlap) queries, per community and across communities
+            models.Index(fields=['community', 'start_time', 'end_time'], name='event_community_time_idx'),
+            models.Index(fields=['start_time', 'end_time'], name='event_time_idx'),
+            # Let the scheduled status transitions find due events with index range scans
+            models.Index(fields=['status', 'start_time'], name='event_status_start_idx'),
+            models.Index(fields=['status', 'end_time'], name='event_status_end_idx'),
+        ]
     
     def __str__(self):
         return str(self.title)
@@ -51,6 +67,31 @@ class EventParticipant(models.Model):
         verbose_name_plural = 'Participants'
         unique_together = ['user', 'event']
         ordering = ['-registered_at']
+        indexes = [
+            # Serves the incremental engagement rollup
+            models.Index(fields=['registered_at'], name='participant_registered_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.user.username} - {self.event.title}" 
\ No newline at end of file
+        return f"{self.user.username} - {self.event.title}"
+
+
+class EventWaitlistEntry(models.Model):
+    """A user waiting for a place at a full event; served first come, first served by id"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='event_waitlist_entries')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='waitlist')
+    created_at = models.DateTimeField(_('Waitlisted at'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Waitlist Entry'
+        verbose_name_plural = 'Waitlist Entries'
+        unique_together = ['user', 'event']
+        ordering = ['event', 'id']
+        indexes = [
+            # Queue order within an event, read by promotion
+            models.Index(fields=['event', 'id'], name='waitlist_event_order_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.event.title} (waitlist)"
+
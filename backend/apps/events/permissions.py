@@ -1,4 +1,5 @@
 from rest_framework.permissions import BasePermission
+from apps.communities.membership_cache import get_role, MANAGER_ROLES
 
 class IsEventOwnerOrCommunityAdmin(BasePermission):
     """
@@ -9,9 +10,5 @@ class IsEventOwnerOrCommunityAdmin(BasePermission):
             return True
         if obj.creator == request.user:
             return True
-        # Check whether the user has the admin role
-        admin_membership = obj.community.members.filter(user=request.user, role='admin', is_active=True).exists()
-        if admin_membership:
-            return True
-        # Check if it is the community_leader role
-        return obj.community.members.filter(user=request.user, role='community_leader', is_active=True).exists() 
\ No newline at end of file
+        # Community admins and community leaders have permission
+        return get_role(request.user, obj.community_id) in MANAGER_ROLES
@@ -1,11 +1,13 @@
 from rest_framework import serializers
 from .models import Event
+from uni_hub_core.images import ImageRenditionsField
 
 
 class EventSerializer(serializers.ModelSerializer):
     """Event Serializer"""
     creator_name = serializers.CharField(source='creator.username', read_only=True)
     community_name = serializers.CharField(source='community.name', read_only=True)
+    cover_image_renditions = ImageRenditionsField(source='cover_image')
     
     class Meta:
         model = Event
@@ -13,7 +15,7 @@ class EventSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'community', 'community_name',
             'creator', 'creator_name', 'start_time', 'end_time', 'location',
             'max_participants', 'current_participants', 'status',
-            'cover_image', 'created_at', 'updated_at'
+            'cover_image', 'cover_image_renditions', 'created_at', 'updated_at'
         ]
         read_only_fields = ['creator', 'current_participants', 'created_at', 'updated_at']
 
@@ -1,9 +1,19 @@
-from django.test import TestCase, Client
+import csv
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, Client
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.urls import reverse
+from django.utils.dateparse import parse_datetime
 from rest_framework import status
-from .models import Event
-from apps.communities.models import Community
+from uni_hub_core.redis_client import get_redis_connection
+from apps.notifications.models import Notification
+from .models import Event, EventParticipant, EventWaitlistEntry
+from .transitions import advance_event_statuses
+from apps.communities.models import Community, CommunityMember
 
 User = get_user_model()
 
@@ -85,4 +95,381 @@ class EventFlowTestGroup3(TestCase):
         )
         modify_url = reverse('events:event_detail', args=[event.id])  # Adjust if needed
         response = self.client.patch(modify_url, {'name': 'Hacked Event'}, content_type='application/json')
-        self.assertIn(response.status_code, [401, 403]) 
\ No newline at end of file
+        self.assertIn(response.status_code, [401, 403]) 
+
+
+class EventRegistrationTest(TestCase):
+    """Joining and leaving keep the participant counter exact and respect capacity"""
+    def setUp(self):
+        self.client = Client()
+        self.leader = User.objects.create_user(
+            username='emmadavis', email='emma.davis@uwe.ac.uk', password='TestPass123!'
+        )
+        self.member = User.objects.create_user(
+            username='jameswilson', email='james.wilson@uwe.ac.uk', password='TestPass123!'
+        )
+        community = Community.objects.create(name='Engineering Society', description='Engineering', creator=self.leader)
+        self.event = Event.objects.create(
+            title='Robotics Night', description='Robots', community=community, creator=self.leader,
+            start_time='2030-01-01T18:00:00Z', end_time='2030-01-01T20:00:00Z', location='Lab',
+            max_participants=1, status='published',
+        )
+
+    def join(self, email):
+        self.client.login(email=email, password='TestPass123!')
+        return self.client.post(reverse('events:join_event', args=[self.event.id]))
+
+    def test_capacity_and_leave(self):
+        self.assertEqual(self.join('james.wilson@uwe.ac.uk').status_code, 201)
+        self.assertEqual(self.join('james.wilson@uwe.ac.uk').status_code, 400)
+        self.assertEqual(self.join('emma.davis@uwe.ac.uk').status_code, 202)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.current_participants, 1)
+
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+        self.assertEqual(self.client.post(reverse('events:leave_event', args=[self.event.id])).status_code, 200)
+        self.assertEqual(self.client.post(reverse('events:leave_event', args=[self.event.id])).status_code, 400)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.current_participants, 1)
+        self.assertEqual(self.join('james.wilson@uwe.ac.uk').status_code, 202)
+
+    def test_edits_keep_concurrent_registrations(self):
+        stale = Event.objects.get(pk=self.event.pk)
+        self.assertEqual(self.join('james.wilson@uwe.ac.uk').status_code, 201)
+        stale.location = 'Hall'
+        stale.save()
+        self.client.login(email='emma.davis@uwe.ac.uk', password='TestPass123!')
+        response = self.client.post(reverse('events:update_event_status', args=[self.event.id]), {'status': 'ongoing'})
+        self.assertEqual(response.status_code, 200)
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.location, self.event.status, self.event.current_participants), ('Hall', 'ongoing', 1))
+
+
+class EventRegistrationConcurrencyTest(TransactionTestCase):
+    """Hundreds of parallel sign-ups never oversell an event"""
+    CAPACITY = 50
+    USERS = 300
+
+    def setUp(self):
+        leader = User.objects.create_user(username='emmadavis', email='emma.davis@uwe.ac.uk', password='TestPass123!')
+        community = Community.objects.create(name='Engineering Society', description='Engineering', creator=leader)
+        self.event = Event.objects.create(
+            title='Freshers Fair', description='Stalls', community=community, creator=leader,
+            start_time='2030-01-01T10:00:00Z', end_time='2030-01-01T16:00:00Z', location='Atrium',
+            max_participants=self.CAPACITY, status='published',
+        )
+        self.users = User.objects.bulk_create(
+            User(username=f'student{index}', email=f'student{index}@live.uwe.ac.uk') for index in range(self.USERS)
+        )
+
+    def test_parallel_joins(self):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from .views import join_event
+        factory = APIRequestFactory()
+
+        def join(user):
+            try:
+                request = factory.post(f'/api/v1/events/{self.event.id}/join/')
+                force_authenticate(request, user=user)
+                return join_event(request, event_id=self.event.id).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=30) as executor:
+            codes = list(executor.map(join, self.users))
+
+        self.event.refresh_from_db()
+        self.assertEqual(codes.count(201), self.CAPACITY)
+        self.assertEqual(codes.count(202), self.USERS - self.CAPACITY)
+        self.assertEqual(self.event.current_participants, self.CAPACITY)
+        self.assertEqual(EventParticipant.objects.filter(event=self.event).count(), self.CAPACITY)
+
+
+class EventWaitlistTest(TestCase):
+    """Full events queue sign-ups and promote them in order as seats free up"""
+    def setUp(self):
+        self.redis = get_redis_connection()
+        self.client = Client()
+        self.leader = User.objects.create_user(
+            username='emmadavis', email='emma.davis@uwe.ac.uk', password='TestPass123!'
+        )
+        self.students = [
+            User.objects.create_user(username=f'student{index}', email=f'student{index}@live.uwe.ac.uk', password='TestPass123!')
+            for index in range(4)
+        ]
+        community = Community.objects.create(name='Engineering Society', description='Engineering', creator=self.leader)
+        self.event = Event.objects.create(
+            title='Robotics Night', description='Robots', community=community, creator=self.leader,
+            start_time='2030-01-01T18:00:00Z', end_time='2030-01-01T20:00:00Z', location='Lab',
+            max_participants=1, status='published',
+        )
+        # Event ids restart with every test database: drop an index left by an aborted run
+        self.redis.delete(f'events:waitlist:{self.event.id}')
+
+    def tearDown(self):
+        self.redis.delete(f'events:waitlist:{self.event.id}')
+
+    def post(self, user, name):
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse(f'events:{name}', args=[self.event.id]))
+
+    def participant_ids(self):
+        return set(EventParticipant.objects.filter(event=self.event).values_list('user_id', flat=True))
+
+    def test_positions_and_leaving_the_waitlist(self):
+        self.assertEqual(self.post(self.students[0], 'join_event').status_code, 201)
+        positions = [self.post(student, 'join_event').json()['waitlist_position'] for student in self.students[1:]]
+        self.assertEqual(positions, [1, 2, 3])
+        response = self.post(self.students[2], 'join_event')
+        self.assertEqual((response.status_code, response.json()['waitlist_position']), (400, 2))
+
+        self.assertEqual(self.post(self.students[1], 'leave_event').status_code, 200)
+        self.client.force_login(self.students[3])
+        response = self.client.get(reverse('events:event_detail', args=[self.event.id]))
+        self.assertEqual(response.json()['waitlist_position'], 2)
+
+        # A lost index is rebuilt from the table
+        self.redis.delete(f'events:waitlist:{self.event.id}')
+        self.assertEqual(self.post(self.students[3], 'join_event').json()['waitlist_position'], 2)
+
+    def test_leave_promotes_head_of_queue(self):
+        for student in self.students:
+            self.post(student, 'join_event')
+        self.assertEqual(self.post(self.students[0], 'leave_event').status_code, 200)
+
+        self.assertEqual(self.participant_ids(), {self.students[1].id})
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.current_participants, 1)
+        self.assertEqual(EventWaitlistEntry.objects.filter(event=self.event).count(), 2)
+        self.assertTrue(Notification.objects.filter(recipient=self.students[1], type='event').exists())
+
+    def test_join_does_not_jump_the_queue(self):
+        self.post(self.students[0], 'join_event')
+        self.post(self.students[1], 'join_event')
+        # A seat freed without a promotion run, e.g. by a crashed request
+        Event.objects.filter(pk=self.event.pk).update(max_participants=2)
+
+        self.assertEqual(self.post(self.students[2], 'join_event').status_code, 202)
+        # The promotion queued behind the sign-up gives the seat to the head of the queue
+        self.assertEqual(self.participant_ids(), {student.id for student in self.students[:2]})
+        self.assertEqual(list(EventWaitlistEntry.objects.values_list('user_id', flat=True)), [self.students[2].id])
+
+        Event.objects.filter(pk=self.event.pk).update(max_participants=4)
+        self.post(self.students[3], 'join_event')
+        self.assertEqual(self.participant_ids(), {student.id for student in self.students})
+        self.assertFalse(EventWaitlistEntry.objects.filter(event=self.event).exists())
+
+    def test_capacity_increase_promotes_in_bulk(self):
+        for student in self.students:
+            self.post(student, 'join_event')
+        self.client.force_login(self.leader)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('events:event_detail', args=[self.event.id]),
+                {'max_participants': 3}, content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.participant_ids(), {student.id for student in self.students[:3]})
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.current_participants, 3)
+        self.assertEqual(list(EventWaitlistEntry.objects.values_list('user_id', flat=True)), [self.students[3].id])
+        self.assertEqual(Notification.objects.filter(type='event').count(), 2)
+        self.assertEqual(self.post(self.students[3], 'join_event').json()['waitlist_position'], 1)
+
+
+class EventCalendarTest(TestCase):
+    """Time-range calendar queries and the conditional iCalendar feed"""
+    def setUp(self):
+        self.client = Client()
+        self.leader = User.objects.create_user(
+            username='emmadavis', email='emma.davis@uwe.ac.uk', password='TestPass123!'
+        )
+        self.member = User.objects.create_user(
+            username='jameswilson', email='james.wilson@uwe.ac.uk', password='TestPass123!'
+        )
+        self.community = Community.objects.create(name='Engineering Society', description='Engineering', creator=self.leader)
+        other = Community.objects.create(name='Chess Club', description='Chess', creator=self.leader)
+        CommunityMember.objects.create(user=self.member, community=self.community)
+
+        def event(title, start, end, community=self.community, event_status='published'):
+            return Event.objects.create(
+                title=title, description='Details', community=community, creator=self.leader,
+                start_time=start, end_time=end, location='Lab', status=event_status,
+            )
+        self.before = event('Before', '2030-01-01T09:00:00Z', '2030-01-01T10:00:00Z')
+        self.spanning = event('Spanning', '2030-01-01T09:00:00Z', '2030-01-03T10:00:00Z')
+        self.inside = event('Inside; with, escapes', '2030-01-02T12:00:00Z', '2030-01-02T14:00:00Z')
+        self.after = event('After', '2030-01-05T00:00:00Z', '2030-01-05T02:00:00Z')
+        event('Draft', '2030-01-02T12:00:00Z', '2030-01-02T14:00:00Z', event_status='draft')
+        event('Elsewhere', '2030-01-02T12:00:00Z', '2030-01-02T14:00:00Z', community=other)
+        self.registered = event('Registered', '2030-01-02T15:00:00Z', '2030-01-02T16:00:00Z', community=other)
+        EventParticipant.objects.create(user=self.member, event=self.registered)
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+
+    def test_calendar_range(self):
+        url = reverse('events:event_calendar')
+        response = self.client.get(url, {'from': '2030-01-02T00:00:00Z', 'to': '2030-01-05T00:00:00Z'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['id'] for item in response.json()],
+            [self.spanning.id, self.inside.id, self.registered.id],
+        )
+        self.assertEqual(self.client.get(url, {'from': '2030-01-02T00:00:00Z'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'from': '2030-01-02T00:00:00Z', 'to': 'tomorrow'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'from': '2030-01-02T00:00:00Z', 'to': '2031-01-02T00:00:00Z'}).status_code, 400)
+
+    def test_list_range_and_ordering(self):
+        response = self.client.get(reverse('events:event_list'), {
+            'to': '2030-01-02T00:00:00Z', 'ordering': 'start_time', 'my_communities': 'true',
+        })
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.before.id, self.spanning.id])
+
+    def test_ical_feed(self):
+        url = self.client.get(reverse('events:calendar_feed_url')).json()['url']
+        self.client.logout()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 5)
+        self.assertIn('SUMMARY:Inside\\; with\\, escapes\r\n', body)
+        self.assertNotIn('Draft', body)
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        self.after.title = 'After, renamed'
+        self.after.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Joining or leaving an event of the user's own community changes no event row
+        etag = response['ETag']
+        EventParticipant.objects.create(user=self.member, event=self.inside)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        etag = response['ETag']
+        EventParticipant.objects.filter(user=self.member, event=self.inside).delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.assertEqual(self.client.get(url.replace('.ics', 'x.ics')).status_code, 404)
+
+    def test_rotating_the_feed_revokes_old_urls(self):
+        old_url = self.client.get(reverse('events:calendar_feed_url')).json()['url']
+        new_url = self.client.post(reverse('events:calendar_feed_url')).json()['url']
+        self.assertNotEqual(old_url, new_url)
+        self.member.bio = 'Stale instance saved after the rotation'
+        self.member.save()
+        self.client.logout()
+        self.assertEqual(self.client.get(old_url).status_code, 404)
+        self.assertEqual(self.client.get(new_url).status_code, 200)
+
+
+class EventStatusTransitionTest(TestCase):
+    """Scheduled transitions start and complete due events in bulk"""
+    def setUp(self):
+        self.leader = User.objects.create_user(
+            username='emmadavis', email='emma.davis@uwe.ac.uk', password='TestPass123!'
+        )
+        self.members = [
+            User.objects.create_user(username=f'student{index}', email=f'student{index}@live.uwe.ac.uk')
+            for index in range(3)
+        ]
+        community = Community.objects.create(name='Engineering Society', description='Engineering', creator=self.leader)
+
+        def event(title, start, end, event_status='published'):
+            return Event.objects.create(
+                title=title, description='Details', community=community, creator=self.leader,
+                start_time=start, end_time=end, location='Lab', status=event_status,
+            )
+        self.upcoming = event('Upcoming', '2030-01-02T09:00:00Z', '2030-01-02T10:00:00Z')
+        self.starting = event('Starting', '2030-01-01T09:00:00Z', '2030-01-01T12:00:00Z')
+        self.ending = event('Ending', '2030-01-01T08:00:00Z', '2030-01-01T10:00:00Z', event_status='ongoing')
+        self.missed = event('Missed', '2030-01-01T07:00:00Z', '2030-01-01T09:00:00Z')
+        self.draft = event('Draft', '2030-01-01T07:00:00Z', '2030-01-01T09:00:00Z', event_status='draft')
+        for member in self.members:
+            EventParticipant.objects.create(user=member, event=self.starting)
+        EventParticipant.objects.create(user=self.members[0], event=self.missed)
+
+    def statuses(self):
+        return dict(Event.objects.values_list('title', 'status'))
+
+    def test_advance(self):
+        now = parse_datetime('2030-01-01T10:30:00Z')
+
+        self.assertEqual(advance_event_statuses(now), {'ongoing': 1, 'completed': 2})
+        self.assertEqual(self.statuses(), {
+            'Upcoming': 'published', 'Starting': 'ongoing', 'Ending': 'completed',
+            'Missed': 'completed', 'Draft': 'draft',
+        })
+        started = Notification.objects.filter(type='event')
+        self.assertEqual(set(started.values_list('recipient_id', flat=True)), {member.id for member in self.members})
+        self.assertEqual(started.first().content, "The event 'Starting' has started.")
+        self.starting.refresh_from_db()
+        self.assertEqual(self.starting.updated_at, now)
+
+        # Nothing is due any more: a second run changes nothing
+        self.assertEqual(advance_event_statuses(now), {'ongoing': 0, 'completed': 0})
+        self.assertEqual(started.count(), 3)
+
+    def test_command_leaves_future_events(self):
+        out = StringIO()
+        call_command('advance_event_statuses', stdout=out)
+        self.assertIn('Started 0 and completed 0 events', out.getvalue())
+        self.assertEqual(self.statuses()['Upcoming'], 'published')
+
+
+class ParticipantExportTest(TestCase):
+    """Organisers download the registration list as a streamed CSV or XLSX file"""
+    def setUp(self):
+        self.client = Client()
+        self.leader = User.objects.create_user(
+            username='emmadavis', email='emma.davis@uwe.ac.uk', password='TestPass123!'
+        )
+        self.member = User.objects.create_user(
+            username='jameswilson', email='james.wilson@uwe.ac.uk', password='TestPass123!', first_name='=James'
+        )
+        community = Community.objects.create(name='Engineering Society', description='Engineering', creator=self.leader)
+        self.event = Event.objects.create(
+            title='Robotics Night', description='Robots', community=community, creator=self.leader,
+            start_time='2030-01-01T18:00:00Z', end_time='2030-01-01T20:00:00Z', location='Lab', status='published',
+        )
+        students = User.objects.bulk_create(
+            User(username=f'student{index}', email=f'student{index}@live.uwe.ac.uk') for index in range(25)
+        )
+        EventParticipant.objects.create(user=self.member, event=self.event, is_attended=True)
+        EventParticipant.objects.bulk_create(EventParticipant(user=student, event=self.event) for student in students)
+        self.url = reverse('events:participant_export', args=[self.event.id])
+
+    def test_csv_export(self):
+        self.client.login(email='emma.davis@uwe.ac.uk', password='TestPass123!')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('event-%d-participants.csv' % self.event.id, response['Content-Disposition'])
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(rows[0][:3], ['User ID', 'Username', 'Email'])
+        self.assertEqual(len(rows), 27)
+        self.assertEqual(rows[1][1:4] + rows[1][6:], ['jameswilson', 'james.wilson@uwe.ac.uk', "'=James", 'True'])
+
+    def test_xlsx_export(self):
+        self.client.login(email='emma.davis@uwe.ac.uk', password='TestPass123!')
+        response = self.client.get(self.url, {'file_format': 'xlsx'})
+        self.assertEqual(response.status_code, 200)
+        workbook = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(workbook.testzip())
+        sheet = workbook.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(sheet.count('<row>'), 27)
+        self.assertIn('jameswilson', sheet)
+
+        self.assertEqual(self.client.get(self.url, {'file_format': 'pdf'}).status_code, 400)
+
+    def test_participant_cannot_export(self):
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+        self.assertEqual(self.client.get(self.url).status_code, 403)
@@ -0,0 +1,73 @@
+"""
+events/transitions.py
+Time-driven event status changes, run every minute by `manage.py advance_event_statuses`.
+
+    published, ongoing -> completed   once end_time has passed
+    published -> ongoing              once start_time has passed
+
+Each step locks a batch of due event ids with a range scan of the (status, end_time)
+or (status, start_time) index and moves them with one set-based UPDATE, so an idle run
+costs a couple of index probes however many events exist. Participants of events that
+have just started are notified in the same transaction with batched INSERTs, read from
+a server-side cursor.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+from apps.notifications.services import stream_notifications
+from .models import Event, EventParticipant
+
+TRANSITION_BATCH_SIZE = 1000
+
+
+def _advance(due, new_status, now, on_batch=None):
+    """
+    Move every event of `due` to `new_status`, TRANSITION_BATCH_SIZE events per transaction.
+    Rows locked by a concurrent run are skipped rather than waited for.
+    Returns:
+        int: Number of events moved.
+    """
+    moved = 0
+    while True:
+        with transaction.atomic():
+            event_ids = list(
+                due.select_for_update(skip_locked=True).order_by().values_list('id', flat=True)[:TRANSITION_BATCH_SIZE]
+            )
+            if not event_ids:
+                return moved
+            # updated_at is set by hand: queryset updates skip auto_now
+            Event.objects.filter(id__in=event_ids).update(status=new_status, updated_at=now)
+            if on_batch is not None:
+                on_batch(event_ids)
+        moved += len(event_ids)
+
+
+def _notify_started(event_ids):
+    titles = dict(Event.objects.filter(id__in=event_ids).values_list('id', 'title'))
+    participants = EventParticipant.objects.filter(event_id__in=event_ids).order_by().values_list(
+        'event_id', 'user_id'
+    ).iterator(chunk_size=2000)
+    stream_notifications(
+        ((user_id, f"The event '{titles[event_id]}' has started.") for event_id, user_id in participants),
+        'event',
+    )
+
+
+def advance_event_statuses(now=None):
+    """
+    Apply every status transition that is due.
+    Events whose whole time window has passed go straight to completed, without a
+    start notification.
+    Args:
+        now (datetime, optional): Reference time (defaults to now).
+    Returns:
+        dict: Number of events moved into each status.
+    """
+    now = now or timezone.now()
+    completed = _advance(
+        Event.objects.filter(status__in=['published', 'ongoing'], end_time__lte=now), 'completed', now
+    )
+    started = _advance(
+        Event.objects.filter(status='published', start_time__lte=now), 'ongoing', now, on_batch=_notify_started
+    )
+    return {'ongoing': started, 'completed': completed}
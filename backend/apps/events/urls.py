@@ -6,8 +6,12 @@ app_name = 'events'
 urlpatterns = [
     # Event Management
     path('', views.EventListView.as_view(), name='event_list'),
+    path('calendar/', views.EventCalendarView.as_view(), name='event_calendar'),
+    path('calendar/feed/', views.calendar_feed_url, name='calendar_feed_url'),
+    path('calendar/feed/<str:token>.ics', views.calendar_ical, name='calendar_feed'),
     path('<int:pk>/', views.EventDetailView.as_view(), name='event_detail'),
     path('<int:event_id>/join/', views.join_event, name='join_event'),
     path('<int:event_id>/leave/', views.leave_event, name='leave_event'),
     path('<int:event_id>/status/', views.update_event_status, name='update_event_status'),
+    path('<int:event_id>/participants/export/', views.EventParticipantExportView.as_view(), name='participant_export'),
 ] 
\ No newline at end of file
@@ -1,15 +1,32 @@
+from datetime import timedelta
+
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q
-from .models import Event, EventParticipant
+from rest_framework.views import APIView
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+from .models import Event, EventParticipant, EventWaitlistEntry
 from .serializers import EventSerializer, EventDetailSerializer
 from .permissions import IsEventOwnerOrCommunityAdmin
+from . import calendar_feed, exports, waitlist
 from rest_framework import serializers
 
 
 class EventListView(generics.ListCreateAPIView):
-    """Event List View"""
+    """
+    Event List View.
+    ?from= / ?to= keep events overlapping that range and ?ordering= sorts by
+    start_time or created_at (default newest first).
+    """
+    ordering_fields = ('created_at', '-created_at', 'start_time', '-start_time')
     queryset = Event.objects.all()
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -48,20 +65,26 @@ class EventListView(generics.ListCreateAPIView):
             event_ids = EventParticipant.objects.filter(user=self.request.user).values_list('event_id', flat=True)
             queryset = queryset.filter(id__in=event_ids)
         
-        return queryset.order_by('-created_at')
+        # Events of communities I belong to
+        if self.request.query_params.get('my_communities') == 'true':
+            from apps.communities.membership_cache import member_community_ids
+            queryset = queryset.filter(community_id__in=member_community_ids(self.request.user))
+        
+        # Time range
+        start, end = calendar_feed.parse_range(self.request.query_params)
+        queryset = calendar_feed.overlapping(queryset, start, end)
+        
+        ordering = self.request.query_params.get('ordering')
+        if ordering not in self.ordering_fields:
+            ordering = '-created_at'
+        return queryset.order_by(ordering, '-id' if ordering.startswith('-') else 'id')
     
     def perform_create(self, serializer):
         # Check if user is a member of the selected community
         community = serializer.validated_data.get('community')
         if community:
-            from apps.communities.models import CommunityMember
-            is_member = CommunityMember.objects.filter(
-                user=self.request.user,
-                community=community,
-                is_active=True
-            ).exists()
-            
-            if not is_member:
+            from apps.communities.membership_cache import is_member
+            if not is_member(self.request.user, community.pk):
                 raise serializers.ValidationError(
                     "You can only create events in communities you are a member of."
                 )
@@ -85,19 +108,17 @@ class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
         new_community = request.data.get('community')
         
         if new_community and new_community != instance.community.id:
-            from apps.communities.models import CommunityMember
-            is_member = CommunityMember.objects.filter(
-                user=request.user,
-                community_id=new_community,
-                is_active=True
-            ).exists()
-            
-            if not is_member:
+            from apps.communities.membership_cache import is_member
+            if not is_member(request.user, new_community):
                 raise serializers.ValidationError(
                     "You can only move events to communities you are a member of."
                 )
         
-        return super().update(request, *args, **kwargs)
+        response = super().update(request, *args, **kwargs)
+        # More seats or a re-opened event: move waitlisted users in
+        if 'max_participants' in request.data or 'status' in request.data:
+            waitlist.promote(instance.pk)
+        return response
     
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -111,6 +132,7 @@ class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
                 event=instance
             ).exists()
             data['is_participant'] = is_participant
+            data['waitlist_position'] = None if is_participant else waitlist.position(instance.pk, request.user)
         
         return Response(data)
 
@@ -130,17 +152,47 @@ def join_event(request, event_id):
         if EventParticipant.objects.filter(user=request.user, event=event).exists():
             return Response({'message': 'You have already registered for this event'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check the number of people
-        if event.max_participants and event.current_participants >= event.max_participants:
-            return Response({'message': 'Full attendance'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Create a registration record
-        EventParticipant.objects.create(user=request.user, event=event)
-        
-        # Update the number of participants
-        event.current_participants += 1
-        event.save()
+        waitlisted = None
+        with transaction.atomic():
+            # Reserve a seat: the conditional UPDATE re-checks capacity under the row lock,
+            # so concurrent sign-ups can never oversell and only the counter column is written.
+            # Nobody may take a seat ahead of the users already waiting for one.
+            reserved = Event.objects.filter(
+                Q(max_participants__isnull=True) | Q(current_participants__lt=F('max_participants')),
+                ~Exists(EventWaitlistEntry.objects.filter(event_id=OuterRef('pk'))),
+                pk=event.pk,
+                status__in=waitlist.OPEN_STATUSES,
+            ).update(current_participants=F('current_participants') + 1)
+            if not reserved:
+                # Full, queued or closed meanwhile: the locked re-read tells them apart and
+                # keeps the event from closing until the user is queued
+                if not Event.objects.select_for_update().filter(pk=event.pk, status__in=waitlist.OPEN_STATUSES).exists():
+                    return Response({'message': 'Registration is not open for this event'}, status=status.HTTP_400_BAD_REQUEST)
+                _, waitlisted = waitlist.add(event, request.user)
+                if waitlisted:
+                    # A seat may have been freed after the UPDATE: hand it to the queue
+                    transaction.on_commit(lambda: waitlist.promote(event.pk))
+            else:
+                # Create a registration record; a concurrent duplicate releases the seat again
+                try:
+                    with transaction.atomic():
+                        EventParticipant.objects.create(user=request.user, event=event)
+                except IntegrityError:
+                    transaction.set_rollback(True)
+                    return Response({'message': 'You have already registered for this event'}, status=status.HTTP_400_BAD_REQUEST)
         
+        if waitlisted is not None:
+            position = waitlist.position(event.pk, request.user)
+            if position is None:
+                # Promoted straight away by the promotion run after the queueing committed
+                return Response({'message': 'Successfully registered for the event'}, status=status.HTTP_201_CREATED)
+            if not waitlisted:
+                return Response({
+                    'message': 'You are already on the waitlist for this event', 'waitlist_position': position
+                }, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                'message': 'Full attendance: you have been added to the waitlist', 'waitlist_position': position
+            }, status=status.HTTP_202_ACCEPTED)
         return Response({'message': 'Successfully registered for the event'}, status=status.HTTP_201_CREATED)
     except Event.DoesNotExist:
         return Response({'message': 'Event does not exist'}, status=status.HTTP_404_NOT_FOUND)
@@ -150,21 +202,21 @@ def join_event(request, event_id):
 @permission_classes([permissions.IsAuthenticated])
 def leave_event(request, event_id):
     """Exit event"""
-    try:
-        participation = EventParticipant.objects.get(
-            user=request.user, 
-            event_id=event_id
-        )
-        participation.delete()
+    with transaction.atomic():
+        deleted, _ = EventParticipant.objects.filter(user=request.user, event_id=event_id).delete()
+        if not deleted:
+            if waitlist.remove(event_id, request.user):
+                return Response({'message': 'Successfully left the waitlist'}, status=status.HTTP_200_OK)
+            return Response({'message': 'You are not registered for this event'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Update the number of participants
-        event = Event.objects.get(id=event_id)
-        event.current_participants = max(0, event.current_participants - 1)
-        event.save()
-        
-        return Response({'message': 'Successfully exited the event'}, status=status.HTTP_200_OK)
-    except EventParticipant.DoesNotExist:
-        return Response({'message': 'You are not registered for this event'}, status=status.HTTP_400_BAD_REQUEST)
+        # Release the seat with a single-column UPDATE
+        Event.objects.filter(pk=event_id, current_participants__gt=0).update(
+            current_participants=F('current_participants') - 1
+        )
+    
+    # Hand the freed seat to the head of the waitlist
+    waitlist.promote(event_id)
+    return Response({'message': 'Successfully exited the event'}, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -184,7 +236,94 @@ def update_event_status(request, event_id):
         
         event.status = new_status
         event.save()
+        waitlist.promote(event.pk)
         
         return Response({'message': 'Event status updated successfully'}, status=status.HTTP_200_OK)
     except Event.DoesNotExist:
-        return Response({'message': 'Event does not exist'}, status=status.HTTP_404_NOT_FOUND) 
\ No newline at end of file
+        return Response({'message': 'Event does not exist'}, status=status.HTTP_404_NOT_FOUND) 
+
+
+class EventParticipantExportView(APIView):
+    """
+    Registration list of an event as a file download (event creators and community managers).
+    ?file_format=csv (default) or xlsx. The file is streamed while participants are read.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEventOwnerOrCommunityAdmin]
+
+    def get(self, request, event_id):
+        event = get_object_or_404(Event, pk=event_id)
+        self.check_object_permissions(request, event)
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in exports.CONTENT_TYPES:
+            return Response({'message': 'Unsupported export format'}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(
+            exports.iter_export(event, file_format), content_type=exports.CONTENT_TYPES[file_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="event-{event.pk}-participants.{file_format}"'
+        return response
+
+
+class EventCalendarView(generics.ListAPIView):
+    """
+    The current user's calendar: non-draft events of their communities and events they
+    registered for that overlap ?from= to ?to= (both required), in start order.
+    ?community= narrows it to one community.
+    """
+    serializer_class = EventSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        start, end = calendar_feed.parse_range(self.request.query_params)
+        if start is None or end is None:
+            raise serializers.ValidationError({'detail': 'Both from and to are required.'})
+        if end - start > timedelta(days=settings.CALENDAR_MAX_RANGE_DAYS):
+            raise serializers.ValidationError(
+                {'detail': f'The range may span at most {settings.CALENDAR_MAX_RANGE_DAYS} days.'}
+            )
+        queryset = calendar_feed.overlapping(calendar_feed.user_calendar_events(self.request.user), start, end)
+        community_id = self.request.query_params.get('community')
+        if community_id:
+            queryset = queryset.filter(community_id=community_id)
+        return queryset.select_related('creator', 'community').order_by('start_time', 'id')
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([permissions.IsAuthenticated])
+def calendar_feed_url(request):
+    """
+    Private iCalendar feed address of the current user, for subscribing in calendar apps.
+    POST replaces it with a new address and revokes the old ones.
+    """
+    if request.method == 'POST':
+        token = calendar_feed.rotate_feed_token(request.user)
+    else:
+        token = calendar_feed.feed_token(request.user)
+    return Response({'url': request.build_absolute_uri(reverse('events:calendar_feed', args=[token]))})
+
+
+@require_safe
+def calendar_ical(request, token):
+    """
+    The iCalendar feed behind a token from calendar_feed_url. Conditional requests
+    are answered with 304 from one aggregate query; other responses are streamed.
+    """
+    user = calendar_feed.feed_user(token)
+    if user is None:
+        raise Http404('Unknown calendar feed')
+
+    etag, last_modified = calendar_feed.feed_state(user)
+    last_modified = last_modified and int(last_modified.timestamp())
+    response = get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified)
+    if response is None:
+        response = StreamingHttpResponse(
+            calendar_feed.iter_ical(calendar_feed.feed_events(user), request.get_host()),
+            content_type='text/calendar; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'inline; filename="uni-hub.ics"'
+    response['ETag'] = quote_etag(etag)
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    # Private feed: calendar apps must revalidate, shared caches must not keep it
+    response['Cache-Control'] = 'private, no-cache'
+    return response
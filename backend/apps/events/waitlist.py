@@ -0,0 +1,139 @@
+"""
+events/waitlist.py
+Ordered waitlists for full events.
+
+EventWaitlistEntry rows are the queue (ordered by id). A Redis sorted set per event
+mirrors the queue with the entry id as score, so a user's position is a ZRANK,
+O(log n) however long the waitlist is:
+    events:waitlist:<event_id>
+The sorted set is derived data: it is rebuilt from the table when missing, and
+Redis errors fall back to counting the entries ahead in the (event, id) index.
+"""
+
+import logging
+
+import redis
+from django.db import transaction
+from django.db.models import F
+from uni_hub_core.redis_client import get_redis_connection
+from .models import Event, EventParticipant, EventWaitlistEntry
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ('published', 'ongoing')
+
+
+def _key(event_id):
+    return f'events:waitlist:{event_id}'
+
+
+def _index_add(event_id, entry_id):
+    try:
+        get_redis_connection().zadd(_key(event_id), {entry_id: entry_id})
+    except redis.RedisError:
+        logger.exception('Could not index waitlist entry %s', entry_id)
+
+
+def _index_remove(event_id, entry_ids):
+    try:
+        get_redis_connection().zrem(_key(event_id), *entry_ids)
+    except redis.RedisError:
+        logger.exception('Could not unindex waitlist entries of event %s', event_id)
+
+
+def _unindex(event_id, entry_ids):
+    # Removing early only makes a rolled-back entry look missing, which triggers a
+    # rebuild; removing again after commit undoes a concurrent rebuild's stale read
+    _index_remove(event_id, entry_ids)
+    transaction.on_commit(lambda: _index_remove(event_id, entry_ids))
+
+
+def _rebuild_index(conn, event_id):
+    entry_ids = list(EventWaitlistEntry.objects.filter(event_id=event_id).values_list('id', flat=True))
+    pipe = conn.pipeline(transaction=True)
+    pipe.delete(_key(event_id))
+    if entry_ids:
+        pipe.zadd(_key(event_id), {entry_id: entry_id for entry_id in entry_ids})
+    pipe.execute()
+
+
+def add(event, user):
+    """
+    Put a user at the back of an event's waitlist.
+    Returns:
+        tuple: (entry, created)
+    """
+    entry, created = EventWaitlistEntry.objects.get_or_create(event=event, user=user)
+    if created:
+        transaction.on_commit(lambda: _index_add(event.pk, entry.pk))
+    return entry, created
+
+
+def remove(event_id, user):
+    """Take a user off an event's waitlist; returns False if they were not on it"""
+    entry = EventWaitlistEntry.objects.filter(event_id=event_id, user=user).first()
+    if entry is None:
+        return False
+    entry_id = entry.pk
+    entry.delete()
+    _unindex(event_id, [entry_id])
+    return True
+
+
+def position(event_id, user):
+    """
+    1-based place of a user in an event's waitlist, or None if they are not waiting.
+    """
+    entry_id = EventWaitlistEntry.objects.filter(event_id=event_id, user=user).values_list('id', flat=True).first()
+    if entry_id is None:
+        return None
+    try:
+        conn = get_redis_connection()
+        rank = conn.zrank(_key(event_id), entry_id)
+        if rank is None:
+            _rebuild_index(conn, event_id)
+            rank = conn.zrank(_key(event_id), entry_id)
+        if rank is not None:
+            return rank + 1
+    except redis.RedisError:
+        logger.exception('Could not read the waitlist index of event %s', event_id)
+    return EventWaitlistEntry.objects.filter(event_id=event_id, id__lt=entry_id).count() + 1
+
+
+def promote(event_id):
+    """
+    Move as many waitlisted users as there are free seats onto the participant list.
+    The event row is locked for the whole move, so promotion and sign-ups are
+    serialized; participants, counter and queue change in one transaction and the
+    promoted users are notified with one bulk insert.
+    Returns:
+        list: Primary keys of the promoted users.
+    """
+    from apps.notifications.services import create_notifications
+
+    with transaction.atomic():
+        event = Event.objects.select_for_update().filter(pk=event_id, status__in=OPEN_STATUSES).first()
+        if event is None:
+            return []
+        entries = EventWaitlistEntry.objects.filter(event=event).order_by('id')
+        if event.max_participants is not None:
+            free = event.max_participants - event.current_participants
+            if free <= 0:
+                return []
+            entries = entries[:free]
+        promoted = list(entries.values_list('id', 'user_id'))
+        if not promoted:
+            return []
+        entry_ids = [entry_id for entry_id, _ in promoted]
+        user_ids = [user_id for _, user_id in promoted]
+
+        already = set(EventParticipant.objects.filter(event=event, user_id__in=user_ids).values_list('user_id', flat=True))
+        new_user_ids = [user_id for user_id in user_ids if user_id not in already]
+        EventParticipant.objects.bulk_create([EventParticipant(event=event, user_id=user_id) for user_id in new_user_ids])
+        Event.objects.filter(pk=event.pk).update(current_participants=F('current_participants') + len(new_user_ids))
+        EventWaitlistEntry.objects.filter(id__in=entry_ids).delete()
+        create_notifications(
+            new_user_ids, f"A place opened up: you are now registered for the event '{event.title}'.", 'event'
+        )
+        _unindex(event_id, entry_ids)
+    return new_user_ids
@@ -3,10 +3,10 @@ notifications/services.py
 Business logic for notification creation and delivery.
 """
 
+from itertools import islice
+
 from .models import Notification
 from django.contrib.auth import get_user_model
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 
 User = get_user_model()
 
@@ -20,9 +20,47 @@ def create_notification(user, message, related_object=None):
     Returns:
         notification (Notification): The created notification instance.
     """
-    notification = Notification.objects.create(user=user, message=message, related_object=related_object)
+    notification = Notification.objects.create(recipient=user, content=message)
     return notification
 
+def create_notifications(user_ids, message, notification_type='system'):
+    """
+    Create the same notification for many users in batched INSERTs.
+    Args:
+        user_ids (iterable): Primary keys of the users to notify.
+        message (str): The notification message.
+        notification_type (str): One of Notification.NOTIFICATION_TYPES.
+    Returns:
+        list: The created notifications.
+    """
+    return Notification.objects.bulk_create(
+        [Notification(recipient_id=user_id, content=message, type=notification_type) for user_id in user_ids],
+        batch_size=1000,
+    )
+
+def stream_notifications(messages, notification_type='system', batch_size=1000):
+    """
+    Create per-user notifications from a (possibly lazy) iterable, one INSERT per batch,
+    so memory stays bounded however many recipients there are.
+    Args:
+        messages (iterable): (user_id, message) pairs.
+        notification_type (str): One of Notification.NOTIFICATION_TYPES.
+        batch_size (int): Notifications per INSERT.
+    Returns:
+        int: Number of notifications created.
+    """
+    messages = iter(messages)
+    created = 0
+    while True:
+        batch = [
+            Notification(recipient_id=user_id, content=message, type=notification_type)
+            for user_id, message in islice(messages, batch_size)
+        ]
+        if not batch:
+            return created
+        Notification.objects.bulk_create(batch)
+        created += len(batch)
+
 def mark_notification_read(notification):
     """
     Mark a notification as read.
@@ -43,4 +81,4 @@ def get_unread_notifications(user):
     Returns:
         QuerySet: Unread notifications for the user.
     """
-    return Notification.objects.filter(user=user, is_read=False) 
\ No newline at end of file
+    return Notification.objects.filter(recipient=user, is_read=False) 
\ No newline at end of file
@@ -5,16 +5,19 @@ from .models import Post, Comment, Like
 
 class PostAdmin(admin.ModelAdmin):
     """Post Management Interface"""
-    list_display = ('author', 'content_preview', 'community', 'created_at')
+    list_display = ('author', 'content_preview', 'community', 'like_count', 'comment_count', 'created_at')
     list_filter = ('created_at', 'updated_at', 'community')
     search_fields = ('content', 'author__email', 'author__username', 'community__name')
     ordering = ('-created_at',)
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'like_count', 'comment_count')
     
     fieldsets = (
         (_('Post content'), {
             'fields': ('content', 'author', 'community', 'image')
         }),
+        (_('Engagement'), {
+            'fields': ('like_count', 'comment_count')
+        }),
         (_('Time Information'), {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
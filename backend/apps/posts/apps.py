@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class PostsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.posts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from uni_hub_core.images import track_image_field
+        track_image_field(self.get_model('Post'), 'image')
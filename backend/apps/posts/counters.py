@@ -0,0 +1,33 @@
+"""
+posts/counters.py
+Set-based recomputation of the denormalized Post counters.
+"""
+
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import Post, Comment, Like
+
+
+def count_subquery(model):
+    """Correlated COUNT(*) of `model` rows for the outer post"""
+    counts = (
+        model.objects.filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def recount_likes(post_ids):
+    """Recompute like_count for the given posts in one UPDATE"""
+    return Post.objects.filter(pk__in=post_ids).update(like_count=count_subquery(Like))
+
+
+def recount_posts(queryset):
+    """Recompute like_count and comment_count for every post in `queryset` in one UPDATE"""
+    return queryset.update(
+        like_count=count_subquery(Like),
+        comment_count=count_subquery(Comment),
+    )
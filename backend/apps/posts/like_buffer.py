@@ -0,0 +1,234 @@
+"""
+posts/like_buffer.py
+Write-behind buffer for likes, kept in Redis sets.
+
+With POST_LIKE_BUFFER_ENABLED, like and unlike requests only record an intent:
+    likes:buf:<post_id>:add            users whose latest intent is a like
+    likes:buf:<post_id>:remove         users whose latest intent is an unlike
+    likes:buf:<post_id>:add:flushing   \
+    likes:buf:<post_id>:remove:flushing  intents taken by a flush that has not finished
+    likes:buf:dirty                    posts with pending intents
+    likes:buf:flushing                 posts with intents taken by a flush
+A user is in at most one of the two live sets, so the newest intent always wins.
+`flush_pending_likes` (run by `manage.py flush_like_buffer`, one process at a time)
+moves a post's live intents into its flushing sets with one atomic script, applies
+them to the Like table and recounts Post.like_count, then deletes the flushing sets.
+Intents recorded meanwhile land in the emptied live sets for the next flush, and a
+flush that crashes is retried from the flushing sets.
+
+Reads resolve each pending user as live intent, else flushing intent, else the stored
+row, and compare with the stored row. That stays exact before, during and after a
+flush, so clients see their own action immediately and nothing is counted twice.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from uni_hub_core.redis_client import get_redis_connection
+from .counters import recount_likes
+from .models import Post, Like
+from . import trending
+
+User = get_user_model()
+
+DIRTY_KEY = 'likes:buf:dirty'
+FLUSHING_KEY = 'likes:buf:flushing'
+
+# Merge the live intents into the flushing sets (newer intents win) and empty the live sets
+TAKE_INTENTS = """
+local adds = redis.call('SMEMBERS', KEYS[1])
+local removes = redis.call('SMEMBERS', KEYS[2])
+for _, user_id in ipairs(adds) do
+    redis.call('SREM', KEYS[4], user_id)
+    redis.call('SADD', KEYS[3], user_id)
+end
+for _, user_id in ipairs(removes) do
+    redis.call('SREM', KEYS[3], user_id)
+    redis.call('SADD', KEYS[4], user_id)
+end
+redis.call('DEL', KEYS[1], KEYS[2])
+redis.call('SADD', KEYS[5], ARGV[1])
+return {redis.call('SMEMBERS', KEYS[3]), redis.call('SMEMBERS', KEYS[4])}
+"""
+
+
+def is_enabled():
+    return settings.POST_LIKE_BUFFER_ENABLED
+
+
+def _add_key(post_id):
+    return f'likes:buf:{post_id}:add'
+
+
+def _remove_key(post_id):
+    return f'likes:buf:{post_id}:remove'
+
+
+def _flushing_add_key(post_id):
+    return f'likes:buf:{post_id}:add:flushing'
+
+
+def _flushing_remove_key(post_id):
+    return f'likes:buf:{post_id}:remove:flushing'
+
+
+def _intent_keys(post_id):
+    return (_add_key(post_id), _remove_key(post_id), _flushing_add_key(post_id), _flushing_remove_key(post_id))
+
+
+def _resolve(stored, live_add, live_remove, flushing_add, flushing_remove):
+    """Whether a user likes a post once all of their pending intents are applied"""
+    if live_add or live_remove:
+        return live_add
+    if flushing_add or flushing_remove:
+        return flushing_add
+    return stored
+
+
+def _likes(conn, post_id, user_id):
+    pipe = conn.pipeline(transaction=False)
+    for key in _intent_keys(post_id):
+        pipe.sismember(key, user_id)
+    intents = pipe.execute()
+    stored = Like.objects.filter(post_id=post_id, user_id=user_id).exists()
+    return _resolve(stored, *intents)
+
+
+def _record(post_id, user_id, like):
+    """
+    Record the user's newest intent for a post.
+    Returns:
+        bool: False if the user already is in that state (stored or pending).
+    """
+    conn = get_redis_connection()
+    if _likes(conn, post_id, user_id) == like:
+        return False
+    record_key, cancel_key = (_add_key(post_id), _remove_key(post_id)) if like else (_remove_key(post_id), _add_key(post_id))
+    pipe = conn.pipeline(transaction=True)
+    pipe.srem(cancel_key, user_id)
+    # Recorded even when it matches the stored row: it must override an intent being flushed
+    pipe.sadd(record_key, user_id)
+    pipe.sadd(DIRTY_KEY, post_id)
+    pipe.execute()
+    return True
+
+
+def buffer_like(post_id, user_id):
+    """
+    Record a like intent.
+    Returns:
+        bool: False if the user already likes the post (stored or pending).
+    """
+    return _record(post_id, user_id, True)
+
+
+def buffer_unlike(post_id, user_id):
+    """
+    Record an unlike intent.
+    Returns:
+        bool: False if the user does not like the post (stored or pending).
+    """
+    return _record(post_id, user_id, False)
+
+
+def get_pending_state(post_ids, user_id=None):
+    """
+    Read the buffered state for a page of posts: one Redis round trip and one query.
+    Args:
+        post_ids (list): Post primary keys.
+        user_id (int, optional): Viewer whose pending intents should be reported.
+    Returns:
+        dict: post_id -> (like_count delta, viewer pending like, viewer pending unlike)
+    """
+    if not post_ids:
+        return {}
+    pipe = get_redis_connection().pipeline(transaction=False)
+    for post_id in post_ids:
+        for key in _intent_keys(post_id):
+            pipe.smembers(key)
+    replies = iter(pipe.execute())
+    intents = {
+        post_id: [{int(member) for member in next(replies)} for _ in range(4)]
+        for post_id in post_ids
+    }
+    pending_users = {member for sets in intents.values() for members in sets for member in members}
+    stored = set()
+    if pending_users:
+        stored = set(Like.objects.filter(post_id__in=post_ids, user_id__in=pending_users).values_list('post_id', 'user_id'))
+
+    state = {}
+    for post_id, sets in intents.items():
+        delta = 0
+        liked = unliked = False
+        for member in set().union(*sets):
+            was_stored = (post_id, member) in stored
+            likes = _resolve(was_stored, *(member in members for members in sets))
+            delta += int(likes) - int(was_stored)
+            if member == user_id:
+                liked, unliked = likes and not was_stored, was_stored and not likes
+        state[post_id] = (delta, liked, unliked)
+    return state
+
+
+def flush_pending_likes(max_posts=1000):
+    """
+    Apply buffered intents to the Like table and recount the affected posts.
+    Intents are moved out of the live sets atomically before they are applied and
+    deleted only after the database write commits; a crashed flush is retried from
+    the flushing sets, and both writes are idempotent.
+    Args:
+        max_posts (int): Upper bound on posts taken from the dirty set in this call.
+    Returns:
+        int: Number of posts flushed.
+    """
+    conn = get_redis_connection()
+    # Posts left behind by an interrupted flush come first
+    post_ids = {int(post_id) for post_id in conn.smembers(FLUSHING_KEY)}
+    post_ids.update(int(post_id) for post_id in conn.spop(DIRTY_KEY, max_posts))
+    if not post_ids:
+        return 0
+    post_ids = sorted(post_ids)
+
+    take = conn.register_script(TAKE_INTENTS)
+    pipe = conn.pipeline(transaction=False)
+    for post_id in post_ids:
+        take(keys=[*_intent_keys(post_id), FLUSHING_KEY], args=[post_id], client=pipe)
+    pending = {
+        post_id: ({int(user_id) for user_id in adds}, {int(user_id) for user_id in removes})
+        for post_id, (adds, removes) in zip(post_ids, pipe.execute())
+    }
+
+    existing_posts = dict(Post.objects.filter(pk__in=post_ids).values_list('pk', 'community_id'))
+    adding_users = {user_id for adds, _ in pending.values() for user_id in adds}
+    existing_users = set(User.objects.filter(pk__in=adding_users).values_list('pk', flat=True))
+    stored = set(Like.objects.filter(post_id__in=existing_posts, user_id__in=adding_users).values_list('post_id', 'user_id'))
+
+    # Net number of rows actually written per post, for the trending ranking
+    changes = {}
+    with transaction.atomic():
+        new_likes = []
+        for post_id, (adds, removes) in pending.items():
+            if post_id not in existing_posts:
+                continue
+            inserted = [
+                Like(post_id=post_id, user_id=user_id)
+                for user_id in adds if user_id in existing_users and (post_id, user_id) not in stored
+            ]
+            new_likes.extend(inserted)
+            deleted = 0
+            if removes:
+                deleted, _ = Like.objects.filter(post_id=post_id, user_id__in=removes).delete()
+            changes[post_id] = len(inserted) - deleted
+        Like.objects.bulk_create(new_likes, batch_size=1000, ignore_conflicts=True)
+        recount_likes(list(existing_posts))
+
+    for post_id, change in changes.items():
+        if change:
+            trending.record(post_id, existing_posts[post_id], trending.LIKE_WEIGHT * change)
+
+    pipe = conn.pipeline(transaction=False)
+    for post_id in post_ids:
+        pipe.delete(_flushing_add_key(post_id), _flushing_remove_key(post_id))
+    pipe.srem(FLUSHING_KEY, *post_ids)
+    pipe.execute()
+    return len(post_ids)
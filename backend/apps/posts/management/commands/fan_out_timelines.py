@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.posts.timeline import fan_out_pending_posts
+
+
+class Command(BaseCommand):
+    """Write queued community posts into their readers' home timelines"""
+    help = 'Fan out queued posts into home timelines and trim them (run periodically, or with --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-posts', type=int, default=100, help='Posts fanned out per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep fanning out until interrupted')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between runs with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            fanned_out = 0
+            while True:
+                batch = fan_out_pending_posts(max_posts=options['max_posts'])
+                fanned_out += batch
+                if batch < options['max_posts']:
+                    break
+            if fanned_out:
+                self.stdout.write(f'Fanned out {fanned_out} posts')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.posts.like_buffer import flush_pending_likes
+
+
+class Command(BaseCommand):
+    """Apply like/unlike intents buffered in Redis to the Like table"""
+    help = 'Flush the Redis like buffer into the database (run periodically, or with --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-posts', type=int, default=1000, help='Posts flushed per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep flushing until interrupted')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between flushes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = 0
+            while True:
+                batch = flush_pending_likes(max_posts=options['max_posts'])
+                flushed += batch
+                if batch < options['max_posts']:
+                    break
+            if flushed:
+                self.stdout.write(f'Flushed buffered likes for {flushed} posts')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
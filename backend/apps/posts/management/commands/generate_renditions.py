@@ -0,0 +1,22 @@
+from django.db.models import F
+from django.core.management.base import BaseCommand
+from uni_hub_core.images import TRACKED_FIELDS, render_image, rendered_field_name
+
+
+class Command(BaseCommand):
+    """Generate image renditions for files uploaded before processing existed, or that failed"""
+    help = 'Generate resized renditions for every stored post image, cover image and avatar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate renditions that already exist')
+
+    def handle(self, *args, **options):
+        generated = 0
+        for model, field_name in TRACKED_FIELDS:
+            rows = model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            if not options['force']:
+                rows = rows.exclude(**{rendered_field_name(field_name): F(field_name)})
+            for pk, name in rows.values_list('pk', field_name).iterator():
+                render_image(model._meta.label, field_name, pk, name)
+                generated += 1
+        self.stdout.write(self.style.SUCCESS(f'Generated renditions for {generated} images'))
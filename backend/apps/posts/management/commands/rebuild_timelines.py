@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.posts.timeline import rebuild_timeline, trim_timelines
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Rebuild or trim the materialized home timelines"""
+    help = 'Rebuild home timelines from the feed visibility rules, or trim them to HOME_TIMELINE_MAX_ENTRIES'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Only process this user id (repeatable)')
+        parser.add_argument('--trim-only', action='store_true', help='Only delete entries beyond the per-user cap')
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if options['trim_only']:
+            deleted = trim_timelines(user_ids=user_ids)
+            self.stdout.write(self.style.SUCCESS(f'Trimmed {deleted} timeline entries'))
+            return
+
+        users = User.objects.filter(is_active=True)
+        if user_ids:
+            users = users.filter(id__in=user_ids)
+        rebuilt = 0
+        for user in users.iterator():
+            with transaction.atomic():
+                rebuild_timeline(user)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} home timelines'))
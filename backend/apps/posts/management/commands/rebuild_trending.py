@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.posts.trending import rebuild
+
+
+class Command(BaseCommand):
+    """Rebuild the Redis trending rankings from the database"""
+    help = 'Recompute trending scores for recent posts with a fresh decay epoch (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Rank posts created within this many days')
+
+    def handle(self, *args, **options):
+        ranked = rebuild(since=timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Ranked {ranked} posts'))
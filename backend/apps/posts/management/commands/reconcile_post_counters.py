@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.posts.counters import recount_posts
+from apps.posts.models import Post
+
+
+class Command(BaseCommand):
+    """Recompute Post.like_count and Post.comment_count from the Like and Comment tables"""
+    help = 'Recompute denormalized like and comment counters on posts in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of posts updated per statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        updated = 0
+        while True:
+            # Walk the primary key so each batch is an index range, not an OFFSET scan
+            ids = list(
+                Post.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                updated += recount_posts(Post.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]))
+            last_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f'Reconciled counters for {updated} posts'))
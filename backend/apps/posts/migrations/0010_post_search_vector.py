@@ -0,0 +1,37 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Keep search_vector current on every INSERT/UPDATE, including bulk and raw writes
+CREATE_TRIGGER = '''
+CREATE TRIGGER posts_post_search_vector_update
+BEFORE INSERT OR UPDATE OF content ON posts_post
+FOR EACH ROW EXECUTE FUNCTION
+tsvector_update_trigger(search_vector, 'pg_catalog.english', content);
+
+UPDATE posts_post SET search_vector = to_tsvector('pg_catalog.english', coalesce(content, ''));
+'''
+
+DROP_TRIGGER = '''
+DROP TRIGGER IF EXISTS posts_post_search_vector_update ON posts_post;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='post_search_vector_idx'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
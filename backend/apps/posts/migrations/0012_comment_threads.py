@@ -0,0 +1,40 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Existing comments are all top-level: their path is just their own padded id
+BACKFILL_PATHS = "UPDATE posts_comment SET path = lpad(id::text, 10, '0') WHERE path = '';"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_comment_post_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Depth'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, db_collation='C', editable=False, max_length=255, verbose_name='Thread path'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Reply count'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ),
+        migrations.RunSQL(BACKFILL_PATHS, migrations.RunSQL.noop),
+    ]
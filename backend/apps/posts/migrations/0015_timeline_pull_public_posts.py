@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+def drop_public_post_entries(apps, schema_editor):
+    """Public posts are now merged in at read time instead of being fanned out"""
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    TimelineEntry.objects.filter(post__community__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_community_created_idx'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='timelineentry',
+            options={'ordering': ['-created_at', '-post_id'], 'verbose_name': 'Timeline Entry', 'verbose_name_plural': 'Timeline Entries'},
+        ),
+        migrations.RemoveIndex(
+            model_name='timelineentry',
+            name='timeline_user_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-created_at', '-post'], name='timeline_user_created_idx'),
+        ),
+        migrations.RunPython(drop_public_post_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_timeline_pull_public_posts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_rendered',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Image with renditions'),
+        ),
+    ]
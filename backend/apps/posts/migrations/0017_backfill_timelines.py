@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.db import migrations
+
+# Same rows as `rebuild_timeline` for every user: the newest posts of their active
+# communities plus their own community posts, capped at HOME_TIMELINE_MAX_ENTRIES
+BACKFILL_TIMELINES = """
+INSERT INTO posts_timelineentry (user_id, post_id, created_at)
+SELECT user_id, post_id, created_at FROM (
+    SELECT user_id, post_id, created_at,
+           row_number() OVER (PARTITION BY user_id ORDER BY created_at DESC, post_id DESC) AS position
+    FROM (
+        SELECT member.user_id, post.id AS post_id, post.created_at
+        FROM communities_communitymember member
+        JOIN posts_post post ON post.community_id = member.community_id
+        WHERE member.is_active
+        UNION
+        SELECT post.author_id, post.id, post.created_at
+        FROM posts_post post
+        WHERE post.community_id IS NOT NULL
+    ) AS readable
+) AS ranked
+WHERE position <= %s
+ON CONFLICT (user_id, post_id) DO NOTHING;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_image_rendered'),
+        ('communities', '0011_community_cover_image_rendered'),
+    ]
+
+    operations = [
+        migrations.RunSQL([(BACKFILL_TIMELINES, [settings.HOME_TIMELINE_MAX_ENTRIES])], migrations.RunSQL.noop),
+    ]
@@ -1,24 +1,43 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from apps.communities.models import Community
+from uni_hub_core.counters import CounterFieldsMixin
 
 User = get_user_model()
 
 
-class Post(models.Model):
+class Post(CounterFieldsMixin, models.Model):
     """Post Model"""
     content = models.TextField(_('Content'))
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts', db_index=True)  # Indexed for fast author queries
     community = models.ForeignKey(Community, on_delete=models.CASCADE, related_name='posts', null=True, blank=True, db_index=True)  # Indexed for fast community queries
     image = models.ImageField(_('Image'), upload_to='post_images/', blank=True, null=True)
+    # Name of the image whose renditions are stored, set by the rendition job
+    image_rendered = models.CharField(_('Image with renditions'), max_length=100, blank=True, editable=False)
     created_at = models.DateTimeField(_('Creation time'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Update time'), auto_now=True)
+    # Denormalized counters, maintained with F() updates and reconciled by `reconcile_post_counters`
+    like_count = models.PositiveIntegerField(_('Like count'), default=0)
+    comment_count = models.PositiveIntegerField(_('Comment count'), default=0)
+    counter_fields = ('like_count', 'comment_count')
+    background_fields = ('image_rendered',)
+    # Full-text index of `content`, maintained by a database trigger on insert/update
+    search_vector = SearchVectorField(null=True, editable=False)
     
     class Meta:
         verbose_name = 'Post'
         verbose_name_plural = 'Posts'
         ordering = ['-created_at']
+        indexes = [
+            # Backs keyset pagination of the feed on (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='post_created_id_idx'),
+            # Serves community feeds and the community activity timeline
+            models.Index(fields=['community', '-created_at', '-id'], name='post_community_created_idx'),
+            GinIndex(fields=['search_vector'], name='post_search_vector_idx'),
+        ]
     
     def __str__(self):
         return f"{self.author.username} Post" 
@@ -27,21 +46,50 @@ class Post(models.Model):
 class Comment(models.Model):
     """
     Comment Model for Post
-    Each comment is linked to a post and an author (user).
+    Each comment is linked to a post and an author (user), and optionally replies to
+    another comment. `path` is a materialized path of zero-padded ids from the thread
+    root down to this comment, so ordering by path lists a thread depth-first and a
+    subtree is a single prefix range.
     """
+    PATH_SEGMENT_WIDTH = 10
+    MAX_DEPTH = 20
+
     content = models.TextField('Comment Content')
     created_at = models.DateTimeField('Comment time', auto_now_add=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, related_name='replies', null=True, blank=True)
+    # "C" collation keeps byte order, so prefix LIKE and ORDER BY path both use the index
+    path = models.CharField('Thread path', max_length=255, blank=True, editable=False, db_collation='C')
+    depth = models.PositiveSmallIntegerField('Depth', default=0, editable=False)
+    reply_count = models.PositiveIntegerField('Reply count', default=0)
 
     class Meta:
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
         ordering = ['-created_at']
+        indexes = [
+            # Serves both the newest-N window in post detail and keyset paging of older comments
+            models.Index(fields=['post', '-created_at', '-id'], name='comment_post_created_idx'),
+            models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+            # Serves the incremental engagement rollup
+            models.Index(fields=['created_at'], name='comment_created_idx'),
+        ]
 
     def __str__(self):
         return f"Comment by {self.author.username} on Post {self.post.id}" 
 
+    def save(self, *args, **kwargs):
+        creating = self._state.adding
+        if creating and self.parent_id:
+            self.depth = self.parent.depth + 1
+        super().save(*args, **kwargs)
+        if creating:
+            # The path ends with this comment's own id, which only exists after the insert
+            prefix = f'{self.parent.path}.' if self.parent_id else ''
+            self.path = f'{prefix}{self.pk:0{self.PATH_SEGMENT_WIDTH}d}'
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
 
 class Like(models.Model):
     """
@@ -57,9 +105,35 @@ class Like(models.Model):
         verbose_name = 'Like'
         verbose_name_plural = 'Likes'
         ordering = ['-created_at']
+        indexes = [
+            # Serves the incremental engagement rollup
+            models.Index(fields=['created_at'], name='like_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} likes Post {self.post.id}"
 
-# Add a property to Post to get like count
-Post.add_to_class('like_count', property(lambda self: self.likes.count())) 
\ No newline at end of file
+
+class TimelineEntry(models.Model):
+    """
+    Materialized home timeline row.
+    One row per (reader, community post) pair, written by the fan-out job shortly after
+    the post is created (fan-out on write), so that reading a home feed is a range scan
+    over (user, created_at, post) merged with the public posts.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    # Copy of post.created_at so the feed can be ordered without joining Post
+    created_at = models.DateTimeField(_('Post creation time'))
+
+    class Meta:
+        unique_together = ('user', 'post')
+        verbose_name = 'Timeline Entry'
+        verbose_name_plural = 'Timeline Entries'
+        ordering = ['-created_at', '-post_id']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='timeline_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} in {self.user_id}'s timeline"
@@ -1,20 +1,89 @@
 from rest_framework import serializers
 from .models import Post, Comment, Like
+from . import like_buffer
+from uni_hub_core.images import ImageRenditionsField
+
+
+def _get_viewer(context):
+    request = context.get('request')
+    if request and request.user.is_authenticated:
+        return request.user
+    return None
+
+
+class PostListSerializer(serializers.ListSerializer):
+    """
+    List serializer that resolves viewer state for a whole page at once.
+    The posts the viewer has liked are fetched with a single `post_id IN (...)` query
+    (plus one Redis round trip when the like buffer is enabled) and shared with each
+    child through the serializer context.
+    """
+    def to_representation(self, data):
+        posts = list(data.all() if hasattr(data, 'all') else data)
+        post_ids = [post.pk for post in posts]
+        viewer = _get_viewer(self.context)
+        if viewer is not None:
+            self._context['liked_post_ids'] = set(
+                Like.objects.filter(user=viewer, post_id__in=post_ids)
+                .values_list('post_id', flat=True)
+            )
+        if like_buffer.is_enabled():
+            self._context['pending_likes'] = like_buffer.get_pending_state(
+                post_ids, viewer.pk if viewer is not None else None
+            )
+        return super().to_representation(posts)
 
 
 class PostSerializer(serializers.ModelSerializer):
     """Post Serializers"""
     author_name = serializers.CharField(source='author.username', read_only=True)
     community_name = serializers.CharField(source='community.name', read_only=True)
-    like_count = serializers.IntegerField(read_only=True)
+    has_liked = serializers.SerializerMethodField()
+    is_author = serializers.SerializerMethodField()
+    image_renditions = ImageRenditionsField(source='image')
     
     class Meta:
         model = Post
         fields = [
             'id', 'content', 'author', 'author_name', 'community', 
-            'community_name', 'image', 'created_at', 'updated_at', 'like_count'
+            'community_name', 'image', 'image_renditions', 'created_at', 'updated_at', 'like_count',
+            'comment_count', 'has_liked', 'is_author'
         ]
-        read_only_fields = ['author', 'created_at', 'updated_at']
+        read_only_fields = ['author', 'created_at', 'updated_at', 'like_count', 'comment_count']
+        list_serializer_class = PostListSerializer
+
+    def get_pending_likes(self, obj):
+        """Buffered like state for `obj`: (count delta, viewer pending like, viewer pending unlike)"""
+        if not like_buffer.is_enabled():
+            return (0, False, False)
+        pending = self.context.setdefault('pending_likes', {})
+        if obj.pk not in pending:
+            viewer = _get_viewer(self.context)
+            pending.update(like_buffer.get_pending_state([obj.pk], viewer.pk if viewer is not None else None))
+        return pending[obj.pk]
+
+    def get_has_liked(self, obj):
+        viewer = _get_viewer(self.context)
+        if viewer is None:
+            return False
+        liked_post_ids = self.context.get('liked_post_ids')
+        if liked_post_ids is None:
+            # Single-object responses: one EXISTS query
+            stored = Like.objects.filter(user=viewer, post=obj).exists()
+        else:
+            stored = obj.pk in liked_post_ids
+        _, pending_like, pending_unlike = self.get_pending_likes(obj)
+        return pending_like or (stored and not pending_unlike)
+
+    def to_representation(self, instance):
+        ret = super().to_representation(instance)
+        if 'like_count' in ret:
+            ret['like_count'] = max(0, ret['like_count'] + self.get_pending_likes(instance)[0])
+        return ret
+
+    def get_is_author(self, obj):
+        viewer = _get_viewer(self.context)
+        return viewer is not None and obj.author_id == viewer.pk
 
     def validate(self, attrs):
         request = self.context.get('request')
@@ -23,15 +92,15 @@ class PostSerializer(serializers.ModelSerializer):
         # Only enforce community membership on create, or if changing community
         if request and request.method == 'POST':
             if community is not None:
-                from apps.communities.models import CommunityMember
-                if not CommunityMember.objects.filter(user=user, community=community, is_active=True).exists():
+                from apps.communities.membership_cache import is_member
+                if not is_member(user, community.pk):
                     raise serializers.ValidationError('You must be a member of the selected community to post.')
         elif request and request.method in ['PUT', 'PATCH']:
             # On update, only check if changing community
             instance = getattr(self, 'instance', None)
             if instance and community is not None and instance.community_id != (community.id if hasattr(community, 'id') else community):
-                from apps.communities.models import CommunityMember
-                if not CommunityMember.objects.filter(user=user, community=community, is_active=True).exists():
+                from apps.communities.membership_cache import is_member
+                if not is_member(user, community.pk if hasattr(community, 'pk') else community):
                     raise serializers.ValidationError('You must be a member of the selected community to post.')
         return attrs
 
@@ -41,6 +110,15 @@ class PostSerializer(serializers.ModelSerializer):
         return value
 
 
+class PostSearchSerializer(PostSerializer):
+    """Post Serializer for full-text search results, with relevance and a highlighted snippet"""
+    search_rank = serializers.FloatField(read_only=True)
+    search_snippet = serializers.CharField(read_only=True)
+
+    class Meta(PostSerializer.Meta):
+        fields = PostSerializer.Meta.fields + ['search_rank', 'search_snippet']
+
+
 class CommentSerializer(serializers.ModelSerializer):
     """
     Serializer for Comment model
@@ -49,8 +127,28 @@ class CommentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Comment
-        fields = ['id', 'content', 'created_at', 'author', 'author_name', 'post']
-        read_only_fields = ['id', 'created_at', 'author', 'author_name', 'post']
+        fields = ['id', 'content', 'created_at', 'author', 'author_name', 'post', 'parent', 'depth', 'reply_count']
+        read_only_fields = ['id', 'created_at', 'author', 'author_name', 'post', 'depth', 'reply_count']
+
+    def validate_parent(self, parent):
+        view = self.context.get('view')
+        post_id = view.kwargs.get('post_id') if view else None
+        if parent is not None:
+            if post_id is not None and str(parent.post_id) != str(post_id):
+                raise serializers.ValidationError('You can only reply to a comment on the same post.')
+            if parent.depth + 1 > Comment.MAX_DEPTH:
+                raise serializers.ValidationError('This thread is too deep to reply to.')
+        return parent
+
+
+class ThreadedCommentSerializer(CommentSerializer):
+    """
+    Top-level comment with its first replies (in thread order) embedded
+    """
+    replies = CommentSerializer(source='first_replies', many=True, read_only=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ['replies']
 
 
 class LikeSerializer(serializers.ModelSerializer):
@@ -67,10 +165,11 @@ class LikeSerializer(serializers.ModelSerializer):
 
 class PostDetailSerializer(PostSerializer):
     """
-    Post Detail Serializer with nested comments
+    Post Detail Serializer with the newest comments nested
+    The full comment history is paginated on the post's comments endpoint;
+    `comment_count` gives the total.
     """
-    comments = CommentSerializer(many=True, read_only=True)
-    like_count = serializers.IntegerField(read_only=True)
+    comments = CommentSerializer(source='recent_comments', many=True, read_only=True)
 
     class Meta(PostSerializer.Meta):
         fields = PostSerializer.Meta.fields + ['comments'] 
\ No newline at end of file
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Post
+from .timeline import queue_fan_out
+from . import trending
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    """Queue a new community post for its readers' home timelines"""
+    if created and not kwargs.get('raw'):
+        queue_fan_out(instance)
+        trending.record(instance.pk, instance.community_id, trending.POST_WEIGHT, at=instance.created_at)
+
+
+# Likes and comments are scored, and deleted posts discarded, by the views and the like
+# buffer flush, not by signals: delete receivers on Post/Like/Comment would turn cascaded
+# deletes of a community or user into per-row work
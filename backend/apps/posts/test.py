@@ -1,9 +1,32 @@
-from django.test import TestCase, Client
+import os
+import shutil
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+import redis
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-from .models import Post
+from .models import Comment, Like, Post, TimelineEntry
+from .like_buffer import DIRTY_KEY, FLUSHING_KEY, _intent_keys, flush_pending_likes
+from .timeline import fan_out_pending_posts
+from .trending import EPOCH_KEY, GLOBAL_KEY, community_key, rebuild, top_post_ids
+from .views import RECENT_COMMENTS_LIMIT
+from . import like_buffer, trending
 from apps.communities.models import Community, CommunityMember
+from apps.communities.services import add_member
+from uni_hub_core import images
+from uni_hub_core.redis_client import get_redis_connection
 
 User = get_user_model()
 
@@ -125,4 +148,553 @@ class PostFlowTestGroup4(TestCase):
         self.client.logout()
         self.client.login(email='guest@uwe.ac.uk', password='TestPass123!')
         response = self.client.get(detail_url)
-        self.assertIn(response.status_code, [200, 401, 403, 404]) 
\ No newline at end of file
+        self.assertIn(response.status_code, [200, 401, 403, 404]) 
+
+class PostCounterTest(TestCase):
+    """Denormalized like/comment counters stay in step with the Like and Comment tables"""
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='jameswilson',
+            email='james.wilson@uwe.ac.uk', password='TestPass123!'
+        )
+        self.post = Post.objects.create(content='Counting post', author=self.user)
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+
+    def test_like_unlike_and_comment_update_counters(self):
+        self.client.post(reverse('posts:post_like', args=[self.post.id]))
+        self.client.post(reverse('posts:post_like', args=[self.post.id]))
+        self.client.post(reverse('posts:post_comments', args=[self.post.id]), {'content': 'Nice'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(self.post.comment_count, 1)
+        self.client.post(reverse('posts:post_unlike', args=[self.post.id]))
+        self.client.post(reverse('posts:post_unlike', args=[self.post.id]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_edit_keeps_concurrent_counter_updates(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        # A like lands after the edit request has loaded the post
+        self.client.post(reverse('posts:post_like', args=[self.post.id]))
+        stale.content = 'Edited'
+        stale.save()
+        response = self.client.patch(
+            reverse('posts:post_detail', args=[self.post.id]), {'content': 'Edited again'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.content, self.post.like_count), ('Edited again', 1))
+
+    def test_feed_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(reverse('posts:post_list'))
+        for i in range(5):
+            Post.objects.create(content=f'Post {i}', author=self.user)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse('posts:post_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(many), len(single))
+
+    def test_reconcile_command_repairs_drift(self):
+        Like.objects.create(user=self.user, post=self.post)
+        Comment.objects.create(content='One', author=self.user, post=self.post)
+        Comment.objects.create(content='Two', author=self.user, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(like_count=7, comment_count=0)
+        call_command('reconcile_post_counters', batch_size=1, stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(self.post.comment_count, 2)
+
+
+class PostFeedCursorPaginationTest(TestCase):
+    """Keyset pagination walks the feed without gaps or repeats, even on timestamp ties"""
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='jameswilson',
+            email='james.wilson@uwe.ac.uk', password='TestPass123!'
+        )
+        for i in range(5):
+            Post.objects.create(content=f'Post {i}', author=self.user)
+        # Force ties on created_at so the id tiebreaker matters
+        Post.objects.update(created_at=Post.objects.first().created_at)
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+
+    def test_cursor_pages_cover_feed_once(self):
+        url = reverse('posts:post_list') + '?pagination=cursor&page_size=2'
+        seen = []
+        while url:
+            data = self.client.get(url).json()
+            self.assertNotIn('count', data)
+            seen.extend(post['id'] for post in data['results'])
+            url = data['next']
+        expected = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_page_numbers_still_available(self):
+        data = self.client.get(reverse('posts:post_list'), {'page': 1}).json()
+        self.assertEqual(data['count'], 5)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('posts:post_list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class HomeTimelineTest(TestCase):
+    """The materialized home timeline follows post creation and membership changes"""
+    def setUp(self):
+        self.client = Client()
+        self.author = User.objects.create_user(
+            username='jameswilson',
+            email='james.wilson@uwe.ac.uk', password='TestPass123!'
+        )
+        self.reader = User.objects.create_user(
+            username='emmadavis',
+            email='emma.davis@uwe.ac.uk', password='TestPass123!'
+        )
+        self.community = Community.objects.create(name='Engineering Society', description='Engineering', creator=self.author)
+        CommunityMember.objects.create(user=self.author, community=self.community)
+
+    def feed_contents(self):
+        self.client.login(email='emma.davis@uwe.ac.uk', password='TestPass123!')
+        return [post['content'] for post in self.client.get(reverse('posts:post_list')).json()['results']]
+
+    def create_posts(self, *contents, community=None):
+        """Create posts and run the fan-out job the way the scheduler would"""
+        with self.captureOnCommitCallbacks(execute=True):
+            for content in contents:
+                Post.objects.create(content=content, community=community, author=self.author)
+        fan_out_pending_posts()
+
+    def test_join_backfills_and_leave_prunes(self):
+        Post.objects.create(content='Members only', community=self.community, author=self.author)
+        Post.objects.create(content='Everyone', author=self.author)
+        self.assertEqual(self.feed_contents(), ['Everyone'])
+
+        self.client.post(reverse('communities:join_community', args=[self.community.id]))
+        self.assertEqual(self.feed_contents(), ['Everyone', 'Members only'])
+
+        self.create_posts('After joining', community=self.community)
+        self.assertEqual(self.feed_contents()[0], 'After joining')
+
+        self.client.post(reverse('communities:leave_community', args=[self.community.id]))
+        self.assertEqual(self.feed_contents(), ['Everyone'])
+
+    def test_fan_out_and_trim_run_in_the_job(self):
+        CommunityMember.objects.create(user=self.reader, community=self.community)
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(content='Queued', community=self.community, author=self.author)
+        # The request only writes the author's row
+        self.assertEqual(list(TimelineEntry.objects.filter(post=post).values_list('user_id', flat=True)), [self.author.id])
+
+        with override_settings(HOME_TIMELINE_MAX_ENTRIES=3):
+            self.create_posts(*(f'Post {i}' for i in range(5)), community=self.community)
+        self.assertEqual(TimelineEntry.objects.filter(user=self.reader).count(), 3)
+        self.assertEqual(self.feed_contents(), ['Post 4', 'Post 3', 'Post 2'])
+        self.assertEqual(fan_out_pending_posts(), 0)
+
+    def test_removal_by_admin_prunes(self):
+        CommunityMember.objects.filter(user=self.author).update(role='admin')
+        member = CommunityMember.objects.create(user=self.reader, community=self.community)
+        self.create_posts('Members only', community=self.community)
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+        response = self.client.patch(
+            reverse('communities:community_member_detail', args=[self.community.id, member.id]),
+            {'is_active': False}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader).exists())
+
+    def test_public_posts_are_merged_at_read_time(self):
+        CommunityMember.objects.create(user=self.reader, community=self.community)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(7):
+                Post.objects.create(content=f'Post {i}', community=self.community if i % 2 else None, author=self.author)
+        fan_out_pending_posts()
+        self.assertFalse(TimelineEntry.objects.filter(post__community__isnull=True).exists())
+
+        expected = [f'Post {i}' for i in reversed(range(7))]
+        self.assertEqual(self.feed_contents(), expected)
+        data = self.client.get(reverse('posts:post_list'), {'page': 1}).json()
+        self.assertEqual((data['count'], [post['content'] for post in data['results']]), (7, expected))
+
+        seen = []
+        url = reverse('posts:post_list') + '?pagination=cursor&page_size=3'
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(post['content'] for post in data['results'])
+            url = data['next']
+        self.assertEqual(seen, expected)
+
+
+class PostFullTextSearchTest(TestCase):
+    """Full-text search ranks matches, highlights snippets and keeps visibility rules"""
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='jameswilson',
+            email='james.wilson@uwe.ac.uk', password='TestPass123!'
+        )
+        self.outsider = User.objects.create_user(
+            username='emmadavis',
+            email='emma.davis@uwe.ac.uk', password='TestPass123!'
+        )
+        self.community = Community.objects.create(name='Engineering Society', description='Engineering', creator=self.user)
+        CommunityMember.objects.create(user=self.user, community=self.community)
+        Post.objects.create(content='Looking for a study group', author=self.user)
+        Post.objects.create(content='Study group, study notes and study snacks', author=self.user)
+        Post.objects.create(content='Private study group for members', community=self.community, author=self.user)
+        Post.objects.create(content='Football on Friday', author=self.user)
+
+    def test_search_ranks_and_highlights(self):
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+        results = self.client.get(reverse('posts:post_list'), {'search': 'studying groups'}).json()['results']
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]['content'], 'Study group, study notes and study snacks')
+        self.assertIn('<mark>', results[0]['search_snippet'])
+        self.assertGreaterEqual(results[0]['search_rank'], results[-1]['search_rank'])
+
+    def test_search_respects_visibility(self):
+        self.client.login(email='emma.davis@uwe.ac.uk', password='TestPass123!')
+        results = self.client.get(reverse('posts:post_list'), {'search': 'study'}).json()['results']
+        self.assertNotIn('Private study group for members', [post['content'] for post in results])
+        self.assertEqual(len(results), 2)
+
+    def test_search_rejects_cursor_pagination(self):
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+        response = self.client.get(reverse('posts:post_list'), {'search': 'study', 'pagination': 'cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('pagination', response.json())
+
+
+class PostDetailCommentWindowTest(TestCase):
+    """Post detail embeds only the newest comments; older ones are paged on the comments endpoint"""
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='jameswilson',
+            email='james.wilson@uwe.ac.uk', password='TestPass123!'
+        )
+        self.post = Post.objects.create(content='Popular post', author=self.user)
+        for i in range(8):
+            Comment.objects.create(content=f'Comment {i}', author=self.user, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(comment_count=8)
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+
+    def test_detail_embeds_newest_comments(self):
+        data = self.client.get(reverse('posts:post_detail', args=[self.post.id])).json()
+        self.assertEqual(data['comment_count'], 8)
+        self.assertEqual(len(data['comments']), RECENT_COMMENTS_LIMIT)
+        self.assertEqual(data['comments'][0]['content'], 'Comment 7')
+        self.assertEqual(data['comments'][0]['author_name'], 'jameswilson')
+
+    def test_comments_endpoint_pages_older_comments(self):
+        url = reverse('posts:post_comments', args=[self.post.id]) + '?page_size=3'
+        contents = []
+        while url:
+            data = self.client.get(url).json()
+            contents.extend(comment['content'] for comment in data['results'])
+            url = data['next']
+        self.assertEqual(contents, [f'Comment {i}' for i in range(7, -1, -1)])
+
+
+class PostViewerStateTest(TestCase):
+    """has_liked and is_author are resolved for a whole page in a fixed number of queries"""
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='jameswilson',
+            email='james.wilson@uwe.ac.uk', password='TestPass123!'
+        )
+        self.other = User.objects.create_user(
+            username='emmadavis',
+            email='emma.davis@uwe.ac.uk', password='TestPass123!'
+        )
+        self.own = Post.objects.create(content='Mine', author=self.user)
+        self.liked = Post.objects.create(content='Liked', author=self.other)
+        Like.objects.create(user=self.user, post=self.liked)
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+
+    def test_list_flags(self):
+        results = {post['content']: post for post in self.client.get(reverse('posts:post_list')).json()['results']}
+        self.assertTrue(results['Liked']['has_liked'])
+        self.assertFalse(results['Liked']['is_author'])
+        self.assertFalse(results['Mine']['has_liked'])
+        self.assertTrue(results['Mine']['is_author'])
+
+    def test_detail_flags(self):
+        data = self.client.get(reverse('posts:post_detail', args=[self.liked.id])).json()
+        self.assertTrue(data['has_liked'])
+        self.assertFalse(data['is_author'])
+
+    def test_list_query_count_independent_of_page_size(self):
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('posts:post_list'))
+        for i in range(6):
+            Post.objects.create(content=f'Extra {i}', author=self.other)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(reverse('posts:post_list'))
+        self.assertEqual(len(many), len(few))
+
+
+@override_settings(POST_LIKE_BUFFER_ENABLED=True)
+class LikeBufferTest(TestCase):
+    """Buffered likes are visible immediately and written to Like by the flusher"""
+    def setUp(self):
+        self.redis = get_redis_connection()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='jameswilson',
+            email='james.wilson@uwe.ac.uk', password='TestPass123!'
+        )
+        self.post = Post.objects.create(content='Viral post', author=self.user)
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+
+    def tearDown(self):
+        self.redis.delete(DIRTY_KEY, FLUSHING_KEY, *_intent_keys(self.post.id))
+
+    def test_buffered_like_is_merged_then_flushed(self):
+        response = self.client.post(reverse('posts:post_like', args=[self.post.id]))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.client.post(reverse('posts:post_like', args=[self.post.id])).status_code, 400)
+        self.assertFalse(Like.objects.exists())
+        data = self.client.get(reverse('posts:post_detail', args=[self.post.id])).json()
+        self.assertEqual(data['like_count'], 1)
+        self.assertTrue(data['has_liked'])
+
+        flush_pending_likes()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertTrue(Like.objects.filter(user=self.user, post=self.post).exists())
+
+        self.client.post(reverse('posts:post_unlike', args=[self.post.id]))
+        results = self.client.get(reverse('posts:post_list')).json()['results']
+        self.assertEqual(results[0]['like_count'], 0)
+        self.assertFalse(results[0]['has_liked'])
+        flush_pending_likes()
+        self.assertFalse(Like.objects.exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_unlike_during_flush_is_kept(self):
+        self.client.post(reverse('posts:post_like', args=[self.post.id]))
+        observed = []
+
+        def unlike_mid_flush(post_ids):
+            # The flush has taken the like but not committed it yet
+            observed.append(like_buffer.buffer_unlike(self.post.id, self.user.id))
+            return recount_likes(post_ids)
+
+        recount_likes = like_buffer.recount_likes
+        with mock.patch.object(like_buffer, 'recount_likes', unlike_mid_flush):
+            like_buffer.flush_pending_likes()
+        self.assertEqual(observed, [True])
+
+        # The like is stored, the unlike is still pending and both are counted once
+        self.assertTrue(Like.objects.filter(user=self.user, post=self.post).exists())
+        data = self.client.get(reverse('posts:post_detail', args=[self.post.id])).json()
+        self.assertEqual((data['like_count'], data['has_liked']), (0, False))
+
+        like_buffer.flush_pending_likes()
+        self.assertFalse(Like.objects.exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+
+class TrendingPostsTest(TestCase):
+    """Trending ranks by decayed engagement and hides posts the viewer cannot see"""
+    def setUp(self):
+        self.redis = get_redis_connection()
+        self.redis.delete(GLOBAL_KEY, EPOCH_KEY)
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='jameswilson',
+            email='james.wilson@uwe.ac.uk', password='TestPass123!'
+        )
+        self.other = User.objects.create_user(
+            username='emmadavis',
+            email='emma.davis@uwe.ac.uk', password='TestPass123!'
+        )
+        self.community = Community.objects.create(name='Chess Club', description='Chess', creator=self.other)
+        CommunityMember.objects.create(user=self.other, community=self.community)
+
+    def tearDown(self):
+        self.redis.delete(GLOBAL_KEY, EPOCH_KEY, community_key(self.community.id))
+
+    def test_engagement_orders_trending(self):
+        Post.objects.create(content='Quiet', author=self.user)
+        liked = Post.objects.create(content='Liked', author=self.user)
+        discussed = Post.objects.create(content='Discussed', author=self.user)
+        private = Post.objects.create(content='Members only', community=self.community, author=self.other)
+        self.client.login(email='emma.davis@uwe.ac.uk', password='TestPass123!')
+        self.client.post(reverse('posts:post_like', args=[liked.id]))
+        self.client.post(reverse('posts:post_comments', args=[discussed.id]), {'content': 'Agreed'})
+        for _ in range(3):
+            self.client.post(reverse('posts:post_comments', args=[private.id]), {'content': 'Hot'})
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+        self.client.post(reverse('posts:post_comments', args=[discussed.id]), {'content': 'Same'})
+
+        contents = [post['content'] for post in self.client.get(reverse('posts:post_trending')).json()]
+        self.assertEqual(contents, ['Discussed', 'Liked', 'Quiet'])
+
+        self.client.login(email='emma.davis@uwe.ac.uk', password='TestPass123!')
+        response = self.client.get(reverse('posts:post_trending'), {'community_id': self.community.id})
+        self.assertEqual([post['content'] for post in response.json()], ['Members only'])
+
+    def test_unlike_retracts_and_cascades_stay_set_based(self):
+        post = Post.objects.create(content='Fleeting', author=self.user)
+        base = self.redis.zscore(GLOBAL_KEY, post.id)
+        self.client.login(email='emma.davis@uwe.ac.uk', password='TestPass123!')
+        self.client.post(reverse('posts:post_like', args=[post.id]))
+        self.assertGreater(self.redis.zscore(GLOBAL_KEY, post.id), base)
+        self.client.post(reverse('posts:post_unlike', args=[post.id]))
+        self.assertAlmostEqual(self.redis.zscore(GLOBAL_KEY, post.id), base)
+
+        # Deleting a post costs the same number of queries however many likes it has
+        fans = User.objects.bulk_create(User(username=f'fan{i}', email=f'fan{i}@uwe.ac.uk') for i in range(20))
+        counts = []
+        for likers in (fans[:1], fans):
+            doomed = Post.objects.create(content='Doomed', author=self.user)
+            Like.objects.bulk_create(Like(user=fan, post=doomed) for fan in likers)
+            with CaptureQueriesContext(connection) as queries:
+                doomed.delete()
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_moved_and_deleted_posts_leave_the_rankings(self):
+        post = Post.objects.create(content='Wandering', author=self.other)
+        self.client.login(email='emma.davis@uwe.ac.uk', password='TestPass123!')
+        url = reverse('posts:post_detail', args=[post.id])
+        response = self.client.patch(url, {'community': self.community.id}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(self.redis.zscore(community_key(self.community.id), post.id))
+
+        other_community = Community.objects.create(name='Go Club', description='Go', creator=self.other)
+        add_member(other_community, self.other)
+        self.addCleanup(self.redis.delete, community_key(other_community.id))
+        response = self.client.patch(url, {'community': other_community.id}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(self.redis.zscore(community_key(self.community.id), post.id))
+        self.assertIsNotNone(self.redis.zscore(community_key(other_community.id), post.id))
+
+        self.client.delete(url)
+        self.assertIsNone(self.redis.zscore(GLOBAL_KEY, post.id))
+        self.assertIsNone(self.redis.zscore(community_key(other_community.id), post.id))
+
+    def test_redis_outage_falls_back_to_newest(self):
+        Post.objects.create(content='Older', author=self.user)
+        Post.objects.create(content='Newer', author=self.user)
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+        with mock.patch.object(trending, 'get_redis_connection', side_effect=redis.ConnectionError):
+            response = self.client.get(reverse('posts:post_trending'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post['content'] for post in response.json()], ['Newer', 'Older'])
+
+    def test_rebuild_matches_incremental_order(self):
+        first = Post.objects.create(content='First', author=self.user)
+        second = Post.objects.create(content='Second', author=self.user)
+        self.client.login(email='emma.davis@uwe.ac.uk', password='TestPass123!')
+        self.client.post(reverse('posts:post_like', args=[first.id]))
+        incremental = top_post_ids()
+        rebuild(since=timezone.now() - timedelta(days=1))
+        self.assertEqual(top_post_ids(), incremental)
+        self.assertEqual(incremental, [first.id, second.id])
+
+
+class PostImageRenditionTest(TestCase):
+    """Uploaded post images get resized renditions after the transaction commits"""
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='jameswilson',
+            email='james.wilson@uwe.ac.uk', password='TestPass123!'
+        )
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+
+    def tearDown(self):
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_upload_generates_renditions(self):
+        buffer = BytesIO()
+        Image.new('RGB', (2000, 1500), 'navy').save(buffer, 'JPEG')
+        upload = SimpleUploadedFile('campus.jpg', buffer.getvalue(), content_type='image/jpeg')
+        with self.settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_MODE='sync'):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('posts:post_list'), {'content': 'Photo', 'image': upload})
+            self.assertEqual(response.status_code, 201)
+            # The response is built before the renditions exist: they all point at the original
+            renditions = response.json()['image_renditions']
+            self.assertEqual(set(renditions), {'original', 'thumbnail', 'small', 'medium'})
+            self.assertEqual(set(renditions.values()), {renditions['original']})
+
+            post = Post.objects.get(pk=response.json()['id'])
+            self.assertEqual(post.image_rendered, post.image.name)
+            response = self.client.get(reverse('posts:post_detail', args=[post.id]))
+            renditions = response.json()['image_renditions']
+            self.assertEqual(len(set(renditions.values())), 4)
+            self.assertIn('campus.jpg.thumbnail.webp', renditions['thumbnail'])
+            thumbnail_path = os.path.join(self.media_root, renditions['thumbnail'].split('/media/', 1)[1])
+            with Image.open(thumbnail_path) as thumbnail:
+                self.assertEqual(thumbnail.size, (160, 160))
+            medium_path = os.path.join(self.media_root, renditions['medium'].split('/media/', 1)[1])
+            with Image.open(medium_path) as medium:
+                self.assertEqual(medium.size, (1080, 810))
+
+    def test_scheduling_failure_is_logged(self):
+        broken = mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool('A child process terminated abruptly')
+        with self.settings(IMAGE_PROCESSING_MODE='process'), \
+                mock.patch.object(images, '_executor', broken), \
+                self.assertLogs('uni_hub_core.images', 'ERROR'):
+            images.process_image(Post, 'image', 1, 'post_images/campus.jpg')
+            self.assertIsNone(images._executor)
+        broken.shutdown.assert_called_once_with(wait=False)
+
+
+class ThreadedCommentTest(TestCase):
+    """Replies form threads that are listed depth-first from the materialized path"""
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='jameswilson',
+            email='james.wilson@uwe.ac.uk', password='TestPass123!'
+        )
+        self.post = Post.objects.create(content='Discuss', author=self.user)
+        self.client.login(email='james.wilson@uwe.ac.uk', password='TestPass123!')
+        self.url = reverse('posts:post_comments', args=[self.post.id])
+
+    def reply(self, content, parent=None):
+        data = {'content': content}
+        if parent is not None:
+            data['parent'] = parent
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def test_thread_listing(self):
+        root = self.reply('Root')
+        first = self.reply('First reply', root)
+        self.reply('Nested reply', first)
+        self.reply('Second reply', root)
+        self.reply('Another root')
+
+        top_level = self.client.get(self.url).json()['results']
+        self.assertEqual([comment['content'] for comment in top_level], ['Another root', 'Root'])
+        self.assertEqual(top_level[1]['reply_count'], 2)
+        self.assertEqual([reply['content'] for reply in top_level[1]['replies']], ['First reply', 'Second reply'])
+
+        thread = self.client.get(self.url, {'thread': root}).json()['results']
+        self.assertEqual(
+            [(comment['content'], comment['depth']) for comment in thread],
+            [('First reply', 1), ('Nested reply', 2), ('Second reply', 1)],
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 5)
+
+    def test_reply_must_target_same_post(self):
+        other_post = Post.objects.create(content='Elsewhere', author=self.user)
+        foreign = Comment.objects.create(content='Foreign', author=self.user, post=other_post)
+        response = self.client.post(self.url, {'content': 'Cross-post', 'parent': foreign.id})
+        self.assertEqual(response.status_code, 400)
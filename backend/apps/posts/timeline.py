@@ -0,0 +1,246 @@
+"""
+posts/timeline.py
+Maintenance of the materialized home timeline (TimelineEntry).
+
+Community posts are fanned out on write to the community's active members and their
+author. Public (community-less) posts are not copied to anyone: every user would get a
+row, so they are pulled at read time instead and merged with the user's rows by
+`home_timeline_sources`.
+
+Only the author's row is written by the request that creates a post. Once it commits,
+the post id joins a Redis set:
+    timelines:pending
+and `manage.py fan_out_timelines` (one process at a time) writes the readers' rows and
+trims every timeline that received one back to HOME_TIMELINE_MAX_ENTRIES, once per run.
+
+Timelines of posts written before they existed are filled by migration
+0017_backfill_timelines; `manage.py rebuild_timelines` repairs them at any time.
+"""
+
+import logging
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from uni_hub_core.redis_client import get_redis_connection
+from apps.communities.models import CommunityMember
+from .models import Post, TimelineEntry
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+PENDING_KEY = 'timelines:pending'
+# Posts copied to each member added by a bulk import: one home timeline page
+MEMBER_BACKFILL_ENTRIES = 20
+
+
+def _max_entries():
+    return settings.HOME_TIMELINE_MAX_ENTRIES
+
+
+def _insert_entries(entries):
+    """Bulk insert timeline rows, skipping pairs that already exist"""
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def home_timeline_sources(user):
+    """
+    The two ordered streams a home timeline is merged from, as (created_at, post_id) rows:
+    the user's TimelineEntry rows and the public posts.
+    """
+    return (
+        TimelineEntry.objects.filter(user=user).values_list('created_at', 'post_id'),
+        Post.objects.filter(community__isnull=True).values_list('created_at', 'id'),
+    )
+
+
+def fan_out_post(post):
+    """
+    Write a community post into the timelines of the community's active members and its
+    author. Public posts are pulled at read time. The timelines are not trimmed here.
+    Args:
+        post (Post): The newly created post.
+    Returns:
+        set: Ids of the users whose timelines received the post.
+    """
+    if post.community_id is None:
+        return set()
+    reader_ids = CommunityMember.objects.filter(
+        community_id=post.community_id, is_active=True
+    ).values_list('user_id', flat=True)
+
+    written = {post.author_id}
+    batch = [TimelineEntry(user_id=post.author_id, post=post, created_at=post.created_at)]
+    for user_id in reader_ids.iterator(chunk_size=BATCH_SIZE):
+        if user_id != post.author_id:
+            written.add(user_id)
+            batch.append(TimelineEntry(user_id=user_id, post=post, created_at=post.created_at))
+        if len(batch) >= BATCH_SIZE:
+            _insert_entries(batch)
+            batch = []
+    if batch:
+        _insert_entries(batch)
+    return written
+
+
+def _trim_in_batches(user_ids):
+    user_ids = sorted(user_ids)
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        trim_timelines(user_ids=user_ids[start:start + BATCH_SIZE])
+
+
+def _enqueue(post_id):
+    try:
+        get_redis_connection().sadd(PENDING_KEY, post_id)
+    except redis.RedisError:
+        logger.exception('Could not queue the fan-out of post %s, writing it now', post_id)
+        post = Post.objects.filter(pk=post_id).first()
+        if post is not None:
+            _trim_in_batches(fan_out_post(post))
+
+
+def queue_fan_out(post):
+    """
+    Put a new community post into its author's timeline and queue the fan-out to its
+    readers for `fan_out_pending_posts`, once the current transaction commits.
+    Args:
+        post (Post): The newly created post.
+    """
+    if post.community_id is None:
+        return
+    _insert_entries([TimelineEntry(user_id=post.author_id, post=post, created_at=post.created_at)])
+    post_id = post.pk
+    transaction.on_commit(lambda: _enqueue(post_id))
+
+
+def fan_out_pending_posts(max_posts=100):
+    """
+    Fan out queued posts, then trim each timeline that received one of them once.
+    Posts leave the queue only after their rows are written, so an interrupted run is
+    retried; the inserts skip rows that already exist.
+    Args:
+        max_posts (int): Upper bound on posts taken from the queue in this call.
+    Returns:
+        int: Number of posts taken from the queue.
+    """
+    conn = get_redis_connection()
+    post_ids = [int(post_id) for post_id in conn.srandmember(PENDING_KEY, max_posts)]
+    if not post_ids:
+        return 0
+    reader_ids = set()
+    # Deleted posts are simply dropped from the queue
+    for post in Post.objects.filter(pk__in=post_ids).only('id', 'author_id', 'community_id', 'created_at'):
+        reader_ids |= fan_out_post(post)
+    _trim_in_batches(reader_ids)
+    conn.srem(PENDING_KEY, *post_ids)
+    return len(post_ids)
+
+
+def refan_post(post):
+    """Rebuild the fan-out of a post whose community has changed"""
+    TimelineEntry.objects.filter(post=post).delete()
+    queue_fan_out(post)
+
+
+def _backfill(user, posts):
+    """Copy the newest `posts` (up to the cap) into the user's timeline and trim it"""
+    recent = posts.order_by('-created_at', '-id').values_list('id', 'created_at')[:_max_entries()]
+    _insert_entries([
+        TimelineEntry(user=user, post_id=post_id, created_at=created_at)
+        for post_id, created_at in recent
+    ])
+    trim_timelines(user_ids=[user.id])
+
+
+def backfill_member_timeline(user, community):
+    """
+    Add a community's recent posts to a user's timeline after they join it.
+    Args:
+        user (User): The member who joined.
+        community (Community): The joined community.
+    """
+    _backfill(user, Post.objects.filter(community=community))
+
+
+def backfill_members_timeline(user_ids, community):
+    """
+    Add a community's most recent posts to the timelines of many new members at once.
+    Only MEMBER_BACKFILL_ENTRIES posts are copied per member, so a large import writes
+    one page per member; older posts reach them through `rebuild_timeline`. The few
+    rows added per member are trimmed by the next fan-out write to their timeline.
+    Args:
+        user_ids (list): The members who joined.
+        community (Community): The joined community.
+    """
+    recent = list(
+        Post.objects.filter(community=community).order_by('-created_at', '-id')
+        .values_list('id', 'created_at')[:MEMBER_BACKFILL_ENTRIES]
+    )
+    if not recent or not user_ids:
+        return
+    batch = []
+    for user_id in user_ids:
+        batch.extend(
+            TimelineEntry(user_id=user_id, post_id=post_id, created_at=created_at)
+            for post_id, created_at in recent
+        )
+        if len(batch) >= BATCH_SIZE:
+            _insert_entries(batch)
+            batch = []
+    if batch:
+        _insert_entries(batch)
+
+
+def prune_member_timeline(user, community):
+    """
+    Remove a community's posts from a user's timeline after they leave it.
+    The user's own posts in that community stay visible to them.
+    Args:
+        user (User): The member who left.
+        community (Community): The community that was left.
+    """
+    TimelineEntry.objects.filter(user=user, post__community=community).exclude(post__author=user).delete()
+
+
+def rebuild_timeline(user):
+    """
+    Recompute a user's timeline from scratch using the feed visibility rules.
+    Args:
+        user (User): The timeline owner.
+    """
+    member_community_ids = CommunityMember.objects.filter(
+        user=user, is_active=True
+    ).values_list('community_id', flat=True)
+    TimelineEntry.objects.filter(user=user).delete()
+    _backfill(user, Post.objects.filter(
+        Q(community__in=member_community_ids) | Q(author=user, community__isnull=False)
+    ))
+
+
+def trim_timelines(user_ids=None):
+    """
+    Delete timeline rows beyond HOME_TIMELINE_MAX_ENTRIES for each user.
+    Args:
+        user_ids (iterable, optional): Restrict trimming to these users.
+    Returns:
+        int: Number of rows deleted.
+    """
+    entries = TimelineEntry.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+    overflow = entries.annotate(
+        position=Window(
+            expression=RowNumber(),
+            partition_by=[F('user_id')],
+            order_by=[F('created_at').desc(), F('post_id').desc()],
+        )
+    ).filter(position__gt=_max_entries())
+
+    deleted = 0
+    while True:
+        ids = list(overflow.values_list('id', flat=True)[:BATCH_SIZE])
+        if not ids:
+            return deleted
+        deleted += TimelineEntry.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,177 @@
+"""
+posts/trending.py
+Incrementally maintained trending ranking, kept in Redis sorted sets.
+
+Every engagement event adds `weight * 2 ** ((t - epoch) / half_life)` to the post's
+score. Because all scores decay at the same rate, comparing these forward-decayed
+values at any moment gives the same order as comparing `weight * 2 ** -(age / half_life)`
+summed over events, so nothing has to be rescored as time passes. Each sorted set is
+trimmed to the top TRENDING_MAX_POSTS members on write.
+
+Posts deleted by a cascade (their community or author was deleted) are not removed
+here; readers skip ids that no longer resolve to a post and `rebuild` drops them.
+
+    trending:global            all posts
+    trending:community:<id>    posts of one community
+    trending:epoch             reference time for the forward decay
+"""
+
+import logging
+import time
+
+import redis
+from django.conf import settings
+from uni_hub_core.redis_client import get_redis_connection
+from .models import Post, Like, Comment
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_KEY = 'trending:global'
+EPOCH_KEY = 'trending:epoch'
+
+POST_WEIGHT = 1.0
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+
+
+def community_key(community_id):
+    return f'trending:community:{community_id}'
+
+
+def _keys(community_id):
+    keys = [GLOBAL_KEY]
+    if community_id is not None:
+        keys.append(community_key(community_id))
+    return keys
+
+
+def _epoch(conn):
+    epoch = conn.get(EPOCH_KEY)
+    if epoch is None:
+        conn.set(EPOCH_KEY, time.time(), nx=True)
+        epoch = conn.get(EPOCH_KEY)
+    return float(epoch)
+
+
+def _decayed(weight, timestamp, epoch):
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    return weight * 2 ** ((timestamp - epoch) / half_life)
+
+
+def record(post_id, community_id, weight, at=None):
+    """
+    Add an engagement event to a post's trending score.
+    Failures are logged, not raised: the ranking is derived data and can be
+    rebuilt with `manage.py rebuild_trending`.
+    Args:
+        post_id (int): The post.
+        community_id (int or None): The post's community.
+        weight (float): Event weight, negative to retract an event.
+        at (datetime, optional): When the event happened (defaults to now).
+    """
+    try:
+        conn = get_redis_connection()
+        timestamp = at.timestamp() if at is not None else time.time()
+        increment = _decayed(weight, timestamp, _epoch(conn))
+        pipe = conn.pipeline(transaction=False)
+        for key in _keys(community_id):
+            pipe.zincrby(key, increment, post_id)
+            # Keep only the top TRENDING_MAX_POSTS members
+            pipe.zremrangebyrank(key, 0, -settings.TRENDING_MAX_POSTS - 1)
+        pipe.execute()
+    except redis.RedisError:
+        logger.exception('Could not update trending score for post %s', post_id)
+
+
+def discard(post_id, community_id):
+    """Remove a post from the rankings"""
+    try:
+        pipe = get_redis_connection().pipeline(transaction=False)
+        for key in _keys(community_id):
+            pipe.zrem(key, post_id)
+        pipe.execute()
+    except redis.RedisError:
+        logger.exception('Could not remove post %s from trending', post_id)
+
+
+def move(post_id, old_community_id, new_community_id):
+    """
+    Carry a post's score over to the ranking of the community it was moved to.
+    Args:
+        post_id (int): The post.
+        old_community_id (int or None): The community it left.
+        new_community_id (int or None): The community it is now in.
+    """
+    try:
+        conn = get_redis_connection()
+        score = conn.zscore(GLOBAL_KEY, post_id)
+        pipe = conn.pipeline(transaction=False)
+        if old_community_id is not None:
+            pipe.zrem(community_key(old_community_id), post_id)
+        if new_community_id is not None and score is not None:
+            pipe.zadd(community_key(new_community_id), {post_id: score})
+            pipe.zremrangebyrank(community_key(new_community_id), 0, -settings.TRENDING_MAX_POSTS - 1)
+        pipe.execute()
+    except redis.RedisError:
+        logger.exception('Could not move post %s between trending rankings', post_id)
+
+
+def top_post_ids(community_id=None, limit=20):
+    """
+    Return the ids of the highest scoring posts, best first.
+    When Redis is unavailable the newest posts are returned instead.
+    Args:
+        community_id (int, optional): Restrict to one community.
+        limit (int): Number of ids to return.
+    """
+    key = community_key(community_id) if community_id is not None else GLOBAL_KEY
+    try:
+        return [int(post_id) for post_id in get_redis_connection().zrevrange(key, 0, limit - 1)]
+    except redis.RedisError:
+        logger.exception('Could not read trending posts, falling back to the newest')
+    posts = Post.objects.order_by('-created_at', '-id')
+    if community_id is not None:
+        posts = posts.filter(community_id=community_id)
+    return list(posts.values_list('id', flat=True)[:limit])
+
+
+def rebuild(since):
+    """
+    Recompute every ranking from the database with a fresh epoch.
+    Run periodically (e.g. daily) to keep the forward-decay exponents small.
+    Args:
+        since (datetime): Only posts created after this time are ranked.
+    Returns:
+        int: Number of posts ranked.
+    """
+    epoch = since.timestamp()
+    scores = {}
+    communities = {}
+    for post_id, community_id, created_at in Post.objects.filter(created_at__gte=since).values_list(
+        'id', 'community_id', 'created_at'
+    ).iterator():
+        scores[post_id] = _decayed(POST_WEIGHT, created_at.timestamp(), epoch)
+        communities[post_id] = community_id
+    for model, weight in ((Like, LIKE_WEIGHT), (Comment, COMMENT_WEIGHT)):
+        for post_id, created_at in model.objects.filter(post_id__in=scores.keys()).values_list(
+            'post_id', 'created_at'
+        ).iterator():
+            scores[post_id] += _decayed(weight, created_at.timestamp(), epoch)
+
+    per_key = {GLOBAL_KEY: scores}
+    for post_id, score in scores.items():
+        if communities[post_id] is not None:
+            per_key.setdefault(community_key(communities[post_id]), {})[post_id] = score
+
+    conn = get_redis_connection()
+    stale_keys = list(conn.scan_iter('trending:*'))
+    pipe = conn.pipeline(transaction=True)
+    if stale_keys:
+        pipe.delete(*stale_keys)
+    pipe.set(EPOCH_KEY, epoch)
+    for key, members in per_key.items():
+        top = dict(sorted(members.items(), key=lambda item: item[1], reverse=True)[:settings.TRENDING_MAX_POSTS])
+        if top:
+            pipe.zadd(key, top)
+    pipe.execute()
+    return len(scores)
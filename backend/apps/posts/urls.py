@@ -6,6 +6,7 @@ app_name = 'posts'
 urlpatterns = [
     # Post Management
     path('', views.PostListView.as_view(), name='post_list'),
+    path('trending/', views.TrendingPostListView.as_view(), name='post_trending'),
     path('<int:pk>/', views.PostDetailView.as_view(), name='post_detail'),
     # Comment Management
     path('<int:post_id>/comments/', views.CommentListCreateView.as_view(), name='post_comments'),
@@ -1,11 +1,79 @@
-from rest_framework import generics, permissions, status
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework import generics, permissions, serializers, status
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.shortcuts import get_object_or_404
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from rest_framework.filters import OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Post, Comment, Like
-from .serializers import PostSerializer, PostDetailSerializer, CommentSerializer, LikeSerializer
+from .models import Post, Comment, Like, TimelineEntry
+from .timeline import home_timeline_sources, refan_post
+from . import like_buffer, trending
+from .serializers import (
+    PostSerializer, PostSearchSerializer, PostDetailSerializer, CommentSerializer,
+    ThreadedCommentSerializer, LikeSerializer,
+)
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from uni_hub_core.pagination import FeedPagination, KeysetPagination
+
+# Number of newest comments embedded in a post detail response
+RECENT_COMMENTS_LIMIT = 5
+# Number of replies embedded under each top-level comment in the comment list
+FIRST_REPLIES_LIMIT = 3
+
+
+def visible_posts(queryset, user):
+    """Restrict `queryset` to posts `user` may read: their communities, their own and public posts"""
+    if user.is_superuser or user.is_staff:
+        return queryset
+    from apps.communities.membership_cache import member_community_ids
+    from django.db import models
+    return queryset.filter(
+        models.Q(community__in=member_community_ids(user)) |
+        models.Q(author=user) |
+        models.Q(community__isnull=True)
+    )
+
+
+class HomeTimelineKeyset(KeysetPagination):
+    """
+    Keyset pages of the home timeline. Each source of home_timeline_sources is seeked and
+    cut to one page on its own index, then the UNION ALL is ordered and cut again.
+    """
+    ordering = ('-created_at', '-post_id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.model = TimelineEntry
+        self.fields = ['created_at', 'post_id']
+        self.descending = True
+
+        position = self.decode_cursor(request)
+        branches = []
+        for source, tie_field in zip(queryset, ('post_id', 'id')):
+            source = source.order_by('-created_at', f'-{tie_field}')
+            if position is not None:
+                source = source.filter(self.get_seek_filter(position, fields=('created_at', tie_field)))
+            branches.append(source[:self.page_size + 1])
+        rows = list(branches[0].union(branches[1], all=True).order_by('-created_at', '-post_id')[:self.page_size + 1])
+
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = list(rows[-1]) if self.has_next else None
+        return rows
+
+
+class HomeTimelinePagination(FeedPagination):
+    """FeedPagination over the (timeline entries, public posts) pair from home_timeline_sources"""
+    keyset_class = HomeTimelineKeyset
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.use_keyset(request):
+            entries, public = queryset
+            queryset = entries.union(public, all=True).order_by('-created_at', '-post_id')
+        return super().paginate_queryset(queryset, request, view)
 
 
 class PostListView(generics.ListCreateAPIView):
@@ -13,32 +81,73 @@ class PostListView(generics.ListCreateAPIView):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    # Page numbers by default, keyset cursor on (created_at, id) with ?pagination=cursor (not for ?search=)
+    pagination_class = FeedPagination
+    # Text search is handled by the full-text search in filter_queryset, not SearchFilter
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['community', 'author']
-    search_fields = ['content']
     ordering_fields = ['created_at', 'updated_at']
     ordering = ['-created_at']
+    search_param = 'search'
+    search_config = 'english'
+    
+    # Query parameters that do not change which posts the home feed contains
+    HOME_TIMELINE_PARAMS = {'page', 'page_size', 'cursor', 'pagination'}
     
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
     
-    def get_queryset(self):
-        # Use select_related to optimize author and community queries
-        queryset = Post.objects.select_related('author', 'community').all()
+    def use_home_timeline(self):
+        """Unfiltered feeds of regular users are served from the materialized timeline"""
         user = self.request.user
-        is_platform_admin = user.is_superuser or user.is_staff
-
-        if not is_platform_admin:
-            from apps.communities.models import CommunityMember
-            from django.db import models
-            member_community_ids = CommunityMember.objects.filter(
-                user=user, is_active=True
-            ).values_list('community_id', flat=True)
-            queryset = queryset.filter(
-                models.Q(community__in=member_community_ids) |
-                models.Q(author=user) |
-                models.Q(community__isnull=True)
+        if user.is_superuser or user.is_staff:
+            return False
+        return set(self.request.query_params) <= self.HOME_TIMELINE_PARAMS
+    
+    def list(self, request, *args, **kwargs):
+        if self.get_search_terms() and self.paginator.use_keyset(request):
+            # The keyset seeks by (created_at, id), which would drop the relevance order
+            raise serializers.ValidationError(
+                {'pagination': 'Search results are paginated by page number, not by cursor.'}
             )
+        if not self.use_home_timeline():
+            return super().list(request, *args, **kwargs)
+        # Range scans over the user's timeline rows and the public posts instead of the OR visibility query
+        paginator = HomeTimelinePagination()
+        rows = paginator.paginate_queryset(home_timeline_sources(request.user), request, view=self)
+        posts = Post.objects.select_related('author', 'community').in_bulk([post_id for _, post_id in rows])
+        serializer = self.get_serializer([posts[post_id] for _, post_id in rows if post_id in posts], many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    def get_search_terms(self):
+        return self.request.query_params.get(self.search_param, '').strip()
+    
+    def get_serializer_class(self):
+        if self.request.method == 'GET' and self.get_search_terms():
+            return PostSearchSerializer
+        return super().get_serializer_class()
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        terms = self.get_search_terms()
+        if not terms:
+            return queryset
+        # GIN-indexed match on search_vector, ranked by ts_rank with a highlighted snippet
+        query = SearchQuery(terms, search_type='websearch', config=self.search_config)
+        queryset = queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query),
+            search_snippet=SearchHeadline(
+                'content', query, config=self.search_config,
+                start_sel='<mark>', stop_sel='</mark>', max_fragments=2,
+            ),
+        )
+        if 'ordering' not in self.request.query_params:
+            queryset = queryset.order_by('-search_rank', '-created_at', '-id')
+        return queryset
+    
+    def get_queryset(self):
+        # Use select_related to optimize author and community queries
+        queryset = visible_posts(Post.objects.select_related('author', 'community').all(), self.request.user)
 
         community_id = self.request.query_params.get('community_id')
         if community_id:
@@ -49,9 +158,50 @@ class PostListView(generics.ListCreateAPIView):
         return queryset
 
 
+class TrendingPostListView(generics.ListAPIView):
+    """
+    Trending posts, best first, optionally for one community (?community_id=).
+    The ranking is read from Redis; only the returned page of posts touches the database.
+    """
+    serializer_class = PostSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+    default_limit = 20
+    max_limit = 100
+
+    def get_limit(self):
+        try:
+            return max(1, min(int(self.request.query_params.get('limit', self.default_limit)), self.max_limit))
+        except ValueError:
+            return self.default_limit
+
+    def list(self, request, *args, **kwargs):
+        community_id = request.query_params.get('community_id')
+        try:
+            community_id = int(community_id) if community_id else None
+        except ValueError:
+            return Response({'detail': 'Invalid community_id.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = self.get_limit()
+        # Over-fetch ids so posts hidden from this user do not leave the page short
+        ranked_ids = trending.top_post_ids(community_id, limit * 2)
+        posts = visible_posts(
+            Post.objects.select_related('author', 'community').filter(pk__in=ranked_ids), request.user
+        ).in_bulk()
+        page = [posts[post_id] for post_id in ranked_ids if post_id in posts][:limit]
+        serializer = self.get_serializer(page, many=True)
+        return Response(serializer.data)
+
+
 class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Post Detail View"""
-    queryset = Post.objects.select_related('author', 'community').all()
+    # Newest comments only, with authors; Django turns the sliced Prefetch into a ROW_NUMBER() window query
+    queryset = Post.objects.select_related('author', 'community').prefetch_related(
+        Prefetch(
+            'comments',
+            queryset=Comment.objects.filter(parent__isnull=True).select_related('author').order_by('-created_at', '-id')[:RECENT_COMMENTS_LIMIT],
+            to_attr='recent_comments',
+        )
+    )
     serializer_class = PostDetailSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -74,21 +224,79 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
         context['request'] = self.request
         return context 
 
+    def perform_update(self, serializer):
+        previous_community_id = serializer.instance.community_id
+        post = serializer.save()
+        if post.community_id != previous_community_id:
+            refan_post(post)
+            trending.move(post.pk, previous_community_id, post.community_id)
+
+    def perform_destroy(self, instance):
+        post_id, community_id = instance.pk, instance.community_id
+        instance.delete()
+        trending.discard(post_id, community_id)
+
+
+class ThreadPagination(KeysetPagination):
+    """Keyset pagination through a thread in depth-first (path) order"""
+    ordering = ('path', 'id')
+
 
 class CommentListCreateView(generics.ListCreateAPIView):
     """
     API view to list and create comments for a post
+    By default, top-level comments are returned newest first, each with its first
+    replies embedded; follow `next` to page through older ones.
+    With `?thread=<comment id>`, the replies under that comment are returned
+    depth-first, read as one prefix range of the materialized path.
+    Send `parent` when creating to reply to a comment.
     """
-    serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_thread_root(self):
+        thread_id = self.request.query_params.get('thread')
+        if not thread_id:
+            return None
+        return get_object_or_404(Comment, pk=thread_id, post_id=self.kwargs.get('post_id'))
+
+    @property
+    def pagination_class(self):
+        if self.request.method == 'GET' and self.request.query_params.get('thread'):
+            return ThreadPagination
+        return KeysetPagination
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET' and not self.request.query_params.get('thread'):
+            return ThreadedCommentSerializer
+        return CommentSerializer
+
     def get_queryset(self):
         post_id = self.kwargs.get('post_id')
-        return Comment.objects.filter(post_id=post_id)
+        queryset = Comment.objects.filter(post_id=post_id).select_related('author')
+        if self.request.method != 'GET':
+            return queryset
+        root = self.get_thread_root()
+        if root is not None:
+            return queryset.filter(path__startswith=f'{root.path}.')
+        # First replies of every comment on the page come from one windowed prefetch
+        return queryset.filter(parent__isnull=True).prefetch_related(
+            Prefetch(
+                'replies',
+                queryset=Comment.objects.select_related('author').order_by('path')[:FIRST_REPLIES_LIMIT],
+                to_attr='first_replies',
+            )
+        )
 
     def perform_create(self, serializer):
         post_id = self.kwargs.get('post_id')
-        serializer.save(author=self.request.user, post_id=post_id) 
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user, post_id=post_id)
+            # Keep the denormalized counters in step with the inserted row
+            Post.objects.filter(pk=post_id).update(comment_count=F('comment_count') + 1)
+            if comment.parent_id:
+                Comment.objects.filter(pk=comment.parent_id).update(reply_count=F('reply_count') + 1)
+        community_id = Post.objects.filter(pk=post_id).values_list('community_id', flat=True).first()
+        trending.record(post_id, community_id, trending.COMMENT_WEIGHT, at=comment.created_at)
 
 
 class LikePostView(APIView):
@@ -103,9 +311,18 @@ class LikePostView(APIView):
             post = Post.objects.get(pk=post_id)
         except Post.DoesNotExist:
             return Response({'detail': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
-        like, created = Like.objects.get_or_create(user=user, post=post)
+        if like_buffer.is_enabled():
+            # Write-behind: record the intent in Redis, the flusher writes the Like row
+            if not like_buffer.buffer_like(post.pk, user.pk):
+                return Response({'detail': 'You have already liked this post.'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'detail': 'Post liked.'}, status=status.HTTP_202_ACCEPTED)
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(user=user, post=post)
+            if created:
+                Post.objects.filter(pk=post.pk).update(like_count=F('like_count') + 1)
         if not created:
             return Response({'detail': 'You have already liked this post.'}, status=status.HTTP_400_BAD_REQUEST)
+        trending.record(post.pk, post.community_id, trending.LIKE_WEIGHT, at=like.created_at)
         return Response({'detail': 'Post liked.'}, status=status.HTTP_201_CREATED)
 
 class UnlikePostView(APIView):
@@ -120,12 +337,22 @@ class UnlikePostView(APIView):
             post = Post.objects.get(pk=post_id)
         except Post.DoesNotExist:
             return Response({'detail': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
-        try:
-            like = Like.objects.get(user=user, post=post)
-            like.delete()
-            return Response({'detail': 'Post unliked.'}, status=status.HTTP_200_OK)
-        except Like.DoesNotExist:
+        if like_buffer.is_enabled():
+            if not like_buffer.buffer_unlike(post.pk, user.pk):
+                return Response({'detail': 'You have not liked this post.'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'detail': 'Post unliked.'}, status=status.HTTP_202_ACCEPTED)
+        with transaction.atomic():
+            like = Like.objects.filter(user=user, post=post).first()
+            deleted = 0
+            if like is not None:
+                deleted, _ = Like.objects.filter(pk=like.pk).delete()
+            if deleted:
+                Post.objects.filter(pk=post.pk, like_count__gt=0).update(like_count=F('like_count') - 1)
+        if not deleted:
             return Response({'detail': 'You have not liked this post.'}, status=status.HTTP_400_BAD_REQUEST)
+        # Retract at the like's own time so exactly its contribution is taken back
+        trending.record(post.pk, post.community_id, -trending.LIKE_WEIGHT, at=like.created_at)
+        return Response({'detail': 'Post unliked.'}, status=status.HTTP_200_OK)
 
 class PostLikesListView(generics.ListAPIView):
     """
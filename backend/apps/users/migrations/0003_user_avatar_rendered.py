@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_profile_options_alter_user_options_user_role'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_rendered',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Avatar with renditions'),
+        ),
+    ]
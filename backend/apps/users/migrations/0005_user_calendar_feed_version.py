@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_email_lower_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='calendar_feed_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Calendar feed version'),
+        ),
+    ]
@@ -1,9 +1,11 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
+from uni_hub_core.counters import CounterFieldsMixin
 
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
     """Extended User Model"""
     ROLE_CHOICES = [
         ('community_leader', 'Community Leader'),
@@ -14,6 +16,12 @@ class User(AbstractUser):
     email = models.EmailField(_('Email'), unique=True)
     bio = models.TextField(_('Personal Profile'), max_length=500, blank=True)
     avatar = models.ImageField(_('Avatar'), upload_to='avatars/', blank=True, null=True)
+    # Name of the avatar whose renditions are stored, set by the rendition job
+    avatar_rendered = models.CharField(_('Avatar with renditions'), max_length=100, blank=True, editable=False)
+    background_fields = ('avatar_rendered',)
+    # Signed into calendar feed tokens; bumping it revokes every feed URL issued before
+    calendar_feed_version = models.PositiveIntegerField(_('Calendar feed version'), default=0, editable=False)
+    counter_fields = ('calendar_feed_version',)
     major = models.CharField(_('Major'), max_length=100, blank=True)
     student_id = models.CharField(_('Student ID'), max_length=20, blank=True)
     
@@ -24,6 +32,10 @@ class User(AbstractUser):
     class Meta:
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+        indexes = [
+            # Case-insensitive email lookups (bulk member import)
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+        ]
     
     def __str__(self):
         return str(self.email)
@@ -1,13 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from .models import User, Profile
+from uni_hub_core.images import ImageRenditionsField
 
 
 class UserSerializer(serializers.ModelSerializer):
     """User Serializer"""
+    avatar_renditions = ImageRenditionsField(source='avatar')
+
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'bio', 'avatar', 'major', 'student_id', 'role', 'is_staff', 'is_superuser']
+        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'bio', 'avatar', 'avatar_renditions', 'major', 'student_id', 'role', 'is_staff', 'is_superuser']
         read_only_fields = ['id', 'username', 'email']
 
 
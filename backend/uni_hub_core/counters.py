@@ -0,0 +1,27 @@
+"""
+Shared support for denormalized counter columns.
+"""
+
+
+class CounterFieldsMixin:
+    """
+    Keep full saves of existing rows from writing the columns in `counter_fields` and
+    `background_fields`.
+
+    Counters are moved only by F() updates and recounts, and background fields only by
+    background jobs. The value held by an instance was read earlier in the request, so
+    writing it back with every other column would undo changes made concurrently.
+    Inserts and explicit `update_fields` are left alone.
+    """
+    counter_fields = ()
+    background_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not args:
+            skipped = set(self.counter_fields) | set(self.background_fields)
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
@@ -0,0 +1,192 @@
+"""
+Image renditions for uploaded pictures.
+
+Uploads are stored as-is so the request returns quickly. Once the saving transaction
+commits, resized WebP renditions are generated with Pillow in a worker process pool
+(IMAGE_PROCESSING_MODE = 'process') or inline ('sync', for development and tests).
+Rendition paths are derived from the original file name, so serializers can expose
+their URLs without extra queries:
+
+    post_images/photo.jpg  ->  post_images/renditions/photo.jpg.thumbnail.webp
+
+Once they are stored, the job copies the image name into the model's
+`<field>_rendered` column. Serializers compare the two and point every rendition URL
+at the original until they match, without asking the storage backend.
+"""
+
+import logging
+import multiprocessing
+import posixpath
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# name -> (bounding box, crop to fill the box)
+RENDITIONS = {
+    'thumbnail': ((160, 160), True),
+    'small': ((480, 480), False),
+    'medium': ((1080, 1080), False),
+}
+RENDITION_FORMAT = 'WEBP'
+RENDITION_QUALITY = 80
+
+_executor = None
+# (model, field name) pairs registered with track_image_field
+TRACKED_FIELDS = []
+
+
+def rendition_name(name, rendition):
+    """Storage path of a rendition of the file stored at `name`"""
+    directory, filename = posixpath.split(name)
+    # The full file name, extension included, so photo.jpg and photo.png do not collide
+    return posixpath.join(directory, 'renditions', f'{filename}.{rendition}.webp')
+
+
+def rendered_field_name(field_name):
+    """Column holding the name of the image whose renditions are stored"""
+    return f'{field_name}_rendered'
+
+
+def generate_renditions(name):
+    """
+    Build every rendition of the stored image `name`.
+    Runs in a worker process; errors are logged rather than raised.
+    Returns:
+        bool: Whether every rendition was stored.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        with default_storage.open(name, 'rb') as fh:
+            image = Image.open(fh)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+        for rendition, (size, crop) in RENDITIONS.items():
+            if crop:
+                resized = ImageOps.fit(image, size, Image.LANCZOS)
+            else:
+                resized = image.copy()
+                resized.thumbnail(size, Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, RENDITION_FORMAT, quality=RENDITION_QUALITY, method=4)
+            target = rendition_name(name, rendition)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+    except Exception:
+        logger.exception('Could not generate renditions for %s', name)
+        return False
+    return True
+
+
+def mark_rendered(model, field_name, pk, name):
+    """Record that the renditions of `name` are stored, unless the row holds another image by now"""
+    model._default_manager.filter(pk=pk, **{field_name: name}).update(**{rendered_field_name(field_name): name})
+
+
+def render_image(label, field_name, pk, name):
+    """Generate the renditions of an image held by the row `pk` of model `label`, then mark it"""
+    if generate_renditions(name):
+        mark_rendered(apps.get_model(label), field_name, pk, name)
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # 'spawn' avoids forking a multi-threaded application server
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+def process_image(model, field_name, pk, name):
+    """
+    Generate renditions for the image `name` of a row according to IMAGE_PROCESSING_MODE.
+    Runs after the upload has committed, so a pool that cannot take the job is logged
+    rather than raised; `manage.py generate_renditions` picks the image up later.
+    """
+    global _executor
+    job = (model._meta.label, field_name, pk, name)
+    if settings.IMAGE_PROCESSING_MODE == 'sync':
+        render_image(*job)
+        return
+    try:
+        _get_executor().submit(render_image, *job)
+    except BrokenExecutor:
+        logger.exception('Could not schedule renditions for %s', name)
+        # A worker died and the pool refuses new jobs: replace it for the next upload
+        _executor.shutdown(wait=False)
+        _executor = None
+    except Exception:
+        logger.exception('Could not schedule renditions for %s', name)
+
+
+def track_image_field(model, field_name):
+    """
+    Generate renditions whenever a new file is saved into `model.field_name`.
+    The model needs a `<field_name>_rendered` CharField, listed in its `background_fields`.
+    Call from the owning app's AppConfig.ready().
+    """
+    TRACKED_FIELDS.append((model, field_name))
+    flag = f'_{field_name}_uploaded'
+
+    def mark_upload(sender, instance, raw=False, **kwargs):
+        field_file = getattr(instance, field_name)
+        # A freshly assigned upload is not committed to storage until the field's pre_save
+        setattr(instance, flag, bool(field_file) and not field_file._committed and not raw)
+
+    def schedule_renditions(sender, instance, **kwargs):
+        if getattr(instance, flag, False):
+            name, pk = getattr(instance, field_name).name, instance.pk
+            transaction.on_commit(lambda: process_image(model, field_name, pk, name))
+            setattr(instance, flag, False)
+
+    pre_save.connect(mark_upload, sender=model, weak=False, dispatch_uid=f'images.mark.{model._meta.label}.{field_name}')
+    post_save.connect(schedule_renditions, sender=model, weak=False, dispatch_uid=f'images.schedule.{model._meta.label}.{field_name}')
+
+
+class ImageRenditionsField(serializers.Field):
+    """
+    Read-only map of rendition name to URL for an image field, plus the original.
+    Renditions that are not stored yet map to the original URL; readiness is read from
+    the instance's `<field>_rendered` column.
+    Use as `ImageRenditionsField(source='image')`.
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+
+        def absolute(url):
+            return request.build_absolute_uri(url) if request is not None else url
+
+        original = absolute(value.url)
+        urls = {'original': original}
+        stored = getattr(value.instance, rendered_field_name(value.field.name), '') == value.name
+        for rendition in RENDITIONS:
+            urls[rendition] = absolute(value.storage.url(rendition_name(value.name, rendition))) if stored else original
+        return urls
@@ -0,0 +1,148 @@
+"""
+Shared pagination classes for the API.
+"""
+
+import base64
+import json
+
+from django.db import models
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset ("seek") pagination.
+
+    Rows are ordered by `ordering`, a (sort field, unique tiebreaker) pair, and each
+    page continues strictly after the last row of the previous one. No COUNT(*) and
+    no OFFSET are issued, so every page costs one index range scan however deep it is.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_filter(position))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = self.get_position(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_seek_filter(self, position, fields=None):
+        """Rows strictly after `position` in (sort field, tiebreaker) order"""
+        sort_field, tie_field = fields or self.fields
+        sort_value, tie_value = position
+        op = 'lt' if self.descending else 'gt'
+        bound = 'lte' if self.descending else 'gte'
+        # The redundant inclusive bound keeps the predicate sargable on the leading index column
+        return models.Q(**{f'{sort_field}__{bound}': sort_value}) & (
+            models.Q(**{f'{sort_field}__{op}': sort_value}) |
+            models.Q(**{sort_field: sort_value, f'{tie_field}__{op}': tie_value})
+        )
+
+    def get_position(self, instance):
+        return [getattr(instance, field) for field in self.fields]
+
+    def encode_cursor(self, position):
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        token = base64.urlsafe_b64encode(json.dumps(values).encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('ascii'))
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = []
+            for field_name, value in zip(self.fields, values):
+                field = self.model._meta.get_field(field_name)
+                if isinstance(field, models.DateTimeField):
+                    value = parse_datetime(value)
+                    if value is None:
+                        raise ValueError
+                else:
+                    value = field.to_python(value)
+                position.append(value)
+            return position
+        except (TypeError, ValueError, UnicodeError, json.JSONDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class FeedPagination(PageNumberPagination):
+    """
+    Page-number pagination that switches to keyset pagination for infinite scroll.
+
+    Clients opt in with `?pagination=cursor` (first page) and then follow the returned
+    `next` link, which carries a `cursor` parameter. Requests without either keep the
+    classic `count`/`next`/`previous` page-number response.
+    """
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def use_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor' or
+            self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.keyset_class() if self.use_keyset(request) else None
+        if self.keyset is not None:
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
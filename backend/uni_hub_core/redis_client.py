@@ -0,0 +1,34 @@
+"""
+Shared Redis client for application data structures.
+The Django cache uses its own connection; this one is for sets, sorted sets and
+counters that features manipulate directly.
+"""
+
+import redis
+from django.conf import settings
+from django.core.signals import setting_changed
+
+_connection = None
+
+
+def get_redis_connection():
+    """Return the process-wide Redis client (connections are pooled by redis-py)"""
+    global _connection
+    if _connection is None:
+        _connection = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DATA_DB,
+            decode_responses=True,
+        )
+    return _connection
+
+
+def _reset_connection(setting, **kwargs):
+    # Let override_settings point the client at another server or database
+    global _connection
+    if setting in ('REDIS_HOST', 'REDIS_PORT', 'REDIS_DATA_DB'):
+        _connection = None
+
+
+setting_changed.connect(_reset_connection, dispatch_uid='redis_client.reset_connection')
@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -176,6 +177,11 @@ CORS_ALLOW_CREDENTIALS = True
 # Redis settings
 REDIS_HOST = config('REDIS_HOST', default='localhost')
 REDIS_PORT = config('REDIS_PORT', default=6379)
+# Database used for application data structures (buffers, rankings), separate from the cache
+REDIS_DATA_DB = config('REDIS_DATA_DB', default=2, cast=int)
+# Database the test runner points REDIS_DATA_DB at for the whole run; it is emptied before and after
+REDIS_TEST_DATA_DB = config('REDIS_TEST_DATA_DB', default=15, cast=int)
+TEST_RUNNER = 'uni_hub_core.test_runner.TestRunner'
 
 # Cache settings
 CACHES = {
@@ -183,4 +189,37 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
         'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/1',
     }
-} 
\ No newline at end of file
+} 
+
+# Membership cache settings
+# Lifetime in seconds of each user's cached community -> role map
+MEMBERSHIP_CACHE_TIMEOUT = config('MEMBERSHIP_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Community directory cache settings
+# Lifetime in seconds of cached anonymous community list / detail responses
+COMMUNITY_DIRECTORY_CACHE_TIMEOUT = config('COMMUNITY_DIRECTORY_CACHE_TIMEOUT', default=300, cast=int)
+
+# Event calendar settings
+# Longest [from, to) range, in days, the calendar endpoint serves in one response
+CALENDAR_MAX_RANGE_DAYS = config('CALENDAR_MAX_RANGE_DAYS', default=93, cast=int)
+# How many days of past events the iCalendar feed keeps
+ICAL_FEED_PAST_DAYS = config('ICAL_FEED_PAST_DAYS', default=30, cast=int)
+
+# Home timeline settings
+# Maximum number of posts kept in each user's materialized home timeline
+HOME_TIMELINE_MAX_ENTRIES = config('HOME_TIMELINE_MAX_ENTRIES', default=800, cast=int)
+
+# Like buffer settings
+# When enabled, like/unlike intents are buffered in Redis and applied by `manage.py flush_like_buffer`
+POST_LIKE_BUFFER_ENABLED = config('POST_LIKE_BUFFER_ENABLED', default=False, cast=bool)
+
+# Trending settings
+# Engagement loses half of its weight in the trending score every TRENDING_HALF_LIFE_HOURS
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=12, cast=float)
+# Number of posts kept in each trending ranking
+TRENDING_MAX_POSTS = config('TRENDING_MAX_POSTS', default=1000, cast=int)
+
+# Image processing settings
+# 'process' generates renditions in a worker process pool, 'sync' inline after commit
+IMAGE_PROCESSING_MODE = config('IMAGE_PROCESSING_MODE', default='process')
+IMAGE_PROCESSING_WORKERS = config('IMAGE_PROCESSING_WORKERS', default=2, cast=int)
@@ -0,0 +1,30 @@
+"""
+Test runner that keeps the suite away from live Redis data.
+"""
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+from .redis_client import get_redis_connection
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Run every test with REDIS_DATA_DB pointed at REDIS_TEST_DATA_DB.
+    Any test that saves a post, a like or a waitlist entry writes Redis structures, so
+    the switch is made once for the whole run rather than per test class. The test
+    database is emptied before and after the run.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        if settings.REDIS_TEST_DATA_DB == settings.REDIS_DATA_DB:
+            raise ImproperlyConfigured('REDIS_TEST_DATA_DB must differ from REDIS_DATA_DB.')
+        self._redis_override = override_settings(REDIS_DATA_DB=settings.REDIS_TEST_DATA_DB)
+        self._redis_override.enable()
+        get_redis_connection().flushdb()
+
+    def teardown_test_environment(self, **kwargs):
+        get_redis_connection().flushdb()
+        self._redis_override.disable()
+        super().teardown_test_environment(**kwargs)
@@ -26,6 +26,8 @@ def api_root(request):
             },
             "communities": {
                 "list": "/api/v1/communities/",
+                "recommended": "/api/v1/communities/recommended/",
+                "autocomplete": "/api/v1/communities/autocomplete/?q=",
                 "detail": "/api/v1/communities/{id}/",
                 "join": "/api/v1/communities/{id}/join/",
                 "leave": "/api/v1/communities/{id}/leave/",
@@ -33,13 +35,17 @@ def api_root(request):
             },
             "events": {
                 "list": "/api/v1/events/",
+                "calendar": "/api/v1/events/calendar/?from={datetime}&to={datetime}",
+                "calendar_feed": "/api/v1/events/calendar/feed/",
                 "detail": "/api/v1/events/{id}/",
                 "join": "/api/v1/events/{id}/join/",
                 "leave": "/api/v1/events/{id}/leave/",
-                "participants": "/api/v1/events/{id}/participants/"
+                "participants": "/api/v1/events/{id}/participants/",
+                "participants_export": "/api/v1/events/{id}/participants/export/?file_format=csv|xlsx"
             },
             "posts": {
                 "list": "/api/v1/posts/",
+                "trending": "/api/v1/posts/trending/",
                 "detail": "/api/v1/posts/{id}/"
             },
             "notifications": {
@@ -176,15 +176,15 @@ const CommunityDetailPage = () => {
             <h2>Members List</h2>
             {community.members && community.members.length > 0 ? (
               <div className="members-list">
-                {community.members.slice(0, 10).map((member) => (
+                {community.members.map((member) => (
                   <div className="member-item" key={member.id}>
                     <span className="member-name">{member.user_name}</span>
                     <span className="member-role">{member.role}</span>
                   </div>
                 ))}
-                {community.members.length > 10 && (
+                {community.member_count > community.members.length && (
                   <div className="more-members">
-                    There are {community.members.length - 10} members left...
+                    There are {community.member_count - community.members.length} members left...
                   </div>
                 )}
               </div>